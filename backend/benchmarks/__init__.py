@@ -0,0 +1 @@
+# Benchmarks for the Kor'tana backend; run from backend/ with ``python -m benchmarks.<name>``
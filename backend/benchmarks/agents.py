@@ -0,0 +1,83 @@
+"""Event-loop responsiveness while a batch of agent tasks runs.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.agents --tasks 300 --words 20000
+
+Runs the same batch once inline on the event loop, as the old placeholder
+would have for real work, and once through the agent process pool, while a
+probe coroutine measures how late the loop wakes it every millisecond.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import percentile  # noqa: E402
+from services.agent_runner import ACTIONS, AgentRunner  # noqa: E402
+
+AGENT = {"id": "bench", "name": "bench", "capabilities": ["summarize"]}
+PROBE_INTERVAL = 0.001
+
+
+async def _probe(lags: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+
+async def _measure(run_batch) -> Dict[str, Any]:
+    lags: List[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(lags, stop))
+    start = time.perf_counter()
+    await run_batch()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "loop_lag_p99_ms": round(percentile(lags, 99) * 1000, 3),
+        "loop_lag_max_ms": round(max(lags) * 1000, 3),
+    }
+
+
+async def main(tasks: int, words: int) -> None:
+    text = ". ".join(f"sentence {i} about agents and pools" for i in range(words // 5)) + "."
+    batch = [text] * tasks
+
+    async def inline() -> None:
+        for task in batch:
+            ACTIONS["summarize"](task, AGENT["name"])
+            await asyncio.sleep(0)
+
+    runner = AgentRunner()
+    # Start the workers first so the comparison excludes process spawn time
+    await runner.run(AGENT, "warm up")
+
+    async def pooled() -> None:
+        async for _ in runner.run_many(AGENT, batch):
+            pass
+
+    try:
+        for name, run_batch in (("inline", inline), ("pool", pooled)):
+            result = await _measure(run_batch)
+            print(
+                f"{name:>6}: {result['elapsed_s']}s  loop lag p99 {result['loop_lag_p99_ms']}ms  "
+                f"max {result['loop_lag_max_ms']}ms"
+            )
+    finally:
+        runner.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=300)
+    parser.add_argument("--words", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.tasks, args.words))
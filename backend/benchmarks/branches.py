@@ -0,0 +1,71 @@
+"""Branch creation for many tasks: one at a time versus ``prepare_branches``.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.branches --tasks 200 --latency 0.05
+
+Calls go in-process to the GitHub stub, which charges ``--latency`` seconds
+per request. The sequential run creates each task's branch the way task
+execution used to, re-reading the base branch every time; the bulk run
+resolves it once and creates refs concurrently.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+from benchmarks.harness import stub_backends  # noqa: E402  (configures the backend before it is imported)
+from benchmarks import github_stub  # noqa: E402
+from routers import autonomy  # noqa: E402
+from routers.autonomy import task_queue_manager  # noqa: E402
+from services.http_client import http_client  # noqa: E402
+
+
+async def _queue_tasks(first: int, count: int) -> List[Dict[str, Any]]:
+    tasks = []
+    for number in range(first, first + count):
+        issue = {"number": number, "title": f"Bench issue {number}: tune things!", "body": "", "state": "open"}
+        tasks.append((await task_queue_manager.apply_issue(issue))[0])
+    return tasks
+
+
+async def main(count: int, latency: float) -> None:
+    github_stub.STUB_LATENCY = latency
+    http_client.transport = httpx.ASGITransport(app=stub_backends)
+    await http_client.start()
+    try:
+        # Per-task creation with the base branch looked up every time, as before
+        ttl, autonomy.BRANCH_BASE_TTL = autonomy.BRANCH_BASE_TTL, -1
+        tasks = await _queue_tasks(100000, count)
+        before, start = github_stub.state["requests"], time.perf_counter()
+        for task in tasks:
+            await task_queue_manager.create_branch(task)
+        elapsed, requests = time.perf_counter() - start, github_stub.state["requests"] - before
+        print(f"sequential: {elapsed:.2f}s  {requests} GitHub requests")
+        autonomy.BRANCH_BASE_TTL = ttl
+
+        tasks = await _queue_tasks(200000, count)
+        task_queue_manager._base = None
+        before, start = github_stub.state["requests"], time.perf_counter()
+        result = await task_queue_manager.prepare_branches([task["id"] for task in tasks])
+        elapsed, requests = time.perf_counter() - start, github_stub.state["requests"] - before
+        print(
+            f"      bulk: {elapsed:.2f}s  {requests} GitHub requests  "
+            f"created {result['created']}  exists {result['exists']}  failed {result['failed']}"
+        )
+    finally:
+        await http_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub seconds per GitHub request")
+    args = parser.parse_args()
+    asyncio.run(main(args.tasks, args.latency))
@@ -0,0 +1,30 @@
+"""Latency statistics shared by the benchmark scripts."""
+import statistics
+from typing import Any, Dict, List
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], elapsed: float, errors: int = 0) -> Dict[str, Any]:
+    """Throughput and latency percentiles for ``latencies`` (seconds) over ``elapsed`` seconds."""
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def format_result(name: str, result: Dict[str, Any]) -> str:
+    # Latency-only results (startup) have no throughput
+    throughput = f"{result['throughput_rps']:>10} ops/s" if "throughput_rps" in result else " " * 16
+    line = f"{name:<40} {throughput}  p50 {result['p50_ms']}ms  p95 {result['p95_ms']}ms  p99 {result['p99_ms']}ms"
+    if result.get("errors"):
+        line += f"  errors {result['errors']}"
+    return line
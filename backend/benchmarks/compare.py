@@ -0,0 +1,68 @@
+"""Compare a benchmark run with a baseline and flag regressions.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.compare benchmarks/baselines/ci.json bench.json --threshold 0.25
+
+A benchmark regresses when its throughput drops, or its p50/p95 latency
+grows, by more than ``threshold`` (a fraction of the baseline). The exit
+status is 1 when anything regressed, so CI can fail the build.
+
+After an intentional performance change, refresh the baseline with
+``python -m benchmarks.run --profile ci --output benchmarks/baselines/ci.json``.
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Tuple
+
+# Metric -> True when higher is better
+METRICS = {"throughput_rps": True, "p50_ms": False, "p95_ms": False}
+
+
+def load(path: str) -> Dict[str, Dict[str, Any]]:
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def compare(
+    baseline: Dict[str, Dict[str, Any]], current: Dict[str, Dict[str, Any]], threshold: float
+) -> Tuple[List[str], List[str]]:
+    """Report lines for every shared benchmark and the subset that regressed."""
+    lines: List[str] = []
+    regressions: List[str] = []
+    for name in sorted(baseline.keys() & current.keys()):
+        for metric, higher_is_better in METRICS.items():
+            before, after = baseline[name].get(metric), current[name].get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            line = f"{name:<40} {metric:<15} {before:>12} -> {after:<12} {change:+.1%}"
+            if worse > threshold:
+                line += "  REGRESSION"
+                regressions.append(line)
+            lines.append(line)
+    for name in sorted(baseline.keys() - current.keys()):
+        lines.append(f"{name:<40} missing from current run")
+    return lines, regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    lines, regressions = compare(load(args.baseline), load(args.current), args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        print("\n".join(regressions))
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
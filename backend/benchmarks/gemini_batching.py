@@ -0,0 +1,75 @@
+"""Throughput of remote Gemini calls with and without micro-batching.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.gemini_batching --requests 2000 --concurrency 64
+
+Calls go in-process to the Gemini stub, which charges ``--latency`` seconds
+per upstream request and serves at most ``--quota`` requests at a time, the
+way a rate-limited model endpoint would. Each run reports caller latency,
+throughput and how many upstream requests were made.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+from benchmarks import gemini_stub  # noqa: E402
+from benchmarks.common import summarize  # noqa: E402
+from services.gemini import GeminiService  # noqa: E402
+from services.http_client import http_client  # noqa: E402
+
+STUB_URL = "http://gemini.stub"
+
+
+async def _run(service: GeminiService, requests: int, concurrency: int) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    upstream_before = gemini_stub.state["requests"]
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await service.analyze(f"Extract insights from change {i}: " + "context " * 50)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    result = summarize(latencies, time.perf_counter() - start)
+    result["upstream_requests"] = gemini_stub.state["requests"] - upstream_before
+    return result
+
+
+async def main(requests: int, concurrency: int, latency: float, quota: int, batch_size: int) -> None:
+    gemini_stub.GEMINI_STUB_LATENCY = latency
+    gemini_stub.set_quota(quota)
+    http_client.transport = httpx.ASGITransport(app=gemini_stub.app)
+    await http_client.start()
+    try:
+        for name, size in (("unbatched", 1), (f"batched({batch_size})", batch_size)):
+            # No cache: every prompt is distinct, and the runs must not serve each other
+            service = GeminiService(mode="remote", base_url=STUB_URL, cache=None, batch_size=size)
+            result = await _run(service, requests, concurrency)
+            print(
+                f"{name:>13}: {result['throughput_rps']:>8} req/s  p50 {result['p50_ms']}ms  "
+                f"p95 {result['p95_ms']}ms  upstream requests {result['upstream_requests']}"
+            )
+    finally:
+        await http_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub seconds per upstream request")
+    parser.add_argument("--quota", type=int, default=4, help="stub concurrent request limit")
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.latency, args.quota, args.batch_size))
@@ -0,0 +1,99 @@
+"""Compare HTTP loopback and in-process dispatch of Gemini calls.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.gemini_dispatch --requests 2000 --concurrency 32
+
+A uvicorn server is started in a subprocess for the loopback run, which is
+what internal callers used to do by posting to ``/api/gemini/analyze``.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.common import summarize  # noqa: E402
+from services.gemini import GeminiService  # noqa: E402
+from services.http_client import http_client  # noqa: E402
+
+PROMPT = "Generate a detailed implementation plan for this GitHub issue: " + "context " * 200
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_healthy(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/api/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not become healthy")
+
+
+async def _run(service: GeminiService, requests: int, concurrency: int) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await service.analyze(PROMPT)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    return {"mode": "loopback" if service.mode == "remote" else "direct", **summarize(latencies, elapsed)}
+
+
+async def main(requests: int, concurrency: int) -> None:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "GEMINI_DISPATCH_MODE": "local"},
+    )
+    try:
+        await _wait_healthy(base_url)
+        await http_client.start()
+        results = [
+            await _run(GeminiService(mode="remote", base_url=base_url), requests, concurrency),
+            await _run(GeminiService(mode="local"), requests, concurrency),
+        ]
+    finally:
+        await http_client.close()
+        server.terminate()
+        server.wait()
+
+    for result in results:
+        print(
+            f"{result['mode']:>8}: {result['throughput_rps']:>10} req/s  "
+            f"p50 {result['p50_ms']}ms  p95 {result['p95_ms']}ms  p99 {result['p99_ms']}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
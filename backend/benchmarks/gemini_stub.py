@@ -0,0 +1,88 @@
+"""Local stand-in for a remote Gemini dispatcher.
+
+Answers ``/api/gemini/{analyze,generate,chat}`` with the same shapes as the
+backend's own routes. Point the backend at it with::
+
+    uvicorn benchmarks.gemini_stub:app --port 9001
+    GEMINI_DISPATCH_MODE=remote KORTANA_BACKEND_URL=http://localhost:9001 uvicorn main:app
+
+``GEMINI_STUB_LATENCY`` adds a per-request delay in seconds, standing in for
+model time and network overhead; batch requests pay it once, however many
+items they carry. ``GEMINI_STUB_MAX_CONCURRENCY`` caps requests in progress,
+standing in for a fixed quota (0 means no cap).
+"""
+import asyncio
+import os
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI
+
+GEMINI_STUB_LATENCY = float(os.getenv("GEMINI_STUB_LATENCY", "0"))
+GEMINI_STUB_MAX_CONCURRENCY = int(os.getenv("GEMINI_STUB_MAX_CONCURRENCY", "0"))
+
+app = FastAPI(title="Gemini stub")
+
+state: Dict[str, int] = {"requests": 0, "items": 0}
+_quota: Optional[asyncio.Semaphore] = None
+
+
+def set_quota(max_concurrency: int) -> None:
+    """Cap concurrent requests (0 for no cap); call from the event loop that serves the stub."""
+    global _quota
+    _quota = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+
+async def _overhead(items: int = 1) -> None:
+    state["requests"] += 1
+    state["items"] += items
+    if _quota is None and GEMINI_STUB_MAX_CONCURRENCY:
+        set_quota(GEMINI_STUB_MAX_CONCURRENCY)
+    if _quota is not None:
+        async with _quota:
+            if GEMINI_STUB_LATENCY:
+                await asyncio.sleep(GEMINI_STUB_LATENCY)
+    elif GEMINI_STUB_LATENCY:
+        await asyncio.sleep(GEMINI_STUB_LATENCY)
+
+
+async def _respond(payload: Dict[str, Any]) -> Dict[str, Any]:
+    await _overhead()
+    return payload
+
+
+def _analysis(text: str) -> Dict[str, Any]:
+    return {"analysis": f"Stub analysis of {len(text)} characters: fix the api bug and optimize performance."}
+
+
+def _code(description: str) -> Dict[str, Any]:
+    return {"description": description, "code": f"# Stub code for: {description[:80]}"}
+
+
+@app.post("/api/gemini/analyze")
+async def analyze(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return await _respond(_analysis(payload.get("text", "")))
+
+
+@app.post("/api/gemini/generate")
+async def generate(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return await _respond(_code(payload.get("description", "")))
+
+
+@app.post("/api/gemini/chat")
+async def chat(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return await _respond({"response": f"Stub reply to: {payload.get('message', '')[:80]}"})
+
+
+async def _batch(items: List[Dict[str, Any]], field: str, answer) -> Dict[str, Any]:
+    await _overhead(len(items))
+    return {"results": [{"result": answer(item.get(field, ""))} for item in items]}
+
+
+@app.post("/api/gemini/analyze/batch")
+async def analyze_batch(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return await _batch(payload.get("items", []), "text", _analysis)
+
+
+@app.post("/api/gemini/generate/batch")
+async def generate_batch(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return await _batch(payload.get("items", []), "description", _code)
@@ -0,0 +1,134 @@
+"""Local stand-in for the parts of the GitHub REST API the backend uses.
+
+Serves paginated issues and pulls with ``Link`` headers, answers
+``If-None-Match`` with ``304``, tracks an ``X-RateLimit-*`` budget and
+accepts ref creation. Point the backend at it with::
+
+    uvicorn benchmarks.github_stub:app --port 9000
+    GITHUB_API_URL=http://localhost:9000 GITHUB_TOKEN=stub uvicorn main:app
+
+``STUB_ISSUES`` sets how many open issues exist and ``STUB_LATENCY`` adds a
+per-request delay in seconds.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request, Response
+
+STUB_ISSUES = int(os.getenv("STUB_ISSUES", "250"))
+STUB_LATENCY = float(os.getenv("STUB_LATENCY", "0"))
+STUB_RATE_LIMIT = int(os.getenv("STUB_RATE_LIMIT", "5000"))
+
+app = FastAPI(title="GitHub stub")
+
+state: Dict[str, Any] = {
+    "remaining": STUB_RATE_LIMIT,
+    "reset": int(time.time()) + 3600,
+    "refs": {"refs/heads/main": "0" * 40},
+    "requests": 0,
+}
+
+
+def make_issues(count: int) -> List[Dict[str, Any]]:
+    now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    return [
+        {
+            "number": number,
+            "title": f"Stub issue {number}: improve things",
+            "body": f"Body of stub issue {number}",
+            "state": "open",
+            "updated_at": now,
+        }
+        for number in range(1, count + 1)
+    ]
+
+
+issues = make_issues(STUB_ISSUES)
+
+
+def rate_headers() -> Dict[str, str]:
+    return {
+        "X-RateLimit-Limit": str(STUB_RATE_LIMIT),
+        "X-RateLimit-Remaining": str(state["remaining"]),
+        "X-RateLimit-Reset": str(state["reset"]),
+        "X-RateLimit-Resource": "core",
+    }
+
+
+async def paginated(request: Request, items: List[Dict[str, Any]]) -> Response:
+    state["requests"] += 1
+    if STUB_LATENCY:
+        await asyncio.sleep(STUB_LATENCY)
+
+    per_page = int(request.query_params.get("per_page", 30))
+    page = int(request.query_params.get("page", 1))
+    body = json.dumps(items[(page - 1) * per_page:page * per_page])
+    etag = f'"{hashlib.md5(body.encode()).hexdigest()}"'
+
+    # Conditional hits do not consume the budget, as on GitHub
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, **rate_headers()})
+    state["remaining"] = max(0, state["remaining"] - 1)
+
+    headers = {"ETag": etag, **rate_headers()}
+    last_page = max(1, -(-len(items) // per_page))
+    base = str(request.url.remove_query_params("page"))
+    links = []
+    if page < last_page:
+        links.append(f'<{base}&page={page + 1}>; rel="next"')
+        links.append(f'<{base}&page={last_page}>; rel="last"')
+    if links:
+        headers["Link"] = ", ".join(links)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/repos/{owner}/{repo}/issues")
+async def list_issues(owner: str, repo: str, request: Request) -> Response:
+    selected = issues
+    since = request.query_params.get("since")
+    if since:
+        selected = [issue for issue in issues if issue["updated_at"] >= since]
+    state_filter = request.query_params.get("state", "open")
+    if state_filter != "all":
+        selected = [issue for issue in selected if issue["state"] == state_filter]
+    return await paginated(request, selected)
+
+
+@app.get("/repos/{owner}/{repo}/pulls")
+async def list_pulls(owner: str, repo: str, request: Request) -> Response:
+    return await paginated(request, [])
+
+
+@app.get("/repos/{owner}/{repo}/branches")
+async def list_branches(owner: str, repo: str, request: Request) -> Response:
+    names = sorted(ref[len("refs/heads/"):] for ref in state["refs"])
+    return await paginated(request, [{"name": name} for name in names])
+
+
+@app.get("/repos/{owner}/{repo}/git/ref/heads/{branch:path}")
+async def get_ref(owner: str, repo: str, branch: str) -> Response:
+    state["requests"] += 1
+    if STUB_LATENCY:
+        await asyncio.sleep(STUB_LATENCY)
+    sha = state["refs"].get(f"refs/heads/{branch}")
+    if sha is None:
+        return Response(status_code=404, headers=rate_headers())
+    body = json.dumps({"ref": f"refs/heads/{branch}", "object": {"sha": sha, "type": "commit"}})
+    return Response(content=body, media_type="application/json", headers=rate_headers())
+
+
+@app.post("/repos/{owner}/{repo}/git/refs")
+async def create_ref(owner: str, repo: str, request: Request) -> Response:
+    state["requests"] += 1
+    if STUB_LATENCY:
+        await asyncio.sleep(STUB_LATENCY)
+    payload = await request.json()
+    if payload["ref"] in state["refs"]:
+        return Response(status_code=422, content=json.dumps({"message": "Reference already exists"}), headers=rate_headers())
+    state["refs"][payload["ref"]] = payload["sha"]
+    state["remaining"] = max(0, state["remaining"] - 1)
+    return Response(status_code=201, content=json.dumps({"ref": payload["ref"], "object": {"sha": payload["sha"]}}), headers=rate_headers())
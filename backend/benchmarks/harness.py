@@ -0,0 +1,57 @@
+"""Boot ``main.app`` in-process against stubbed Gemini and GitHub backends.
+
+Import this module before anything from ``main``, ``routers`` or
+``services``: the backend reads its configuration from the environment at
+import time, and the defaults set here select in-memory storage, remote
+Gemini dispatch and the GitHub API, all pointed at hosts that are answered by
+the stub apps over an in-process ASGI transport. No sockets are opened.
+"""
+import os
+import sys
+import tempfile
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+GEMINI_STUB_URL = "http://gemini.stub"
+GITHUB_STUB_URL = "http://github.stub"
+
+os.environ.setdefault("KORTANA_STORAGE", "memory")
+os.environ.setdefault("GEMINI_DISPATCH_MODE", "remote")
+os.environ.setdefault("KORTANA_BACKEND_URL", GEMINI_STUB_URL)
+os.environ.setdefault("GITHUB_API_URL", GITHUB_STUB_URL)
+os.environ.setdefault("GITHUB_TOKEN", "stub")
+os.environ.setdefault("STUB_ISSUES", "1000")
+# Every benchmark request comes from one client; only the concurrency limits apply
+os.environ.setdefault("ADMISSION_CLIENT_RATE", "1000000")
+os.environ.setdefault("ADMISSION_CLIENT_BURST", "1000000")
+os.environ.setdefault("LLM_CACHE_DIR", tempfile.mkdtemp(prefix="kortana-bench-cache-"))
+
+import httpx  # noqa: E402
+
+from benchmarks import gemini_stub, github_stub  # noqa: E402
+from main import app, lifespan  # noqa: E402
+from services.http_client import http_client  # noqa: E402
+
+STUB_HOSTS = {
+    httpx.URL(GEMINI_STUB_URL).host: gemini_stub.app,
+    httpx.URL(GITHUB_STUB_URL).host: github_stub.app,
+}
+
+
+async def stub_backends(scope, receive, send) -> None:
+    """ASGI app routing outbound calls to the stub matching their ``Host``."""
+    host = dict(scope.get("headers", [])).get(b"host", b"").decode().split(":")[0]
+    await STUB_HOSTS.get(host, github_stub.app)(scope, receive, send)
+
+
+@asynccontextmanager
+async def app_client() -> AsyncIterator[httpx.AsyncClient]:
+    """Run the app's lifespan and yield a client that calls it in-process."""
+    http_client.transport = httpx.ASGITransport(app=stub_backends)
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://kortana.bench", timeout=60) as client:
+            yield client
@@ -0,0 +1,87 @@
+"""HTTP load scenarios against the in-process app.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.load --requests 1000 --concurrency 32
+
+Each scenario fires ``requests`` calls at ``concurrency`` through the ASGI
+transport set up by ``benchmarks.harness``, so the numbers cover routing,
+validation, handlers and serialization, with Gemini and GitHub stubbed.
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+import httpx
+
+from benchmarks.common import format_result, summarize
+from benchmarks.harness import app_client
+from benchmarks.micro import make_text
+
+Request = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+async def _drive(client: httpx.AsyncClient, call: Request, requests: int, concurrency: int) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            begin = time.perf_counter()
+            response = await call(client, i)
+            latencies.append(time.perf_counter() - begin)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+async def run(requests: int = 500, concurrency: int = 16, seed_insights: int = 2000) -> Dict[str, Dict[str, Any]]:
+    """Results keyed by ``http.<scenario>``."""
+    rng = random.Random(42)
+    contents = [make_text(rng, 60) for _ in range(requests + seed_insights)]
+
+    async def ingest(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.post("/api/knowledge/ingest", json={"content": contents[i], "source": "load"})
+
+    async def search(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.get("/api/knowledge/search", params={"query": contents[i].split()[0], "limit": 10})
+
+    async def status(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.get("/api/autonomy/status")
+
+    results: Dict[str, Dict[str, Any]] = {}
+    async with app_client() as client:
+        results["http.ingest"] = await _drive(client, ingest, requests, concurrency)
+
+        # Search over a larger corpus than the ingest scenario alone leaves behind
+        seed = lambda c, i: ingest(c, requests + i)  # noqa: E731
+        await _drive(client, seed, seed_insights, concurrency)
+        results["http.search"] = await _drive(client, search, requests, concurrency)
+
+        queued = (await client.post("/api/autonomy/task-queue")).json()["tasks"]
+        results["http.status"] = await _drive(client, status, requests, concurrency)
+
+        # Every execution needs its own pending task
+        task_ids = [task["id"] for task in queued]
+
+        async def execute(client: httpx.AsyncClient, i: int) -> httpx.Response:
+            return await client.post(f"/api/autonomy/execute/{task_ids[i]}")
+
+        results["http.execute"] = await _drive(client, execute, min(requests, len(task_ids)), concurrency)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    for name, result in asyncio.run(run(args.requests, args.concurrency)).items():
+        print(format_result(name, result))
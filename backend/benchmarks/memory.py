@@ -0,0 +1,192 @@
+"""Memory per stored insight and task, plain dicts versus compact records.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.memory --records 20000
+
+Insights and tasks are produced by the routers' own code paths, serialized
+as the storage backend persists them, then loaded back under ``tracemalloc``
+once as plain dicts and once as ``InsightRecord``/``TaskRecord``. Shared
+values such as interned tags are counted once, as they are in a running
+process. ``load_us`` is the time to build a compact record from the form
+storage persists it in, which keeps long text compressed.
+
+The local Gemini placeholder echoes its prompt, which would make the stored
+analysis nearly free to compress, so while records are built the analysis
+is replaced by ``make_analysis``: structured prose of the kind a model
+returns, mentioning words of the content rather than quoting it.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Records are built in-process with the placeholder Gemini output, without the LLM cache
+os.environ.setdefault("GEMINI_DISPATCH_MODE", "local")
+os.environ.setdefault("LLM_CACHE_DIR", "")
+from benchmarks import harness  # noqa: E402,F401  (configures the rest of the environment)
+from benchmarks.micro import make_text  # noqa: E402
+from routers.autonomy import PLAN_PROMPT, TaskRecord, task_queue_manager  # noqa: E402
+from routers.knowledge import INSIGHT_PROMPT, InsightRecord, knowledge_manager  # noqa: E402
+from services.gemini import gemini_service  # noqa: E402
+from services.records import stored_default  # noqa: E402
+
+SOURCES = ["github", "slack", "ci", "review"]
+HEADINGS = (
+    "Technical approach",
+    "Problems and solutions",
+    "Code quality",
+    "Process",
+    "Architecture",
+    "Testing strategy",
+    "Risks",
+)
+# Words of the prompt templates, which an analysis mentions less than those of the content
+PROMPT_WORDS = set((INSIGHT_PROMPT + PLAN_PROMPT).split())
+OPENINGS = (
+    "The main issue is that",
+    "Looking at the change,",
+    "In practice",
+    "A simpler option is that",
+    "It is worth noting that",
+    "Before merging,",
+    "Longer term,",
+    "The logs suggest",
+)
+SUBJECTS = (
+    "the {word} handler",
+    "the retry loop around {word}",
+    "the {word} cache",
+    "every request touching {word}",
+    "the migration for {word}",
+    "the background job",
+    "the {word} client",
+    "the test suite",
+)
+PREDICATES = (
+    "recomputes the same result on each call",
+    "holds a lock while waiting on the network",
+    "should validate its input before doing any work",
+    "needs a timeout so slow calls cannot pile up",
+    "could be batched to cut round trips",
+    "duplicates logic that already exists in {word}",
+    "hides failures by logging and carrying on",
+    "would benefit from a focused benchmark",
+    "makes the failure mode hard to reproduce locally",
+    "should be behind a feature flag until it settles",
+)
+CLOSINGS = (
+    "",
+    " so the fix belongs there.",
+    " which explains the latency spikes.",
+    " and a regression test would catch it next time.",
+    " before anyone depends on it.",
+    " rather than in each caller.",
+)
+
+
+def make_analysis(prompt: str) -> str:
+    """Markdown analysis of ``prompt`` that mentions its words without echoing it."""
+    rng = random.Random(zlib.crc32(prompt.encode()))
+    words = [word for word in prompt.split() if word.isalnum() and len(word) > 3 and word not in PROMPT_WORDS]
+    lines = []
+    for heading in rng.sample(HEADINGS, rng.randrange(3, 6)):
+        lines.append(f"**{heading}**")
+        for _ in range(rng.randrange(1, 4)):
+            sentence = " ".join(
+                (rng.choice(OPENINGS), rng.choice(SUBJECTS), rng.choice(PREDICATES))
+            ).format(word=rng.choice(words or ["change"]))
+            lines.append(f"- {sentence}{rng.choice(CLOSINGS) or '.'}")
+    return "\n".join(lines)
+
+
+@contextmanager
+def realistic_analysis() -> Iterator[None]:
+    """Have the Gemini service answer with ``make_analysis`` instead of echoing the prompt."""
+
+    async def analyze(text: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return {"input": text, "analysis": make_analysis(text)}
+
+    gemini_service._analyze = analyze
+    try:
+        yield
+    finally:
+        del gemini_service._analyze
+
+
+async def make_insight(rng: random.Random) -> Dict[str, Any]:
+    return await knowledge_manager.extract_insights(make_text(rng, 120), rng.choice(SOURCES))
+
+
+async def make_task(rng: random.Random) -> Dict[str, Any]:
+    number = rng.randrange(1, 10 ** 6)
+    task = task_queue_manager._task_from_issue({"number": number, "title": make_text(rng, 8), "body": make_text(rng, 80)})
+    now = datetime.now().isoformat()
+    task.update(status="completed", queued_at=now, started_at=now, branch_created=True, completed_at=now)
+    task["plan"] = await task_queue_manager.generate_task_plan(task)
+    return task
+
+
+def _load(row: str) -> Dict[str, Any]:
+    # Keys are shared strings in a running process, not one copy per record
+    return {sys.intern(key): value for key, value in json.loads(row).items()}
+
+
+def measure(build: Callable[[], List[Any]]) -> float:
+    """Bytes retained per element of the list ``build`` returns."""
+    gc.collect()
+    tracemalloc.start()
+    items = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / len(items)
+
+
+async def _rows(make: Callable[[random.Random], Any], records: int) -> List[str]:
+    rng = random.Random(42)
+    with realistic_analysis():
+        return [json.dumps(await make(rng)) for _ in range(records)]
+
+
+def run(records: int) -> Dict[str, Dict[str, float]]:
+    """Results keyed by ``memory.<record kind>.<records>``."""
+    results = {}
+    for name, make, record_type in (("insight", make_insight, InsightRecord), ("task", make_task, TaskRecord)):
+        rows = asyncio.run(_rows(make, records))
+        dict_bytes = measure(lambda: [_load(row) for row in rows])
+        compact_bytes = measure(lambda: [record_type(_load(row)) for row in rows])
+        stored = [json.dumps(record_type(json.loads(row)), default=stored_default) for row in rows]
+        start = time.perf_counter()
+        for row in stored:
+            record_type(json.loads(row))
+        results[f"memory.{name}.{records}"] = {
+            "dict_bytes": round(dict_bytes, 1),
+            "compact_bytes": round(compact_bytes, 1),
+            "reduction": round(dict_bytes / compact_bytes, 2),
+            "load_us": round((time.perf_counter() - start) / records * 1e6, 1),
+        }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=20000)
+    args = parser.parse_args()
+    for name, result in run(args.records).items():
+        print(
+            f"{name:<30} dict {result['dict_bytes']:>8} B  compact {result['compact_bytes']:>8} B  "
+            f"{result['reduction']}x smaller, {result['load_us']} us to load"
+        )
+
+
+if __name__ == "__main__":
+    main()
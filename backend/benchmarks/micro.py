@@ -0,0 +1,141 @@
+"""Micro-benchmarks for knowledge search and tag extraction.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.micro --sizes 10000,100000,1000000
+
+The knowledge base is grown to each size in turn with synthetic insights
+(added straight to the store and keyword index, without Gemini), then timed
+with keyword searches, tag-filtered searches, ``_extract_tags``, batch
+tagging through ``tag_engine.tag_many`` and the near-duplicate check run at
+ingest (signature plus LSH query). The 1M
+size needs several GB of memory for the inverted index.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from benchmarks import harness  # noqa: F401  (configures the environment first)
+from benchmarks.common import format_result, summarize
+from routers.knowledge import _timestamp_key, knowledge_manager
+from services.tagging import tag_engine
+
+WORDS = (
+    "api endpoint router backend frontend react component test pytest coverage deploy docker cloud "
+    "cache latency throughput index query database migration schema queue worker retry timeout "
+    "token stream batch pool connection session auth webhook branch issue commit review refactor "
+    "error fix bug performance optimize memory profile trace metric alert config release"
+).split()
+# Long tail of rarer terms so postings lists resemble real text rather than a 60-word vocabulary
+RARE_WORDS = [f"term{i}" for i in range(5000)]
+SOURCES = ("github_issue", "pull_request", "commit", "review", "incident")
+QUERIES = ("cache latency", "fix bug", "docker deploy", "webhook retry timeout", "index query performance")
+TAGS = ("backend", "debugging", "performance", "deployment")
+DEFAULT_SIZES = "10000,100000"
+
+
+def make_text(rng: random.Random, words: int) -> str:
+    common = rng.choices(WORDS, k=words // 4)
+    return " ".join(common + rng.choices(RARE_WORDS, k=words - len(common)))
+
+
+def make_insight(i: int, rng: random.Random, now: datetime) -> Dict[str, Any]:
+    content = make_text(rng, 40)
+    insights = make_text(rng, 20)
+    return {
+        "id": f"bench-{i:08d}",
+        "source": rng.choice(SOURCES),
+        "content": content,
+        "insights": insights,
+        "metadata": {},
+        "timestamp": (now - timedelta(minutes=i)).isoformat(),
+        "tags": knowledge_manager._extract_tags(content, insights),
+    }
+
+
+def fill(target: int, rng: random.Random, now: datetime) -> None:
+    """Grow the knowledge base, keyword index and duplicate index to ``target`` insights."""
+    store = knowledge_manager.knowledge
+    dedup = knowledge_manager.dedup
+    for i in range(len(store), target):
+        insight = store.add(make_insight(i, rng, now))
+        text = f"{insight['content']}\n{insight['insights']}"
+        knowledge_manager.index.add(insight["id"], text, insight, recency=_timestamp_key(insight["timestamp"]))
+        dedup.add(insight["id"], dedup.signature(insight["content"]))
+
+
+async def _time_search(queries: int, tags: bool) -> Dict[str, Any]:
+    latencies: List[float] = []
+    start = time.perf_counter()
+    for i in range(queries):
+        begin = time.perf_counter()
+        await knowledge_manager.search_knowledge(
+            QUERIES[i % len(QUERIES)], [TAGS[i % len(TAGS)]] if tags else None, limit=10, mode="keyword"
+        )
+        latencies.append(time.perf_counter() - begin)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def _time_extract_tags(size: int, samples: List[Tuple[str, str]]) -> Dict[str, Any]:
+    """Tag ``size`` items, cycling through ``samples``."""
+    latencies: List[float] = []
+    start = time.perf_counter()
+    for i in range(size):
+        content, analysis = samples[i % len(samples)]
+        begin = time.perf_counter()
+        knowledge_manager._extract_tags(content, analysis)
+        latencies.append(time.perf_counter() - begin)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def _time_tag_batch(size: int, samples: List[Tuple[str, str]], batch_size: int = 1000) -> Dict[str, Any]:
+    """Tag ``size`` items through ``tag_many`` in batches of ``batch_size``."""
+    documents = [samples[i % len(samples)] for i in range(size)]
+    latencies: List[float] = []
+    start = time.perf_counter()
+    for offset in range(0, size, batch_size):
+        begin = time.perf_counter()
+        tag_engine.tag_many(documents[offset:offset + batch_size])
+        latencies.append(time.perf_counter() - begin)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def _time_dedup(samples: List[Tuple[str, str]]) -> Dict[str, Any]:
+    """Near-duplicate check of each sample's content against the whole index."""
+    dedup = knowledge_manager.dedup
+    latencies: List[float] = []
+    start = time.perf_counter()
+    for content, _ in samples:
+        begin = time.perf_counter()
+        dedup.query(dedup.signature(content))
+        latencies.append(time.perf_counter() - begin)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+async def run(sizes: List[int], queries: int = 200, tag_samples: int = 1000) -> Dict[str, Dict[str, Any]]:
+    """Results keyed by ``micro.<operation>.<size>``."""
+    rng = random.Random(42)
+    now = datetime.now()
+    sample_rng = random.Random(7)
+    samples = [(make_text(sample_rng, 40), make_text(sample_rng, 20)) for _ in range(tag_samples)]
+    results: Dict[str, Dict[str, Any]] = {}
+    for size in sorted(sizes):
+        fill(size, rng, now)
+        results[f"micro.search_knowledge.{size}"] = await _time_search(queries, tags=False)
+        results[f"micro.search_knowledge_tagged.{size}"] = await _time_search(queries, tags=True)
+        results[f"micro.extract_tags.{size}"] = _time_extract_tags(size, samples)
+        results[f"micro.tag_batch.{size}"] = _time_tag_batch(size, samples)
+        results[f"micro.dedup_check.{size}"] = _time_dedup(samples)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated knowledge base sizes")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    for name, result in asyncio.run(run([int(s) for s in args.sizes.split(",")], args.queries)).items():
+        print(format_result(name, result))
@@ -0,0 +1,64 @@
+"""Run the micro-benchmarks and HTTP load scenarios and save the results.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.run --output benchmarks/results.json
+    python -m benchmarks.run --profile ci --output bench.json
+
+Compare a run against a baseline with ``python -m benchmarks.compare``.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+from benchmarks import load, micro, startup
+from benchmarks.common import format_result
+
+# Sizes and request counts per profile; "ci" keeps a pipeline run to about a minute
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "ci": {"sizes": [10000], "queries": 100, "requests": 300, "concurrency": 16, "startups": 3},
+    "default": {"sizes": [10000, 100000], "queries": 200, "requests": 1000, "concurrency": 32, "startups": 5},
+    "full": {"sizes": [10000, 100000, 1000000], "queries": 200, "requests": 5000, "concurrency": 64, "startups": 10},
+}
+
+
+async def run(profile: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    results = await micro.run(profile["sizes"], profile["queries"])
+    results.update(await load.run(profile["requests"], profile["concurrency"]))
+    # Each start is a separate server process, so this measures no in-process state
+    results.update(await asyncio.to_thread(startup.run, profile["startups"]))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="default")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    profile = PROFILES[args.profile]
+    results = asyncio.run(run(profile))
+    for name, result in results.items():
+        print(format_result(name, result))
+
+    if args.output:
+        report = {
+            "meta": {
+                "profile": args.profile,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Keyword search at scale: pruned top-k against exhaustive BM25.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.search --docs 1000000
+
+Builds an ``InvertedIndex`` of synthetic documents (the ``benchmarks.micro``
+vocabulary: a few dozen common words and a long tail of rare ones, plus
+"the" in nearly every document as a stopword stand-in) and times queries
+through ``search`` and through scoring every matching document, checking
+that both return the same results. 1M documents of the default 20 words
+need about 2 GB.
+
+Every document has the same length here, so impact tiers split only by
+term frequency; queries of three or more common words are the slowest case.
+"""
+import argparse
+import heapq
+import random
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.common import format_result, summarize
+from benchmarks.micro import RARE_WORDS, WORDS, make_text
+from services.search_index import InvertedIndex
+
+# Common words only; a rare word with common ones; the stopword with both
+QUERIES = {
+    "common": ("cache latency", "fix bug", "docker deploy", "webhook retry timeout", "index query performance"),
+    "mixed": ("term42 cache latency", "term1234 fix bug", "term7 term99 deploy", "term4000 index query"),
+    "stopword": ("the cache latency", "the term42 fix bug", "how the deploy works", "the term7 the index"),
+}
+
+
+def build(docs: int, words: int, seed: int = 42) -> InvertedIndex:
+    rng = random.Random(seed)
+    index = InvertedIndex()
+    for i in range(docs):
+        text = make_text(rng, words)
+        if rng.random() < 0.95:
+            text = f"the {text}"
+        index.add(f"doc-{i:08d}", text, i, recency=float(i))
+    return index
+
+
+def exhaustive(index: InvertedIndex, query: str, limit: int) -> List[Tuple[Any, float]]:
+    scores = index.score(query)
+    best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], index.recency[item[0]], item[0]))
+    return [(index.documents[doc_id], score) for doc_id, score in best]
+
+
+def _time(search: Callable[[str], List[Tuple[Any, float]]], queries: Tuple[str, ...], repeat: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    start = time.perf_counter()
+    for i in range(repeat):
+        begin = time.perf_counter()
+        search(queries[i % len(queries)])
+        latencies.append(time.perf_counter() - begin)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def run(docs: int, words: int = 20, repeat: int = 20, limit: int = 10) -> Dict[str, Dict[str, Any]]:
+    """Results keyed by ``search.<query kind>.<pruned|exhaustive>.<docs>``."""
+    index = build(docs, words)
+    results: Dict[str, Dict[str, Any]] = {}
+    for kind, queries in QUERIES.items():
+        for query in queries:
+            pruned = [document for document, _ in index.search(query, limit)]
+            if pruned != [document for document, _ in exhaustive(index, query, limit)]:
+                raise AssertionError(f"Pruned search disagrees with exhaustive scoring for {query!r}")
+        results[f"search.{kind}.pruned.{docs}"] = _time(lambda q: index.search(q, limit), queries, repeat)
+        results[f"search.{kind}.exhaustive.{docs}"] = _time(lambda q: exhaustive(index, q, limit), queries, repeat)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=100000)
+    parser.add_argument("--words", type=int, default=20, help="words per document")
+    parser.add_argument("--repeat", type=int, default=20, help="timed queries per query kind")
+    args = parser.parse_args()
+    print(f"{len(WORDS)} common and {len(RARE_WORDS)} rare words, {args.words} per document")
+    for name, result in run(args.docs, args.words, args.repeat).items():
+        print(format_result(name, result))
+
+
+if __name__ == "__main__":
+    main()
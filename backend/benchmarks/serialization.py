@@ -0,0 +1,142 @@
+"""Measure response serialization for the heaviest JSON endpoints.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.serialization --items 500 --rounds 200
+
+Each endpoint's representative payload is serialized the way the app does it
+now (the route's response model, dumped straight to JSON bytes by Pydantic)
+and compared with ``jsonable_encoder`` followed by the stdlib ``json`` module
+or orjson, which is what untyped routes and ``ORJSONResponse`` cost.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.routing import APIRoute, serialize_response  # noqa: E402
+
+from routers import agents, autonomy, knowledge, memory  # noqa: E402
+
+ROUTERS = {"agents": agents.router, "autonomy": autonomy.router, "knowledge": knowledge.router, "memory": memory.router}
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _insight(i: int) -> Dict[str, Any]:
+    return {
+        "id": f"{i:08x}",
+        "source": "github_issue",
+        "content": "Refactored the connection pool to reuse clients across requests. " * 6,
+        "insights": "Pooling removed the per-request TLS handshake; keep clients long-lived. " * 4,
+        "metadata": {"issue": i, "repo": "KOR-TANA/kortana"},
+        "timestamp": "2026-10-17T12:00:00",
+        "tags": ["python", "api", "performance"],
+    }
+
+
+def _task(i: int) -> Dict[str, Any]:
+    return {
+        "id": f"issue-{i}",
+        "type": "github_issue",
+        "title": f"Improve throughput of endpoint {i}",
+        "description": "The endpoint spends most of its time serializing nested lists. " * 3,
+        "github_issue_number": i,
+        "status": "pending",
+        "created_at": "2026-10-17T12:00:00",
+        "branch_name": f"feature/{i}-improve-throughput-of-endpoint",
+        "plan": "1. Profile\n2. Add response models\n3. Benchmark",
+    }
+
+
+def payloads(items: int) -> Dict[str, Dict[str, Any]]:
+    """Representative response bodies keyed by ``METHOD path``."""
+    return {
+        "GET /api/knowledge/search": {
+            "query": "pool",
+            "mode": "keyword",
+            "tags": None,
+            "total_results": items,
+            "results": [_insight(i) for i in range(items)],
+        },
+        "GET /api/autonomy/status": {
+            "total_tasks": items,
+            "pending": items,
+            "queued": 0,
+            "in_progress": 0,
+            "completed": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "tasks": [_task(i) for i in range(items)],
+        },
+        "GET /api/memory/documents": {
+            "documents": [{"id": i, "title": f"Doc {i}", "content": "text " * 80} for i in range(items)],
+            "next_cursor": None,
+        },
+        "GET /api/agents/list": {
+            "agents": [
+                {"id": i, "name": f"agent-{i}", "description": "Triage bot", "capabilities": ["triage", "label"], "status": "created"}
+                for i in range(items)
+            ],
+            "next_cursor": None,
+        },
+    }
+
+
+def _route(key: str) -> APIRoute:
+    method, path = key.split(" ", 1)
+    _, _, prefix, subpath = path.split("/", 3)
+    for route in ROUTERS[prefix].routes:
+        if isinstance(route, APIRoute) and route.path == f"/{subpath}" and method in route.methods:
+            return route
+    raise LookupError(key)
+
+
+def _time(func: Callable[[], Any], rounds: int) -> float:
+    func()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main(items: int, rounds: int) -> None:
+    loop = asyncio.new_event_loop()
+    for key, payload in payloads(items).items():
+        route = _route(key)
+
+        def response_model() -> bytes:
+            return loop.run_until_complete(
+                serialize_response(field=route.response_field, response_content=payload, dump_json=True)
+            )
+
+        strategies: List[tuple] = [
+            ("response model", response_model),
+            ("encoder + json", lambda: json.dumps(jsonable_encoder(payload)).encode()),
+        ]
+        if orjson is not None:
+            strategies.append(("encoder + orjson", lambda: orjson.dumps(jsonable_encoder(payload))))
+
+        size = len(response_model())
+        print(f"{key}  ({items} items, {size / 1024:.0f} KiB)")
+        for name, func in strategies:
+            print(f"  {name:>18}: {_time(func, rounds):8.3f} ms")
+    loop.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    main(args.items, args.rounds)
@@ -0,0 +1,148 @@
+"""Cold start: time from process launch to the first healthy response.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.startup --runs 5 --report 15
+    python -m benchmarks.startup --baseline benchmarks/baselines/ci.json --threshold 0.25
+    KORTANA_ROUTERS=gemini,github python -m benchmarks.startup
+
+Each run starts uvicorn in a fresh subprocess, as a scaled-from-zero
+container would, and polls ``/api/health`` until it returns 200. With
+``--report`` it also prints where ``import main`` spends its time, from
+``python -X importtime``. With ``--baseline`` the exit status is 1 when
+startup regressed beyond ``--threshold``, the same rule as
+``benchmarks.compare``.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.common import format_result, summarize  # noqa: E402
+from benchmarks.compare import compare, load  # noqa: E402
+
+# First-party packages, reported per module; anything else is reported per top-level package
+FIRST_PARTY = ("main", "routers", "schemas", "services")
+POLL_INTERVAL = 0.005
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _server_env(data_dir: str) -> Dict[str, str]:
+    # Fresh SQLite storage and no disk cache, so every run starts from the same state
+    return {
+        **os.environ,
+        "GEMINI_DISPATCH_MODE": "local",
+        "KORTANA_STORAGE": "sqlite",
+        "KORTANA_DB_PATH": os.path.join(data_dir, "kortana.db"),
+        "LLM_CACHE_DIR": "",
+    }
+
+
+def time_to_healthy(timeout: float = 30.0) -> float:
+    """Seconds from launching a server process to its first 200 from ``/api/health``."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/api/health"
+    with tempfile.TemporaryDirectory() as data_dir:
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env=_server_env(data_dir),
+        )
+        try:
+            with httpx.Client(timeout=1.0) as client:
+                while time.perf_counter() - start < timeout:
+                    if server.poll() is not None:
+                        raise RuntimeError(f"Server exited with status {server.returncode}")
+                    try:
+                        if client.get(url).status_code == 200:
+                            return time.perf_counter() - start
+                    except httpx.HTTPError:
+                        pass
+                    time.sleep(POLL_INTERVAL)
+            raise RuntimeError("Server did not become healthy")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def run(runs: int) -> Dict[str, Dict[str, Any]]:
+    # One unmeasured start first, so bytecode is compiled and the OS file cache is warm
+    time_to_healthy()
+    samples = [time_to_healthy() for _ in range(runs)]
+    result = summarize(samples, sum(samples))
+    # Starts per second says nothing useful; compare only the latency percentiles
+    del result["throughput_rps"]
+    return {"startup.first_healthy": result}
+
+
+def import_report(top: int) -> Tuple[float, List[Tuple[str, float]]]:
+    """Total ``import main`` time and the ``top`` costliest packages, both in milliseconds."""
+    with tempfile.TemporaryDirectory() as data_dir:
+        output = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import main"],
+            cwd=BACKEND_DIR,
+            env=_server_env(data_dir),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stderr
+    self_us: Dict[str, int] = defaultdict(int)
+    main_us = 0
+    for line in output.splitlines():
+        # "import time: self [us] | cumulative | imported package", indented by depth
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, module = line[len("import time:"):].split("|")
+        name = module.strip()
+        if name == "main":
+            main_us = int(cumulative)
+        top_level = name.split(".")[0]
+        self_us[name if top_level in FIRST_PARTY else top_level] += int(own)
+    ranked = sorted(self_us.items(), key=lambda item: item[1], reverse=True)[:top]
+    return main_us / 1000, [(name, us / 1000) for name, us in ranked]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--report", type=int, default=0, metavar="N", help="print the N costliest imports")
+    parser.add_argument("--baseline", help="fail when slower than this results file")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args()
+
+    if args.report:
+        total_ms, ranked = import_report(args.report)
+        print(f"import main: {total_ms:.1f}ms")
+        for name, ms in ranked:
+            print(f"  {name:<40} {ms:>8.1f}ms")
+
+    results = run(args.runs)
+    for name, result in results.items():
+        print(format_result(name, result))
+
+    if args.baseline:
+        lines, regressions = compare(load(args.baseline), results, args.threshold)
+        print("\n".join(line for line in lines if line.startswith("startup.")))
+        if regressions:
+            print(f"\nStartup regressed beyond {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,145 @@
+import asyncio
+import importlib
 import os
 import sys
+from contextlib import asynccontextmanager
+from types import ModuleType
+from typing import Any, Dict, Optional
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 # Add backend directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from services.admission import AdmissionMiddleware, admission
+from services.metrics import MetricsMiddleware, metrics
+from services.storage import STORAGE_COMPACT_INTERVAL, STORAGE_FLUSH_INTERVAL, storage
+from services.store import load_stores_async, loading_stores, sync_stores
+
+# Router module -> mount prefix, in mount order
+ROUTERS = {
+    "gemini": "/api/gemini",
+    "memory": "/api/memory",
+    "agents": "/api/agents",
+    "github": "/api/github",
+    "autonomy": "/api/autonomy",
+    "knowledge": "/api/knowledge",
+}
+# Routers to mount, comma-separated; a router left out is never imported, nor
+# are the services only it uses (numpy for memory and knowledge, for example)
+KORTANA_ROUTERS = [
+    name.strip() for name in os.getenv("KORTANA_ROUTERS", ",".join(ROUTERS)).split(",") if name.strip()
+]
+unknown_routers = sorted(set(KORTANA_ROUTERS) - ROUTERS.keys())
+if unknown_routers:
+    raise ValueError(f"Unknown routers in KORTANA_ROUTERS: {', '.join(unknown_routers)}")
+
 try:
-    from routers import agents, gemini, github, memory, autonomy, knowledge
+    routers = {name: importlib.import_module(f"routers.{name}") for name in ROUTERS if name in KORTANA_ROUTERS}
 except ImportError as e:
     print(f"Error importing routers: {e}")
     raise
 
-app = FastAPI(title="Kor'tana Backend", version="0.1.0")
+
+def loaded_service(name: str) -> Optional[ModuleType]:
+    """``services.<name>`` if a mounted router imported it, else None.
+
+    main starts, stops and reports on shared services (the outbound pool,
+    the scheduler, the agent runner) without importing them, so they load
+    only with a router that uses them.
+    """
+    return sys.modules.get(f"services.{name}")
+
+
+async def flush_storage_periodically():
+    """Commit buffered storage writes, then pick up other workers' writes.
+
+    Runs every ``STORAGE_FLUSH_INTERVAL`` seconds, and as soon as a full batch
+    is buffered: storage then wakes this task rather than committing in the
+    request that filled it.
+    """
+    loop = asyncio.get_running_loop()
+    batch_full = asyncio.Event()
+    storage.on_batch_full = lambda: loop.call_soon_threadsafe(batch_full.set)
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(batch_full.wait(), STORAGE_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            batch_full.clear()
+            await asyncio.to_thread(storage.flush)
+            # Applied on the event loop, which owns the in-memory stores
+            sync_stores()
+    finally:
+        storage.on_batch_full = None
+
+
+async def compact_storage_periodically():
+    """Reclaim the space deleted and overwritten records leave behind, when there is enough of it."""
+    while True:
+        await asyncio.sleep(STORAGE_COMPACT_INTERVAL)
+        try:
+            await asyncio.to_thread(storage.compact)
+        except Exception as e:
+            # Usually another worker holding the database; the next round retries
+            print(f"Error compacting storage: {e}")
+
+
+async def maintain_task_leases():
+    """Renew this worker's task leases and reclaim tasks whose worker is gone."""
+    autonomy = routers["autonomy"]
+    while True:
+        await autonomy.task_queue_manager.renew_leases()
+        await autonomy.task_queue_manager.reclaim_expired()
+        await asyncio.sleep(autonomy.TASK_LEASE_SECONDS / 3)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Stores load in the background while the app serves (health reports "loading"),
+    # instead of by whichever request comes first or before the first health check
+    loader = app.state.loader = asyncio.create_task(load_stores_async())
+    # Let it mark the stores as loading before the first request can reach them
+    await asyncio.sleep(0)
+    http = loaded_service("http_client")
+    scheduler = loaded_service("scheduler")
+    runner = loaded_service("agent_runner")
+    # Shared outbound connection pool lives as long as the app
+    if http is not None:
+        await http.http_client.start()
+    if scheduler is not None:
+        await scheduler.scheduler.start()
+    flusher = asyncio.create_task(flush_storage_periodically())
+    compactor = asyncio.create_task(compact_storage_periodically()) if STORAGE_COMPACT_INTERVAL > 0 else None
+    leases = asyncio.create_task(maintain_task_leases()) if "autonomy" in routers else None
+    try:
+        yield
+    finally:
+        loader.cancel()
+        if leases is not None:
+            leases.cancel()
+        flusher.cancel()
+        if compactor is not None:
+            compactor.cancel()
+        if "knowledge" in routers:
+            await routers["knowledge"].semantic_index.close()
+        if scheduler is not None:
+            await scheduler.scheduler.stop()
+        if runner is not None:
+            runner.agent_runner.close()
+        if http is not None:
+            await http.http_client.close()
+        storage.close()
+
+
+app = FastAPI(title="Kor'tana Backend", version="0.1.0", lifespan=lifespan)
+
+# Innermost, so 429s still carry CORS headers and are counted by the metrics middleware
+if admission.enabled:
+    app.add_middleware(AdmissionMiddleware)
 
 # CORS middleware
 app.add_middleware(
@@ -24,19 +150,69 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so the latency covers every other middleware
+if metrics.enabled:
+    app.add_middleware(MetricsMiddleware)
+
 # Mount routers
 try:
-    app.include_router(gemini.router, prefix="/api/gemini", tags=["gemini"])
-    app.include_router(memory.router, prefix="/api/memory", tags=["memory"])
-    app.include_router(agents.router, prefix="/api/agents", tags=["agents"])
-    app.include_router(github.router, prefix="/api/github", tags=["github"])
-    app.include_router(autonomy.router, prefix="/api/autonomy", tags=["autonomy"])
-    app.include_router(knowledge.router, prefix="/api/knowledge", tags=["knowledge"])
+    for name, module in routers.items():
+        app.include_router(module.router, prefix=ROUTERS[name], tags=[name])
 except Exception as e:
     print(f"Error including routers: {e}")
     raise
 
 
 @app.get("/api/health")
-async def health_check():
-    return {"status": "alive", "message": "Kor'tana backend is breathing"}
+async def health_check(response: Response) -> Dict[str, Any]:
+    """Readiness: 503 until storage, the outbound pool and the scheduler are usable.
+
+    While persisted stores are still loading the app already serves (point
+    lookups are complete, listings and searches partial), and the status is
+    ``loading`` with the records loaded so far per collection.
+    """
+    checks = {"storage": await asyncio.to_thread(storage.ping)}
+    # Only the services the mounted routers use are checked and reported
+    http = loaded_service("http_client")
+    scheduler = loaded_service("scheduler")
+    if http is not None:
+        checks["http_client"] = http.http_client.started
+    if scheduler is not None:
+        checks["scheduler"] = scheduler.scheduler.running
+    integrations = {}
+    gemini = loaded_service("gemini")
+    github = loaded_service("github_client")
+    if gemini is not None:
+        integrations["gemini"] = gemini.gemini_service.mode
+    if github is not None:
+        integrations["github"] = github.github_client.configured
+    loader = getattr(app.state, "loader", None)
+    if loader is not None:
+        # Still loading is fine (see "loading"); a load that failed is not
+        checks["stores"] = not loader.done() or loader.cancelled() or loader.exception() is None
+    ready = all(checks.values())
+    loading = loading_stores() if ready else {}
+    if not ready:
+        response.status_code = 503
+    body = {
+        "status": "loading" if loading else "alive" if ready else "unavailable",
+        "message": "Kor'tana backend is breathing" if ready else "Kor'tana backend is not ready",
+        "checks": checks,
+        "integrations": integrations,
+    }
+    if loading:
+        body["loading"] = loading
+    return body
+
+
+@app.get("/api/admission")
+async def admission_stats() -> Dict[str, Any]:
+    """Admission control state per limited route group, and admitted/rejected counts."""
+    return admission.stats()
+
+
+if metrics.enabled:
+    @app.get("/metrics", include_in_schema=False)
+    async def get_metrics() -> PlainTextResponse:
+        """Prometheus text exposition of the process metrics."""
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
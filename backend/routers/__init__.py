@@ -1,2 +1 @@
-# Routers package
-from . import gemini, memory, agents, github, autonomy, knowledge
+# Routers package; main.py imports the enabled routers by name (KORTANA_ROUTERS)
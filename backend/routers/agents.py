@@ -1,39 +1,85 @@
-from fastapi import APIRouter
-from typing import Any
+import uuid
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, List, Optional, Union
+
+from schemas.agents import AgentBatchResult, AgentCreated, AgentPage, AgentTaskResult
+from services.agent_runner import AGENT_BATCH_MAX, agent_runner
+from services.storage import storage
+from services.store import IndexedStore
+from services.streaming import ndjson_response
 
 router = APIRouter()
 
 # Placeholder for agents - in production, use persistent storage
-agents: list[Any] = []
+agents = IndexedStore(storage=storage, collection="agents")
+
+@router.get("/list", response_model=AgentPage)
+async def list_agents(cursor: int = 0, limit: Optional[int] = None):
+    """List created agents, all of them unless ``limit`` is given."""
+    if limit is None:
+        return {"agents": agents.list()[max(cursor, 0):], "next_cursor": None}
+    page = agents.page(cursor, limit)
+    end = max(cursor, 0) + len(page)
+    return {"agents": page, "next_cursor": end if end < len(agents) else None}
 
-@router.get("/list")
-async def list_agents():
-    """List all created agents."""
-    return {"agents": agents}
+@router.get("/list/stream")
+async def stream_agents():
+    """Stream every agent as NDJSON."""
+    return ndjson_response(agents.list())
 
-@router.post("/create")
+@router.post("/create", response_model=AgentCreated)
 async def create_agent(payload: dict):
     """Create a new agent."""
     name = payload.get("name", "")
     description = payload.get("description", "")
     capabilities = payload.get("capabilities", [])
     agent = {
-        "id": len(agents),
+        # Unique across concurrent creates and workers, unlike a count
+        "id": uuid.uuid4().hex,
         "name": name,
         "description": description,
         "capabilities": capabilities,
         "status": "created"
     }
-    agents.append(agent)
+    agents.add(agent)
     return {"message": "Agent created", "agent": agent}
 
-@router.post("/execute/{agent_id}")
-async def execute_agent(agent_id: int, payload: dict):
-    """Execute an agent with given input."""
-    if agent_id >= len(agents):
-        return {"error": "Agent not found"}
-    agent = agents[agent_id]
-    task = payload.get("task", "")
-    # Placeholder execution - implement actual agent logic
-    result = f"Agent {agent['name']} executed task: {task}"
-    return {"agent": agent["name"], "task": task, "result": result}
+def _get_agent(agent_id: str) -> Dict[str, Any]:
+    agent = agents.get(agent_id)
+    if agent is None and agent_id.isdigit():
+        agent = agents.get(int(agent_id))
+    if agent is None:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    return agent
+
+def _batch(payload: dict) -> List[Any]:
+    tasks = payload.get("tasks")
+    if not isinstance(tasks, list) or not tasks:
+        raise HTTPException(status_code=400, detail="tasks must be a non-empty list")
+    if len(tasks) > AGENT_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {AGENT_BATCH_MAX} tasks per batch")
+    return tasks
+
+@router.post("/execute/{agent_id}", response_model=Union[AgentTaskResult, AgentBatchResult])
+async def execute_agent(agent_id: str, payload: dict) -> Dict[str, Any]:
+    """Execute an agent with given input.
+
+    ``{"task": ...}`` runs one task and returns its result; ``{"tasks": [...]}``
+    runs a batch concurrently and returns every result in order. A task is
+    text, or ``{"action": ..., "input": ...}`` naming one of the agent's
+    capabilities.
+    """
+    agent = _get_agent(agent_id)
+    if "tasks" not in payload:
+        return await agent_runner.run(agent, payload.get("task", ""))
+    results = [result async for result in agent_runner.run_many(agent, _batch(payload))]
+    results.sort(key=lambda result: result["index"])
+    succeeded = sum(result["status"] == "succeeded" for result in results)
+    return {"agent": agent["name"], "succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+
+@router.post("/execute/{agent_id}/stream")
+async def stream_agent_execution(agent_id: str, payload: dict) -> StreamingResponse:
+    """Run a batch and stream each task's result as NDJSON as soon as it finishes."""
+    agent = _get_agent(agent_id)
+    return ndjson_response(agent_runner.run_many(agent, _batch(payload)))
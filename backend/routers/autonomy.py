@@ -1,163 +1,570 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+import asyncio
+import hashlib
+import hmac
 import os
-import requests
-from typing import List, Dict, Any, Optional
+import re
+import time
+import unicodedata
+from typing import List, Dict, Any, Optional, AsyncIterator, Set, Tuple
 from datetime import datetime
 import json
 
+from schemas.autonomy import (
+    CancelResponse,
+    ExecuteResponse,
+    PrepareBranchesRequest,
+    PrepareBranchesResponse,
+    SchedulerStatus,
+    TaskProgress,
+    TaskQueueResponse,
+    TaskQueueStatus,
+)
+from services.gemini import GeminiError, gemini_service
+from services.github_client import GitHubError, github_client
+from services.metrics import metrics
+from services.records import CompactRecord, Field, Symbol, Text, Timestamp
+from services.scheduler import Job, scheduler
+from services.storage import WORKER_ID, storage
+from services.store import IndexedStore, field_index
+from services.streaming import sse_event, sse_response
+
 router = APIRouter()
 
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 REPO_OWNER = os.getenv("GITHUB_REPO_OWNER", "KOR-TANA")
 REPO_NAME = os.getenv("GITHUB_REPO_NAME", "kortana")
-KORTANA_BACKEND_URL = os.getenv("KORTANA_BACKEND_URL", "http://localhost:8000")
+GITHUB_WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET")
+# A claimed task belongs to its worker until the lease lapses unrenewed (worker gone)
+TASK_LEASE_SECONDS = float(os.getenv("TASK_LEASE_SECONDS", "60"))
+
+# Branches are cut from this branch; its head SHA is reused for BRANCH_BASE_TTL seconds
+GITHUB_BASE_BRANCH = os.getenv("GITHUB_BASE_BRANCH", "main")
+BRANCH_BASE_TTL = float(os.getenv("BRANCH_BASE_TTL", "30"))
+# Refs created at once by prepare_branches; GitHub throttles bursts of concurrent writes
+BRANCH_CREATE_CONCURRENCY = int(os.getenv("BRANCH_CREATE_CONCURRENCY", "4"))
+BRANCH_PREPARE_MAX = int(os.getenv("BRANCH_PREPARE_MAX", "500"))
+
+ACTIVE_STATES = ("queued", "in_progress")
+# Tasks execute_task may claim: new ones, and failed ones being retried
+RUNNABLE_STATES = ("pending", "failed")
+
+BRANCH_SLUG_MAX = 50
+SLUG_SEPARATORS = re.compile(r"[^a-z0-9]+")
+
+
+def branch_name_for(number: int, title: str) -> str:
+    """Branch for an issue: ``feature/<number>-<slug of the title>``.
+
+    The slug keeps ASCII letters and digits (accents are folded first) and
+    joins runs of anything else with single hyphens, so it is always a
+    valid ref name and slugging a slug returns it unchanged. The issue
+    number makes names unique however similar two titles are.
+    """
+    folded = unicodedata.normalize("NFKD", title).encode("ascii", "ignore").decode().lower()
+    slug = SLUG_SEPARATORS.sub("-", folded).strip("-")[:BRANCH_SLUG_MAX].rstrip("-")
+    return f"feature/{number}-{slug}" if slug else f"feature/{number}"
+
+# Also seeds the compression of stored plans, which tend to echo it
+PLAN_PROMPT = """
+        Generate a detailed implementation plan for this GitHub issue:
+
+        Title: {title}
+        Description: {description}
+
+        Provide a step-by-step plan including:
+        1. Technical approach
+        2. Files to modify/create
+        3. Dependencies needed
+        4. Testing strategy
+        5. Success criteria
+
+        Keep the plan concise but comprehensive.
+        """
+
+class TaskRecord(CompactRecord):
+    """A stored task, including the fields execution adds over time."""
+
+    FIELDS = {
+        "id": Field(),
+        "type": Symbol(),
+        "title": Text(),
+        "description": Text(),
+        "github_issue_number": Field(),
+        "status": Symbol(),
+        "created_at": Timestamp(),
+        "branch_name": Field(),
+        "plan": Text(),
+        "queued_at": Timestamp(),
+        "started_at": Timestamp(),
+        "completed_at": Timestamp(),
+        "branch_created": Field(),
+        "error": Text(),
+        "lease_owner": Symbol(),
+        "lease_expires_at": Field(),
+    }
+    __slots__ = tuple(FIELDS)
 
 # In-memory task queue (in production, use database)
-task_queue: List[Dict[str, Any]] = []
+task_queue = IndexedStore(
+    indexes={"status": field_index("status"), "branch_name": field_index("branch_name")},
+    storage=storage,
+    collection="tasks",
+    record_type=TaskRecord,
+    atomic_updates=True,
+)
+# Per-repository sync cursors (issue updated_at high-water mark, known branches)
+sync_state = IndexedStore(key="repo", storage=storage, collection="sync_state", atomic_updates=True)
+
+branches_prepared = metrics.counter(
+    "kortana_branches_prepared_total",
+    "Task branch creations by outcome (created, exists, failed)",
+    ("outcome",),
+)
+metrics.gauge(
+    "kortana_tasks",
+    "Autonomous tasks by status",
+    lambda: {(status,): count for status, count in task_queue.distribution("status").items()},
+    ("status",),
+)
+
+def _valid_issue(issue: Any) -> bool:
+    """Whether a webhook ``issue`` has the fields ``apply_issue`` reads, with usable types."""
+    return (
+        isinstance(issue, dict)
+        and isinstance(issue.get("number"), int)
+        and not isinstance(issue["number"], bool)
+        and isinstance(issue.get("title"), str)
+        and "body" in issue
+        and (issue["body"] is None or isinstance(issue["body"], str))
+        and issue.get("state", "open") in ("open", "closed")
+    )
 
 class AutonomousTaskQueue:
     def __init__(self):
         self.tasks = task_queue
-
-    def queue_from_github_issues(self) -> List[Dict[str, Any]]:
-        """Fetch open issues and queue them as autonomous tasks."""
-        if not GITHUB_TOKEN:
+        self.sync_state = sync_state
+        # (sha, fetched_at) of the base branch head, shared by every branch created meanwhile
+        self._base: Optional[Tuple[str, float]] = None
+        self._base_lock = asyncio.Lock()
+        # Task writes started from synchronous scheduler callbacks, kept until they finish
+        self._writes: Set[asyncio.Task] = set()
+
+    @property
+    def repo(self) -> str:
+        return f"{REPO_OWNER}/{REPO_NAME}"
+
+    async def _cursor(self) -> Dict[str, Any]:
+        cursor = self.sync_state.get(self.repo)
+        if cursor is None:
+            cursor, _ = await self.sync_state.insert_async({"repo": self.repo, "issues_since": None, "branches": []})
+        return cursor
+
+    async def queue_from_github_issues(self) -> List[Dict[str, Any]]:
+        """Incrementally sync issues and queue new ones as autonomous tasks.
+
+        The first sync fetches every open issue. Later syncs only ask GitHub
+        for issues updated since the stored cursor (open or closed), so their
+        cost follows how much changed rather than how many issues are open.
+        """
+        if not github_client.configured:
             raise HTTPException(status_code=500, detail="GitHub token not configured")
 
-        headers = {"Authorization": f"token {GITHUB_TOKEN}"}
-        url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/issues?state=open"
+        cursor = await self._cursor()
+        params: Dict[str, Any] = {"state": "open", "sort": "updated", "direction": "asc"}
+        if cursor["issues_since"]:
+            params.update(state="all", since=cursor["issues_since"])
 
-        response = requests.get(url, headers=headers)
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Failed to fetch issues")
+        try:
+            issues = await github_client.paginate(f"/repos/{self.repo}/issues", params, max_pages=None)
+        except GitHubError as e:
+            raise HTTPException(status_code=e.status_code, detail="Failed to fetch issues")
 
-        issues = response.json()
         queued_tasks = []
-
+        since = cursor["issues_since"]
         for issue in issues:
-            # Skip pull requests (they have 'pull_request' key)
-            if 'pull_request' in issue:
-                continue
-
-            task = {
-                "id": f"issue-{issue['number']}",
-                "type": "github_issue",
-                "title": issue["title"],
-                "description": issue["body"],
-                "github_issue_number": issue["number"],
-                "status": "pending",
-                "created_at": datetime.now().isoformat(),
-                "branch_name": f"feature/{issue['number']}-{issue['title'].lower().replace(' ', '-').replace('/', '-').replace(':', '').replace('?', '').replace('!', '')[:50]}",
-                "plan": None
-            }
-
-            # Check if task already exists
-            existing = next((t for t in self.tasks if t["id"] == task["id"]), None)
-            if not existing:
-                self.tasks.append(task)
+            task, created = await self.apply_issue(issue)
+            if created:
                 queued_tasks.append(task)
+            # ISO-8601 UTC timestamps compare correctly as strings
+            if issue.get("updated_at") and (since is None or issue["updated_at"] > since):
+                since = issue["updated_at"]
 
+        if since != cursor["issues_since"]:
+            await self.sync_state.update_async(self.repo, issues_since=since)
         return queued_tasks
 
-    def generate_task_plan(self, task: Dict[str, Any]) -> str:
-        """Use Gemini to generate a plan for the task."""
-        prompt = f"""
-        Generate a detailed implementation plan for this GitHub issue:
-
-        Title: {task['title']}
-        Description: {task['description']}
+    async def apply_issue(self, issue: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """Create or update the task for an issue; returns ``(task, created)``."""
+        # Skip pull requests (they have 'pull_request' key)
+        if 'pull_request' in issue:
+            return None, False
+
+        task_id = f"issue-{issue['number']}"
+        existing = self.tasks.get(task_id) or await self.tasks.fresh_async(task_id)
+        closed = issue.get("state") == "closed"
+
+        if existing is None:
+            if closed:
+                return None, False
+            # Another worker may have created it since; insert never overwrites
+            return await self.tasks.insert_async(self._task_from_issue(issue))
+
+        changes: Dict[str, Any] = {}
+        if existing["title"] != issue["title"]:
+            changes["title"] = issue["title"]
+        if existing["description"] != issue["body"]:
+            changes["description"] = issue["body"]
+        if changes:
+            existing = await self.tasks.update_async(task_id, **changes)
+        # Status moves are compare-and-set, so a task claimed meanwhile is left alone
+        if closed and existing["status"] == "pending":
+            existing = await self.tasks.update_if_async(
+                task_id, lambda task: task["status"] == "pending", status="cancelled", error="Issue closed"
+            ) or existing
+        elif not closed and existing["status"] == "cancelled" and existing.get("error") == "Issue closed":
+            existing = await self.tasks.update_if_async(
+                task_id,
+                lambda task: task["status"] == "cancelled" and task.get("error") == "Issue closed",
+                status="pending",
+                error=None,
+            ) or existing
+        return existing, False
+
+    def _task_from_issue(self, issue: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a pending task for a GitHub issue."""
+        return {
+            "id": f"issue-{issue['number']}",
+            "type": "github_issue",
+            "title": issue["title"],
+            "description": issue["body"],
+            "github_issue_number": issue["number"],
+            "status": "pending",
+            "created_at": datetime.now().isoformat(),
+            "branch_name": branch_name_for(issue["number"], issue["title"]),
+            "plan": None
+        }
 
-        Provide a step-by-step plan including:
-        1. Technical approach
-        2. Files to modify/create
-        3. Dependencies needed
-        4. Testing strategy
-        5. Success criteria
+    async def sync_branches(self) -> Dict[str, Any]:
+        """Reconcile ``branch_created`` on tasks with the branches on GitHub.
 
-        Keep the plan concise but comprehensive.
+        Branch listings go through the ETag cache, so an unchanged repository
+        costs no rate-limit quota, and only tasks whose branch appeared or
+        disappeared since the previous sync are touched.
         """
+        if not github_client.configured:
+            raise HTTPException(status_code=500, detail="GitHub token not configured")
 
-        gemini_payload = {"text": prompt}
+        try:
+            branches = await github_client.paginate(f"/repos/{self.repo}/branches", max_pages=None)
+        except GitHubError as e:
+            raise HTTPException(status_code=e.status_code, detail="Failed to fetch branches")
+
+        cursor = await self._cursor()
+        current = {branch["name"] for branch in branches}
+        previous = set(cursor["branches"])
+        updated = []
+        for name, exists in [(name, True) for name in current - previous] + [(name, False) for name in previous - current]:
+            for task in self.tasks.lookup("branch_name", name):
+                if bool(task.get("branch_created")) != exists:
+                    await self.tasks.update_async(task["id"], branch_created=exists)
+                    updated.append(task["id"])
+
+        if current != previous:
+            await self.sync_state.update_async(self.repo, branches=sorted(current))
+        return {
+            "branches": len(current),
+            "created": len(current - previous),
+            "deleted": len(previous - current),
+            "updated_tasks": updated,
+        }
+
+    async def apply_webhook(self, event: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply a GitHub webhook delivery to the task queue.
+
+        Raises a 400 ``HTTPException`` for a payload missing the fields its event needs.
+        """
+        if not isinstance(payload, dict):
+            raise HTTPException(status_code=400, detail="Webhook payload must be a JSON object")
+        if event == "ping":
+            return {"message": "pong"}
+
+        repository = payload.get("repository")
+        full_name = repository.get("full_name") if isinstance(repository, dict) else None
+        if not isinstance(full_name, str) or full_name.lower() != self.repo.lower():
+            return {"message": f"Ignored event for {full_name if isinstance(full_name, str) else 'unknown repository'}"}
+
+        if event == "issues":
+            if not _valid_issue(payload.get("issue")):
+                raise HTTPException(status_code=400, detail="Malformed issues payload")
+            task, created = await self.apply_issue(payload["issue"])
+            action = payload.get("action", "")
+            return {"message": f"Issue {action} applied", "created": created, "task": task.to_dict() if task else None}
+
+        if event in ("create", "delete") and payload.get("ref_type") == "branch":
+            if not isinstance(payload.get("ref"), str):
+                raise HTTPException(status_code=400, detail=f"Malformed {event} payload")
+            exists = event == "create"
+            updated = []
+            for task in self.tasks.lookup("branch_name", payload["ref"]):
+                if bool(task.get("branch_created")) != exists:
+                    await self.tasks.update_async(task["id"], branch_created=exists)
+                    updated.append(task["id"])
+            return {"message": f"Branch {event} applied", "updated_tasks": updated}
+
+        return {"message": f"Ignored {event} event"}
+
+    async def generate_task_plan(self, task: Dict[str, Any]) -> str:
+        """Use Gemini to generate a plan for the task."""
+        prompt = PLAN_PROMPT.format(title=task['title'], description=task['description'])
 
         try:
-            response = requests.post(f"{KORTANA_BACKEND_URL}/api/gemini/analyze", json=gemini_payload)
-            if response.status_code == 200:
-                result = response.json()
-                return result.get("analysis", "Plan generation failed")
-            else:
+            result = await gemini_service.analyze(prompt)
+            return result.get("analysis", "Plan generation failed")
+        except GeminiError as e:
+            if e.status_code:
                 return "Failed to generate plan via Gemini"
-        except requests.RequestException as e:
             return f"Error connecting to Gemini service: {str(e)}"
 
-    def create_branch(self, task: Dict[str, Any]) -> bool:
-        """Create a GitHub branch for the task."""
-        if not GITHUB_TOKEN:
-            return False
-
-        headers = {
-            "Authorization": f"token {GITHUB_TOKEN}",
-            "Accept": "application/vnd.github.v3+json"
-        }
+    async def base_sha(self) -> str:
+        """Head SHA of the base branch, fetched at most once per ``BRANCH_BASE_TTL``.
 
-        # Get main branch SHA
-        main_ref_url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/git/ref/heads/main"
-        main_response = requests.get(main_ref_url, headers=headers)
-
-        if main_response.status_code != 200:
+        Concurrent callers share one fetch. Raises ``GitHubError``.
+        """
+        async with self._base_lock:
+            if self._base is None or time.monotonic() - self._base[1] > BRANCH_BASE_TTL:
+                ref = await github_client.get(f"/repos/{self.repo}/git/ref/heads/{GITHUB_BASE_BRANCH}")
+                self._base = (ref["object"]["sha"], time.monotonic())
+            return self._base[0]
+
+    async def _create_ref(self, branch_name: str, sha: str) -> Tuple[str, Optional[str]]:
+        """``(outcome, error)`` of creating a branch; outcome is created, exists or failed."""
+        try:
+            status, body, _ = await github_client.request(
+                "POST", f"/repos/{self.repo}/git/refs", json={"ref": f"refs/heads/{branch_name}", "sha": sha}
+            )
+        except GitHubError as e:
+            return "failed", str(e)
+        if status == 201:
+            return "created", None
+        message = (body or {}).get("message", "") if isinstance(body, dict) else ""
+        # Retried or prepared earlier: the branch is already there, which is all a task needs
+        if status == 422 and "already exists" in message:
+            return "exists", None
+        return "failed", f"GitHub returned {status}" + (f": {message}" if message else "")
+
+    async def create_branch(self, task: Dict[str, Any]) -> bool:
+        """Create a GitHub branch for the task; an existing branch counts as created."""
+        if not github_client.configured:
             return False
 
-        main_sha = main_response.json()["object"]["sha"]
+        try:
+            sha = await self.base_sha()
+        except GitHubError:
+            return False
+        outcome, _ = await self._create_ref(task["branch_name"], sha)
+        branches_prepared.inc(outcome)
+        return outcome != "failed"
 
-        # Create new branch
-        branch_data = {
-            "ref": f"refs/heads/{task['branch_name']}",
-            "sha": main_sha
-        }
+    async def prepare_branches(self, task_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Create the branches of many tasks, by default pending tasks still without one.
 
-        create_url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/git/refs"
-        create_response = requests.post(create_url, headers=headers, json=branch_data)
+        The base SHA is resolved once for the whole run and refs are created
+        ``BRANCH_CREATE_CONCURRENCY`` at a time, so N tasks cost N + 1 calls
+        instead of 2N sequential ones. Each task gets its own result, and a
+        failed task does not stop the others.
+        """
+        if not github_client.configured:
+            raise HTTPException(status_code=500, detail="GitHub token not configured")
 
-        return create_response.status_code == 201
+        remaining = 0
+        if task_ids is None:
+            tasks = [task for task in self.tasks.lookup("status", "pending") if not task.get("branch_created")]
+            # Take a run's worth; the rest are left for the next call
+            tasks, remaining = tasks[:BRANCH_PREPARE_MAX], max(0, len(tasks) - BRANCH_PREPARE_MAX)
+        else:
+            task_ids = list(dict.fromkeys(task_ids))
+            tasks = [self.tasks.get(task_id) for task_id in task_ids]
+            missing = [task_id for task_id, task in zip(task_ids, tasks) if task is None]
+            if missing:
+                raise HTTPException(status_code=404, detail=f"Unknown tasks: {', '.join(missing[:10])}")
+        if len(tasks) > BRANCH_PREPARE_MAX:
+            raise HTTPException(status_code=400, detail=f"At most {BRANCH_PREPARE_MAX} tasks per run")
 
-    def execute_task(self, task_id: str, background_tasks: BackgroundTasks) -> Dict[str, Any]:
-        """Execute an autonomous task."""
-        task = next((t for t in self.tasks if t["id"] == task_id), None)
+        try:
+            sha = await self.base_sha()
+        except GitHubError as e:
+            raise HTTPException(status_code=e.status_code, detail=f"Failed to resolve {GITHUB_BASE_BRANCH}: {e}")
+
+        semaphore = asyncio.Semaphore(BRANCH_CREATE_CONCURRENCY)
+
+        async def prepare(task: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                outcome, error = await self._create_ref(task["branch_name"], sha)
+            branches_prepared.inc(outcome)
+            if outcome != "failed" and not task.get("branch_created"):
+                await self.tasks.update_async(task["id"], branch_created=True)
+            return {"task_id": task["id"], "branch_name": task["branch_name"], "status": outcome, "error": error}
+
+        results = await asyncio.gather(*(prepare(task) for task in tasks))
+        counts = {outcome: 0 for outcome in ("created", "exists", "failed")}
+        for result in results:
+            counts[result["status"]] += 1
+        return {"base_branch": GITHUB_BASE_BRANCH, "base_sha": sha, **counts, "remaining": remaining, "results": results}
+
+    async def execute_task(
+        self,
+        task_id: str,
+        priority: int = 0,
+        timeout: Optional[float] = None,
+        retries: int = 0,
+        depends_on: Optional[List[str]] = None,
+    ) -> Job:
+        """Schedule a pending task, or retry a failed one, for background execution.
+
+        The task is claimed with a compare-and-set on its status, so when
+        several workers share the task store only one of them runs it. The
+        claim carries a lease that this worker renews while the job is
+        queued or running; if the worker dies, the lease lapses and
+        ``reclaim_expired`` returns the task to pending.
+        """
+        task = await self.tasks.fresh_async(task_id)
         if not task:
             raise HTTPException(status_code=404, detail="Task not found")
 
-        if task["status"] != "pending":
-            raise HTTPException(status_code=400, detail="Task not in pending status")
+        if task["status"] not in RUNNABLE_STATES:
+            raise HTTPException(status_code=400, detail="Task not in pending or failed status")
+
+        for dependency in depends_on or []:
+            if dependency not in self.tasks:
+                raise HTTPException(status_code=400, detail=f"Unknown dependency: {dependency}")
+            # Dependencies only ever executed in another run are treated as already satisfied
+            if scheduler.get(dependency) is None and self.tasks.get(dependency)["status"] != "completed":
+                raise HTTPException(status_code=400, detail=f"Dependency {dependency} is not scheduled")
+
+        job = Job(
+            task_id,
+            lambda job: self._run_task(task_id, job),
+            priority=priority,
+            retries=retries,
+            depends_on=[d for d in depends_on or [] if scheduler.get(d) is not None],
+            on_finish=self._on_job_finished,
+        )
+        if timeout is not None:
+            job.timeout = timeout
+        claim = {
+            "status": "queued",
+            "queued_at": datetime.now().isoformat(),
+            "error": None,
+            "lease_owner": WORKER_ID,
+            "lease_expires_at": time.time() + TASK_LEASE_SECONDS,
+        }
+        unclaimed = {field: task.get(field) for field in claim}
+        claimed = await self.tasks.update_if_async(task_id, lambda task: task["status"] in RUNNABLE_STATES, **claim)
+        if claimed is None:
+            raise HTTPException(status_code=409, detail="Task was claimed by another worker")
+        try:
+            return scheduler.submit(job)
+        except Exception as e:
+            # Never scheduled, so hand the claim back rather than leave the task queued for good
+            await self.tasks.update_if_async(
+                task_id, lambda task: task["status"] == "queued" and self._owned(task), **unclaimed
+            )
+            if isinstance(e, ValueError):
+                raise HTTPException(status_code=409, detail=str(e)) from e
+            raise
+
+    @staticmethod
+    def _owned(task: Dict[str, Any]) -> bool:
+        return task.get("lease_owner") == WORKER_ID
+
+    async def _update_owned(self, task_id: str, **changes: Any) -> Dict[str, Any]:
+        """Update a task this worker holds the lease for; fails once the lease is lost."""
+        task = await self.tasks.update_if_async(task_id, self._owned, **changes)
+        if task is None:
+            raise RuntimeError("Task lease lost to another worker")
+        return task
 
+    async def _run_task(self, task_id: str, job: Job) -> Dict[str, Any]:
+        """Generate the plan and create the branch for a task (one attempt)."""
         # Update status
-        task["status"] = "in_progress"
-        task["started_at"] = datetime.now().isoformat()
+        task = await self._update_owned(task_id, status="in_progress", started_at=datetime.now().isoformat())
 
         # Generate plan
-        task["plan"] = self.generate_task_plan(task)
+        job.report(0.1, "Generating plan")
+        await self._update_owned(task_id, plan=await self.generate_task_plan(task))
 
-        # Create branch
-        if self.create_branch(task):
-            task["branch_created"] = True
-        else:
-            task["branch_created"] = False
-            task["status"] = "failed"
-            task["error"] = "Failed to create branch"
+        # Create branch, unless prepare_branches already did
+        job.report(0.6, "Creating branch")
+        if not task.get("branch_created") and not await self.create_branch(task):
+            await self._update_owned(task_id, branch_created=False)
+            raise RuntimeError("Failed to create branch")
 
         # For now, mark as completed (in production, this would trigger actual development)
-        if task["status"] == "in_progress":
-            task["status"] = "completed"
-            task["completed_at"] = datetime.now().isoformat()
-
-        return task
+        return await self._update_owned(
+            task_id,
+            branch_created=True,
+            status="completed",
+            completed_at=datetime.now().isoformat(),
+            lease_owner=None,
+            lease_expires_at=None,
+        )
+
+    def _on_job_finished(self, job: Job) -> None:
+        """Mirror a failed or cancelled job onto its task and release the lease."""
+        if job.status in ("failed", "cancelled"):
+            # The scheduler calls this synchronously; the write runs as its own task
+            write = asyncio.get_running_loop().create_task(
+                self.tasks.update_if_async(
+                    job.id, self._owned, status=job.status, error=job.error, lease_owner=None, lease_expires_at=None
+                )
+            )
+            self._writes.add(write)
+            write.add_done_callback(self._writes.discard)
+
+    async def renew_leases(self) -> int:
+        """Extend the leases of tasks this worker has queued or running; returns how many."""
+        renewed = 0
+        expires_at = time.time() + TASK_LEASE_SECONDS
+        for job in list(scheduler.jobs.values()):
+            if not job.done and job.id in self.tasks:
+                if await self.tasks.update_if_async(job.id, self._owned, lease_expires_at=expires_at) is not None:
+                    renewed += 1
+        return renewed
+
+    async def reclaim_expired(self) -> List[str]:
+        """Return tasks whose worker stopped renewing their lease to pending.
+
+        Covers tasks left queued or in progress by a crashed or restarted
+        worker, including ones recorded before tasks carried leases.
+        """
+        now = time.time()
+
+        def expired(task: Dict[str, Any]) -> bool:
+            return task["status"] in ACTIVE_STATES and (task.get("lease_expires_at") or 0) < now
+
+        reclaimed = []
+        for status in ACTIVE_STATES:
+            for task in self.tasks.lookup("status", status):
+                if expired(task) and await self.tasks.update_if_async(
+                    task["id"],
+                    expired,
+                    status="pending",
+                    error="Lease expired before the task finished",
+                    lease_owner=None,
+                    lease_expires_at=None,
+                ) is not None:
+                    reclaimed.append(task["id"])
+        return reclaimed
 
 # Global instance
 task_queue_manager = AutonomousTaskQueue()
 
-@router.post("/task-queue")
+@router.post("/task-queue", response_model=TaskQueueResponse)
 async def queue_github_tasks() -> Dict[str, Any]:
     """Queue tasks from GitHub issues."""
     try:
-        queued_tasks = task_queue_manager.queue_from_github_issues()
+        queued_tasks = await task_queue_manager.queue_from_github_issues()
         return {
             "message": f"Queued {len(queued_tasks)} new tasks",
             "tasks": queued_tasks
@@ -165,39 +572,131 @@ async def queue_github_tasks() -> Dict[str, Any]:
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/status")
+@router.get("/status", response_model=TaskQueueStatus)
 async def get_task_queue_status() -> Dict[str, Any]:
     """Get current task queue status."""
-    pending = len([t for t in task_queue_manager.tasks if t["status"] == "pending"])
-    in_progress = len([t for t in task_queue_manager.tasks if t["status"] == "in_progress"])
-    completed = len([t for t in task_queue_manager.tasks if t["status"] == "completed"])
-    failed = len([t for t in task_queue_manager.tasks if t["status"] == "failed"])
+    pending = task_queue_manager.tasks.count("status", "pending")
+    in_progress = task_queue_manager.tasks.count("status", "in_progress")
+    completed = task_queue_manager.tasks.count("status", "completed")
+    failed = task_queue_manager.tasks.count("status", "failed")
 
     return {
         "total_tasks": len(task_queue_manager.tasks),
         "pending": pending,
+        "queued": task_queue_manager.tasks.count("status", "queued"),
         "in_progress": in_progress,
         "completed": completed,
         "failed": failed,
-        "tasks": task_queue_manager.tasks[-10:]  # Last 10 tasks
+        "cancelled": task_queue_manager.tasks.count("status", "cancelled"),
+        "tasks": task_queue_manager.tasks.tail(10)  # Last 10 tasks
     }
 
-@router.post("/execute/{task_id}")
-async def execute_task(task_id: str, background_tasks: BackgroundTasks) -> Dict[str, Any]:
-    """Execute a specific autonomous task."""
+@router.post("/execute/{task_id}", status_code=202, response_model=ExecuteResponse)
+async def execute_task(
+    task_id: str,
+    priority: int = 0,
+    timeout: Optional[float] = None,
+    retries: int = 0,
+    depends_on: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Queue a specific autonomous task; poll /tasks/{task_id} or stream /tasks/{task_id}/events."""
+    dependencies = [d for d in depends_on.split(",") if d] if depends_on else None
     try:
-        result = task_queue_manager.execute_task(task_id, background_tasks)
-        return {
-            "message": "Task execution initiated",
-            "task": result
-        }
+        job = await task_queue_manager.execute_task(task_id, priority, timeout, retries, dependencies)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    return {
+        "message": "Task execution queued",
+        "task": task_queue_manager.tasks.get(task_id),
+        "job": job.to_dict(),
+        "status_url": f"/api/autonomy/tasks/{task_id}",
+        "events_url": f"/api/autonomy/tasks/{task_id}/events",
+    }
+
+@router.get("/tasks/{task_id}", response_model=TaskProgress)
+async def get_task_progress(task_id: str) -> Dict[str, Any]:
+    """Get a task and the progress of its latest execution."""
+    task = await task_queue_manager.tasks.fresh_async(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    job = scheduler.get(task_id)
+    return {"task": task, "job": job.to_dict() if job else None}
+
+@router.get("/tasks/{task_id}/events")
+async def stream_task_events(task_id: str) -> StreamingResponse:
+    """Server-sent events for a task's execution progress."""
+    job = scheduler.get(task_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Task has not been scheduled")
+
+    async def events() -> AsyncIterator[str]:
+        async for event in job.subscribe():
+            yield sse_event(event, event=event["event"])
+
+    return sse_response(events())
+
+@router.post("/tasks/{task_id}/cancel", response_model=CancelResponse)
+async def cancel_task(task_id: str) -> Dict[str, Any]:
+    """Cancel a queued or running task execution."""
+    job = scheduler.get(task_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Task has not been scheduled")
+    scheduler.cancel(task_id)
+    return {"message": "Cancellation requested", "job": job.to_dict()}
+
+@router.get("/scheduler", response_model=SchedulerStatus)
+async def get_scheduler_status() -> Dict[str, Any]:
+    """Scheduler worker count and jobs by state."""
+    return {"running": scheduler.running, "workers": scheduler.worker_count, "jobs": scheduler.stats()}
+
 @router.post("/branch-sync")
 async def sync_branches() -> Dict[str, Any]:
-    """Sync local branches with GitHub (placeholder for future implementation)."""
+    """Incrementally sync issues and branches with GitHub."""
+    try:
+        queued_tasks = await task_queue_manager.queue_from_github_issues()
+        branches = await task_queue_manager.sync_branches()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
     return {
-        "message": "Branch sync not yet implemented",
-        "status": "pending"
+        "message": "Branch sync complete",
+        "status": "synced",
+        "queued_tasks": len(queued_tasks),
+        "issues_since": task_queue_manager.sync_state.get(task_queue_manager.repo)["issues_since"],
+        **branches,
     }
+
+@router.post("/branches", response_model=PrepareBranchesResponse)
+async def prepare_branches(payload: Optional[PrepareBranchesRequest] = None) -> Dict[str, Any]:
+    """Create branches for many tasks at once (default: up to BRANCH_PREPARE_MAX pending tasks without one)."""
+    return await task_queue_manager.prepare_branches(payload.task_ids if payload else None)
+
+def verify_webhook_signature(body: bytes, signature: Optional[str], secret: str) -> bool:
+    """Check an ``X-Hub-Signature-256`` header against the raw request body."""
+    if not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature[len("sha256="):], expected)
+
+@router.post("/webhook")
+async def github_webhook(request: Request) -> Dict[str, Any]:
+    """Receive GitHub issue and branch events and apply them to the task queue."""
+    if not GITHUB_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Webhook secret not configured")
+
+    body = await request.body()
+    if not verify_webhook_signature(body, request.headers.get("X-Hub-Signature-256"), GITHUB_WEBHOOK_SECRET):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+
+    event = request.headers.get("X-GitHub-Event", "")
+    return await task_queue_manager.apply_webhook(event, payload)
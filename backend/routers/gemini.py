@@ -1,27 +1,87 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 import os
+from typing import Any, AsyncIterator, Dict
+
+from services.gemini import STREAM_FIELDS, GeminiError, gemini_service
+from services.streaming import sse_event, sse_response
 
 router = APIRouter()
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# Largest batch accepted from another backend's dispatcher
+GEMINI_BATCH_MAX_ITEMS = int(os.getenv("GEMINI_BATCH_MAX_ITEMS", "256"))
 
 @router.post("/analyze")
-async def analyze_issue(payload: dict):
+async def analyze_issue(payload: dict) -> Dict[str, Any]:
     """Pass GitHub issue/PR text to Gemini for analysis."""
     text = payload.get("text", "")
-    # Placeholder Gemini call - implement actual Gemini integration
-    return {"input": text, "analysis": f"Gemini would analyze: {text}"}
+    return await gemini_service.analyze(text)
 
 @router.post("/generate")
-async def generate_code(payload: dict):
+async def generate_code(payload: dict) -> Dict[str, Any]:
     """Generate code based on description."""
     description = payload.get("description", "")
-    # Placeholder - implement code generation
-    return {"description": description, "code": f"# Generated code for: {description}"}
+    return await gemini_service.generate(description)
+
+async def _batch(operation: str, payload: dict) -> Dict[str, Any]:
+    items = payload.get("items")
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise HTTPException(status_code=400, detail="Items must be a list of objects")
+    if len(items) > GEMINI_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {GEMINI_BATCH_MAX_ITEMS} items per batch")
+    field = STREAM_FIELDS[operation][0]
+    return {"results": await gemini_service.batch(operation, [item.get(field, "") for item in items])}
+
+@router.post("/analyze/batch")
+async def analyze_batch(payload: dict) -> Dict[str, Any]:
+    """Analyze many texts in one request; results are in item order, failures per item."""
+    return await _batch("analyze", payload)
+
+@router.post("/generate/batch")
+async def generate_batch(payload: dict) -> Dict[str, Any]:
+    """Generate code for many descriptions in one request; results are in item order, failures per item."""
+    return await _batch("generate", payload)
 
 @router.post("/chat")
-async def chat_with_gemini(payload: dict):
+async def chat_with_gemini(payload: dict) -> Dict[str, Any]:
     """Basic chat endpoint."""
     message = payload.get("message", "")
-    # Placeholder - implement Gemini chat
-    return {"response": f"Echo: {message}"}
+    return await gemini_service.chat(message)
+
+async def _stream_events(operation: str, prompt: str) -> AsyncIterator[str]:
+    try:
+        async for event in gemini_service.stream(operation, prompt):
+            if event.get("done"):
+                yield sse_event(event["result"], event="done")
+            else:
+                yield sse_event(event)
+    except GeminiError as e:
+        yield sse_event({"error": str(e), "status_code": e.status_code}, event="error")
+
+@router.post("/analyze/stream")
+async def analyze_issue_stream(payload: dict):
+    """Stream an analysis as server-sent token events, ending with a ``done`` event."""
+    return sse_response(_stream_events("analyze", payload.get("text", "")))
+
+@router.post("/generate/stream")
+async def generate_code_stream(payload: dict):
+    """Stream generated code as server-sent token events, ending with a ``done`` event."""
+    return sse_response(_stream_events("generate", payload.get("description", "")))
+
+@router.post("/chat/stream")
+async def chat_with_gemini_stream(payload: dict):
+    """Stream a chat reply as server-sent token events, ending with a ``done`` event."""
+    return sse_response(_stream_events("chat", payload.get("message", "")))
+
+@router.get("/cache/stats")
+async def get_cache_stats() -> Dict[str, Any]:
+    """LLM response cache hit/miss/eviction counters."""
+    if gemini_service.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **gemini_service.cache.stats()}
+
+@router.delete("/cache")
+async def clear_cache() -> Dict[str, Any]:
+    """Clear the LLM response cache, memory and disk tiers."""
+    if gemini_service.cache is not None:
+        await gemini_service.cache.clear()
+    return {"message": "Cache cleared"}
@@ -1,57 +1,90 @@
-from fastapi import APIRouter, HTTPException
-import os
-import requests
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from typing import Any, Dict, List, Optional
 
-router = APIRouter()
+from services.gemini import GeminiError, gemini_service
+from services.github_client import GITHUB_MAX_PAGES, GITHUB_MAX_PAGES_LIMIT, GitHubError, github_client
+from services.streaming import ndjson_response
 
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-KORTANA_BACKEND_URL = os.getenv("KORTANA_BACKEND_URL", "http://localhost:8000")
+router = APIRouter()
 
 @router.get("/repos/{owner}/{repo}/issues")
-async def get_repo_issues(owner: str, repo: str, state: Optional[str] = "open"):
-    """Fetch issues from a GitHub repository."""
-    if not GITHUB_TOKEN:
+async def get_repo_issues(owner: str, repo: str, state: Optional[str] = "open", max_pages: int = Query(GITHUB_MAX_PAGES, ge=1, le=GITHUB_MAX_PAGES_LIMIT)) -> List[Dict[str, Any]]:
+    """Fetch issues from a GitHub repository, following pagination."""
+    if not github_client.configured:
         raise HTTPException(status_code=500, detail="GitHub token not configured")
 
-    headers = {"Authorization": f"token {GITHUB_TOKEN}"}
-    url = f"https://api.github.com/repos/{owner}/{repo}/issues?state={state}"
+    try:
+        return await github_client.paginate(f"/repos/{owner}/{repo}/issues", {"state": state}, max_pages=max_pages)
+    except GitHubError as e:
+        raise HTTPException(status_code=e.status_code, detail="Failed to fetch issues")
 
-    response = requests.get(url, headers=headers)
-    if response.status_code != 200:
-        raise HTTPException(status_code=response.status_code, detail="Failed to fetch issues")
+@router.get("/repos/{owner}/{repo}/issues/page")
+async def get_repo_issues_page(owner: str, repo: str, state: Optional[str] = "open", cursor: int = 1, limit: int = 100) -> Dict[str, Any]:
+    """Fetch one page of issues; pass ``next_cursor`` back to continue."""
+    if not github_client.configured:
+        raise HTTPException(status_code=500, detail="GitHub token not configured")
 
-    return response.json()
+    try:
+        issues, next_cursor = await github_client.page(
+            f"/repos/{owner}/{repo}/issues", {"state": state}, page=cursor, per_page=min(max(limit, 1), 100)
+        )
+    except GitHubError as e:
+        raise HTTPException(status_code=e.status_code, detail="Failed to fetch issues")
+    return {"issues": issues, "next_cursor": next_cursor}
 
-@router.get("/repos/{owner}/{repo}/pulls")
-async def get_repo_pulls(owner: str, repo: str, state: Optional[str] = "open"):
-    """Fetch pull requests from a GitHub repository."""
-    if not GITHUB_TOKEN:
+@router.get("/repos/{owner}/{repo}/issues/stream")
+async def stream_repo_issues(owner: str, repo: str, state: Optional[str] = "open", max_pages: int = Query(GITHUB_MAX_PAGES, ge=1, le=GITHUB_MAX_PAGES_LIMIT)):
+    """Stream issues as NDJSON, one page at a time as GitHub returns them."""
+    if not github_client.configured:
         raise HTTPException(status_code=500, detail="GitHub token not configured")
 
-    headers = {"Authorization": f"token {GITHUB_TOKEN}"}
-    url = f"https://api.github.com/repos/{owner}/{repo}/pulls?state={state}"
+    pages = github_client.iter_pages(f"/repos/{owner}/{repo}/issues", {"state": state}, max_pages=max_pages)
+    try:
+        # Fetch the first page up front so errors still become a proper status code
+        first = await pages.__anext__()
+    except StopAsyncIteration:
+        first = []
+    except GitHubError as e:
+        raise HTTPException(status_code=e.status_code, detail="Failed to fetch issues")
+
+    async def issues():
+        for issue in first:
+            yield issue
+        try:
+            async for page_items in pages:
+                for issue in page_items:
+                    yield issue
+        except GitHubError as e:
+            yield {"error": str(e), "status_code": e.status_code}
 
-    response = requests.get(url, headers=headers)
-    if response.status_code != 200:
-        raise HTTPException(status_code=response.status_code, detail="Failed to fetch pull requests")
+    return ndjson_response(issues())
 
-    return response.json()
+@router.get("/repos/{owner}/{repo}/pulls")
+async def get_repo_pulls(owner: str, repo: str, state: Optional[str] = "open", max_pages: int = Query(GITHUB_MAX_PAGES, ge=1, le=GITHUB_MAX_PAGES_LIMIT)) -> List[Dict[str, Any]]:
+    """Fetch pull requests from a GitHub repository, following pagination."""
+    if not github_client.configured:
+        raise HTTPException(status_code=500, detail="GitHub token not configured")
+
+    try:
+        return await github_client.paginate(f"/repos/{owner}/{repo}/pulls", {"state": state}, max_pages=max_pages)
+    except GitHubError as e:
+        raise HTTPException(status_code=e.status_code, detail="Failed to fetch pull requests")
+
+@router.get("/rate-limit")
+async def get_rate_limit() -> Dict[str, Any]:
+    """Rate-limit budget and ETag cache counters of the GitHub client."""
+    return github_client.stats()
 
 @router.post("/analyze")
-async def analyze_github_content(payload: dict):
+async def analyze_github_content(payload: dict) -> Dict[str, Any]:
     """Analyze GitHub content using Kor'tana's Gemini functions."""
     content = payload.get("content", "")
     content_type = payload.get("type", "issue")  # issue, pr, commit
 
-    # Call the existing Gemini analyze endpoint
-    gemini_payload = {"text": f"Analyze this GitHub {content_type}: {content}"}
-
+    # Call the shared Gemini service in-process
     try:
-        response = requests.post(f"{KORTANA_BACKEND_URL}/api/gemini/analyze", json=gemini_payload)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return {"error": "Gemini analysis failed", "status_code": response.status_code}
-    except requests.RequestException as e:
+        return await gemini_service.analyze(f"Analyze this GitHub {content_type}: {content}")
+    except GeminiError as e:
+        if e.status_code:
+            return {"error": "Gemini analysis failed", "status_code": e.status_code}
         return {"error": f"Failed to connect to Gemini service: {str(e)}"}
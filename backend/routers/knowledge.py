@@ -1,27 +1,62 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+import asyncio
+import heapq
 import os
+import time
 import json
-import requests
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+from collections import Counter
 from datetime import datetime
 import hashlib
 
+from schemas.knowledge import (
+    CovenantResponse,
+    IngestResponse,
+    KnowledgeStats,
+    RitualResponse,
+    SearchResponse,
+    TagBatchResponse,
+    TagRulesResponse,
+)
+from services.dedup import DEDUP_ENABLED, MinHashLSH
+from services.gemini import GeminiError, gemini_service
+from services.metrics import metrics
+from services.records import CompactRecord, Field, OptionalMapping, Packed, SharedList, Symbol, Text, Timestamp
+from services.search_index import InvertedIndex
+from services.vector_index import SemanticIndex
+from services.storage import storage
+from services.store import IndexedStore, field_index, multi_field_index
+from services.streaming import dumps
+from services.tagging import tag_engine
+
 router = APIRouter()
 
-KORTANA_BACKEND_URL = os.getenv("KORTANA_BACKEND_URL", "http://localhost:8000")
+# Width of the time buckets behind the recent-insights counter
+RECENT_BUCKET_SECONDS = 3600
 
-# In-memory knowledge base (in production, use vector database like ChromaDB)
-knowledge_base: List[Dict[str, Any]] = []
-ritual_documents: List[Dict[str, Any]] = []
+def _timestamp_key(timestamp: str) -> float:
+    """Convert an ISO timestamp into a sortable epoch value."""
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
 
-class KnowledgeManager:
-    def __init__(self):
-        self.knowledge = knowledge_base
-        self.rituals = ritual_documents
+def _recent_cutoff(days: int) -> float:
+    """Epoch before which an insight is no longer recent.
 
-    def extract_insights(self, content: str, source: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Extract learnings and insights from development activities."""
-        prompt = f"""
+    Matches the original ``(now - timestamp).days <= days``: anything less
+    than ``days + 1`` whole days old.
+    """
+    return time.time() - (days + 1) * 86400
+
+def _recent_bucket(item: Dict[str, Any]) -> List[int]:
+    """Time bucket of an insight, parsed once at write time."""
+    epoch = _timestamp_key(item.get("timestamp"))
+    return [int(epoch // RECENT_BUCKET_SECONDS)] if epoch else []
+
+# Also seeds the compression of stored analyses, which tend to echo it
+INSIGHT_PROMPT = """
         Extract key insights, lessons learned, and best practices from this development content:
 
         Source: {source}
@@ -37,20 +72,94 @@ class KnowledgeManager:
         Provide insights in a structured format.
         """
 
-        gemini_payload = {"text": prompt}
+class InsightRecord(CompactRecord):
+    """A stored insight; the content and the LLM analysis are kept compressed."""
+
+    FIELDS = {
+        "id": Field(),
+        "source": Symbol(),
+        "content": Text(),
+        "insights": Text(),
+        "metadata": OptionalMapping(),
+        "timestamp": Timestamp(),
+        "tags": SharedList(),
+        # MinHash of the full content, which is stored truncated
+        "signature": Packed(),
+    }
+    __slots__ = tuple(FIELDS)
 
-        try:
-            response = requests.post(f"{KORTANA_BACKEND_URL}/api/gemini/analyze", json=gemini_payload)
-            if response.status_code == 200:
-                result = response.json()
-                analysis = result.get("analysis", "Analysis failed")
-            else:
-                analysis = "Failed to analyze content"
-        except requests.RequestException:
-            analysis = "Error connecting to Gemini service"
+def _analysis_error(error: GeminiError) -> str:
+    return "Failed to analyze content" if error.status_code else "Error connecting to Gemini service"
+
+def _insight_text(insight: Dict[str, Any]) -> str:
+    """Text an insight is indexed and embedded by."""
+    return f"{insight['content']}\n{insight['insights']}"
+
+# In-memory knowledge base (in production, use vector database like ChromaDB)
+knowledge_base = IndexedStore(
+    indexes={
+        "tags": multi_field_index("tags"),
+        "source": field_index("source", "unknown"),
+        "recent_bucket": _recent_bucket,
+    },
+    storage=storage,
+    collection="knowledge",
+    record_type=InsightRecord,
+)
+ritual_documents = IndexedStore(storage=storage, collection="rituals")
+knowledge_index = InvertedIndex()
+
+def _stored_insight_text(doc_id: str) -> Optional[str]:
+    # Embedding text is rebuilt from the stored insight rather than queued as a copy
+    insight = knowledge_base.get(doc_id)
+    return _insight_text(insight) if insight is not None else None
+
+semantic_index = SemanticIndex(text_for=_stored_insight_text)
+dedup_index = MinHashLSH()
+
+metrics.gauge("kortana_knowledge_insights", "Insights in the knowledge base", lambda: len(knowledge_base))
+metrics.gauge("kortana_knowledge_rituals", "Generated ritual documents", lambda: len(ritual_documents))
+metrics.gauge("kortana_knowledge_embeddings_pending", "Insights waiting to be embedded", lambda: semantic_index.pending)
+duplicates_skipped = metrics.counter(
+    "kortana_knowledge_duplicates_total",
+    "Ingested items skipped as near-duplicates before insight extraction",
+)
+
+SEARCH_MODES = ("keyword", "semantic", "hybrid")
+# Reciprocal rank fusion constant for hybrid search
+RRF_K = 60
+
+# Upper bound on concurrent insight extractions per batch request
+INGEST_BATCH_MAX_CONCURRENCY = int(os.getenv("INGEST_BATCH_MAX_CONCURRENCY", "16"))
+# Tag batches up to this size are small enough to run on the event loop
+TAG_BATCH_INLINE_MAX = 1000
+
+class KnowledgeManager:
+    def __init__(self):
+        self.knowledge = knowledge_base
+        self.rituals = ritual_documents
+        self.index = knowledge_index
+        self.semantic = semantic_index
+        self.dedup = dedup_index
+        # Rebuild the search index as persisted insights are lazily loaded
+        self.knowledge.on_load = self._index_insight
+        self.knowledge.prepare_load = self._prepare_insight
+
+    async def extract_insights(self, content: str, source: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Extract learnings and insights from development activities.
+
+        Raises ``GeminiError`` when the content could not be analyzed, so a
+        failure is never stored as if it were an insight.
+        """
+        prompt = INSIGHT_PROMPT.format(source=source, content=content)
+
+        result = await gemini_service.analyze(prompt)
+        analysis = result.get("analysis")
+        if not analysis:
+            raise GeminiError("Gemini returned no analysis", status_code=502)
 
         insight = {
-            "id": hashlib.md5(f"{source}:{content[:100]}".encode()).hexdigest()[:8],
+            "id": self._insight_id(content, source),
             "source": source,
             "content": content[:500],  # Truncate for storage
             "insights": analysis,
@@ -61,69 +170,194 @@ class KnowledgeManager:
 
         return insight
 
+    def _insight_id(self, content: str, source: str) -> str:
+        """Stable id for a piece of content, known before any LLM call."""
+        # Hashes all of the content: documents sharing a long prefix must not overwrite each other
+        return hashlib.blake2b(f"{source}:{content}".encode(), digest_size=8).hexdigest()
+
     def _extract_tags(self, content: str, analysis: str) -> List[str]:
         """Extract relevant tags from content and analysis."""
-        tags = []
-        content_lower = content.lower()
-        analysis_lower = analysis.lower()
-
-        # Technical tags
-        if any(word in content_lower for word in ["api", "endpoint", "router", "backend"]):
-            tags.append("backend")
-        if any(word in content_lower for word in ["frontend", "react", "ui", "component"]):
-            tags.append("frontend")
-        if any(word in content_lower for word in ["test", "pytest", "coverage"]):
-            tags.append("testing")
-        if any(word in content_lower for word in ["deploy", "cloud", "docker"]):
-            tags.append("deployment")
-
-        # Process tags
-        if any(word in analysis_lower for word in ["autonomous", "self", "ai"]):
-            tags.append("autonomy")
-        if any(word in analysis_lower for word in ["error", "fix", "bug"]):
-            tags.append("debugging")
-        if any(word in analysis_lower for word in ["performance", "optimize", "speed"]):
-            tags.append("performance")
-
-        return list(set(tags))  # Remove duplicates
-
-    def ingest_learning(self, content: str, source: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Ingest new learning into the knowledge base."""
-        insight = self.extract_insights(content, source, metadata)
-
-        # Check for duplicates
-        existing = next((k for k in self.knowledge if k["id"] == insight["id"]), None)
-        if existing:
-            # Update existing insight
-            existing.update(insight)
-            return {"message": "Knowledge updated", "insight": insight}
-        else:
-            # Add new insight
-            self.knowledge.append(insight)
-            return {"message": "Knowledge ingested", "insight": insight}
+        # Whole-word matching against the configurable rules in services.tagging
+        return tag_engine.tag(content, analysis)
 
-    def search_knowledge(self, query: str, tags: Optional[List[str]] = None, limit: int = 10) -> List[Dict[str, Any]]:
-        """Search the knowledge base for relevant insights."""
-        results = []
+    async def ingest_learning(self, content: str, source: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Ingest new learning into the knowledge base.
 
-        for item in self.knowledge:
-            # Text search in content and insights
-            text_match = query.lower() in item["content"].lower() or query.lower() in item["insights"].lower()
-
-            # Tag filtering
-            tag_match = True
-            if tags:
-                tag_match = any(tag in item.get("tags", []) for tag in tags)
-
-            if text_match and tag_match:
-                results.append(item)
+        Content that is a near-duplicate of an ingested (or in-flight) item
+        is reported with the matching ids instead of being analyzed and
+        stored again. The exact same content from the same source is
+        analyzed again and refreshes its stored insight. Raises
+        ``GeminiError`` if the analysis fails, leaving nothing behind.
+        """
+        insight_id = self._insight_id(content, source)
+        signature = None
+        # The duplicate index is rebuilt as persisted insights load
+        if DEDUP_ENABLED and insight_id not in self.knowledge:
+            signature = self.dedup.signature(content)
+            matches = self.dedup.query(signature)
+            if matches:
+                duplicates_skipped.inc()
+                return {
+                    "message": "Duplicate content",
+                    # None while the matching item is still being extracted
+                    "insight": self.knowledge.get(matches[0][0]),
+                    "duplicates": {
+                        "threshold": self.dedup.threshold,
+                        "matches": [{"id": doc_id, "similarity": similarity} for doc_id, similarity in matches],
+                    },
+                }
+            # Claimed before the LLM call, so concurrent near-duplicates already see it
+            self.dedup.add(insight_id, signature)
 
-        # Sort by relevance (simple: newer first)
-        results.sort(key=lambda x: x["timestamp"], reverse=True)
+        try:
+            insight = await self.extract_insights(content, source, metadata)
+        except BaseException:
+            if insight_id not in self.knowledge:
+                self.dedup.remove(insight_id)
+            raise
+
+        # Re-ingested content is merged into the existing insight
+        updated = insight["id"] in self.knowledge
+        if DEDUP_ENABLED and signature is None:
+            signature = self.dedup.signature(content)
+        stored = {**insight, "signature": self.dedup.encode(signature)} if signature is not None else insight
+        # Embedded in the background by the semantic index
+        self._index_insight(self.knowledge.add(stored))
+        if updated:
+            return {"message": "Knowledge updated", "insight": insight}
+        return {"message": "Knowledge ingested", "insight": insight}
 
-        return results[:limit]
+    async def ingest_batch(self, items: AsyncIterator[Dict[str, Any]], concurrency: int = 8) -> AsyncIterator[Dict[str, Any]]:
+        """Ingest many items concurrently, yielding per-item results as they finish.
 
-    def generate_ritual_document(self, milestone: str, context: str) -> Dict[str, Any]:
+        Items are read through a bounded queue, so a slow extraction stage stops
+        the reader instead of buffering the whole request. Items whose id was
+        already seen earlier in the batch are reported as duplicates without
+        calling Gemini; near-duplicates of stored or earlier items are reported
+        by ``ingest_learning`` with their matches.
+        """
+        pending: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+        results: asyncio.Queue = asyncio.Queue()
+        first_seen: Dict[str, int] = {}
+
+        async def read_items() -> None:
+            index = -1
+            try:
+                async for item in items:
+                    index += 1
+                    content = item.get("content", "") if isinstance(item, dict) else ""
+                    if not content:
+                        await results.put({"index": index, "status": "error", "detail": "Content is required"})
+                        continue
+                    source = item.get("source", "unknown")
+                    insight_id = self._insight_id(content, source)
+                    if insight_id in first_seen:
+                        await results.put({"index": index, "status": "duplicate", "id": insight_id, "duplicate_of": first_seen[insight_id]})
+                        continue
+                    first_seen[insight_id] = index
+                    await pending.put((index, content, source, item.get("metadata")))
+            except ValueError as e:
+                await results.put({"index": index + 1, "status": "error", "detail": f"Invalid item: {str(e)}"})
+            finally:
+                for _ in range(concurrency):
+                    await pending.put(None)
+
+        async def ingest_items() -> None:
+            while True:
+                job = await pending.get()
+                if job is None:
+                    break
+                index, content, source, metadata = job
+                try:
+                    result = await self.ingest_learning(content, source, metadata)
+                    status = "duplicate" if "duplicates" in result else "ok"
+                    await results.put({"index": index, "status": status, **result})
+                except GeminiError as e:
+                    await results.put({"index": index, "status": "error", "detail": _analysis_error(e)})
+                except Exception as e:
+                    await results.put({"index": index, "status": "error", "detail": str(e)})
+
+        reader = asyncio.create_task(read_items())
+        workers = [asyncio.create_task(ingest_items()) for _ in range(concurrency)]
+        finished = asyncio.gather(reader, *workers)
+        try:
+            while not (finished.done() and results.empty()):
+                getter = asyncio.ensure_future(results.get())
+                await asyncio.wait({getter, finished}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield getter.result()
+                else:
+                    getter.cancel()
+            await finished
+            await self.semantic.flush()
+        finally:
+            # Client went away or the stream failed: stop reading and extracting
+            finished.cancel()
+
+    def _prepare_insight(self, insight: Dict[str, Any]) -> Tuple[Counter, Any]:
+        """The term frequencies and duplicate signature of an insight, computed off the event loop while loading."""
+        signature = None
+        if DEDUP_ENABLED:
+            encoded = insight.get("signature")
+            signature = self.dedup.decode(encoded) if encoded else None
+            # Insights stored before signatures (or with other settings) fall back to their stored content
+            if signature is None:
+                signature = self.dedup.signature(insight["content"])
+        return self.index.analyze(_insight_text(insight)), signature
+
+    def _index_insight(self, insight: Dict[str, Any], prepared: Optional[Tuple[Counter, Any]] = None) -> None:
+        """Add or refresh an insight in the search and duplicate indexes and queue it for embedding."""
+        frequencies, signature = prepared if prepared is not None else self._prepare_insight(insight)
+        self.index.add_analyzed(insight["id"], frequencies, insight, recency=_timestamp_key(insight["timestamp"]))
+        self.semantic.add(insight["id"])
+        if DEDUP_ENABLED:
+            self.dedup.add(insight["id"], signature)
+
+    async def search_knowledge(
+        self,
+        query: str,
+        tags: Optional[List[str]] = None,
+        limit: int = 10,
+        mode: str = "keyword",
+    ) -> List[Dict[str, Any]]:
+        """Search the knowledge base for relevant insights.
+
+        ``keyword`` ranks by BM25, ``semantic`` by embedding similarity and
+        ``hybrid`` fuses both rankings with reciprocal rank fusion. Ties fall
+        back to recency.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+
+        # The search indexes are rebuilt as persisted insights load
+        self.knowledge.load()
+
+        candidates = None
+        if tags:
+            candidates = set()
+            for tag in tags:
+                candidates.update(self.knowledge.ids("tags", tag))
+
+        if mode == "keyword" or not query.strip():
+            return [item for item, _ in self.index.search(query, limit, candidates=candidates)]
+
+        if mode == "semantic":
+            matches = await self.semantic.search(query, limit, candidates)
+            return [self.knowledge.get(doc_id) for doc_id, _ in matches]
+
+        # Fuse a deeper slice of each ranking so items strong in only one list can still surface
+        depth = limit * 4
+        fused: Dict[str, float] = {}
+        for rank, (item, _) in enumerate(self.index.search(query, depth, candidates=candidates)):
+            fused[item["id"]] = fused.get(item["id"], 0.0) + 1 / (RRF_K + rank + 1)
+        for rank, (doc_id, _) in enumerate(await self.semantic.search(query, depth, candidates)):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1 / (RRF_K + rank + 1)
+
+        recency = self.index.recency
+        best = heapq.nlargest(limit, fused.items(), key=lambda item: (item[1], recency.get(item[0], 0.0)))
+        return [self.knowledge.get(doc_id) for doc_id, _ in best]
+
+    async def generate_ritual_document(self, milestone: str, context: str) -> Dict[str, Any]:
         """Generate a ritual document for major milestones."""
         prompt = f"""
         Create a ritual document for this milestone:
@@ -140,17 +374,11 @@ class KnowledgeManager:
         Structure the document with appropriate sections and formatting.
         """
 
-        gemini_payload = {"text": prompt}
-
         try:
-            response = requests.post(f"{KORTANA_BACKEND_URL}/api/gemini/analyze", json=gemini_payload)
-            if response.status_code == 200:
-                result = response.json()
-                content = result.get("analysis", "Ritual generation failed")
-            else:
-                content = "Failed to generate ritual"
-        except requests.RequestException:
-            content = "Error connecting to Gemini service"
+            result = await gemini_service.analyze(prompt)
+            content = result.get("analysis", "Ritual generation failed")
+        except GeminiError as e:
+            content = "Failed to generate ritual" if e.status_code else "Error connecting to Gemini service"
 
         ritual_number = len(self.rituals) + 17  # Starting from 17 after 16
         ritual = {
@@ -162,42 +390,56 @@ class KnowledgeManager:
             "context": context
         }
 
-        self.rituals.append(ritual)
+        self.rituals.add(ritual)
         return ritual
 
     def update_covenant_index(self) -> Dict[str, Any]:
         """Update the COVENANT_INDEX.md with current knowledge state."""
         total_insights = len(self.knowledge)
         total_rituals = len(self.rituals)
-        tags = set()
-        for item in self.knowledge:
-            tags.update(item.get("tags", []))
+        tags = self.knowledge.index_values("tags")
 
         covenant_update = {
             "timestamp": datetime.now().isoformat(),
             "knowledge_stats": {
                 "total_insights": total_insights,
                 "total_rituals": total_rituals,
-                "unique_tags": list(tags),
-                "recent_insights": len([k for k in self.knowledge if self._is_recent(k["timestamp"])])
+                "unique_tags": tags,
+                "recent_insights": self.count_recent()
             },
             "autonomy_status": "active" if total_insights > 0 else "initializing"
         }
 
         return covenant_update
 
+    def count_recent(self, days: int = 7) -> int:
+        """Number of insights for which ``_is_recent`` holds, read from time buckets.
+
+        Buckets after the cutoff, including any in the future, are counted
+        from the index; only the bucket straddling the cutoff has its
+        timestamps checked.
+        """
+        cutoff = _recent_cutoff(days)
+        cutoff_bucket = int(cutoff // RECENT_BUCKET_SECONDS)
+
+        total = sum(
+            count for bucket, count in self.knowledge.distribution("recent_bucket").items() if bucket > cutoff_bucket
+        )
+        total += sum(
+            1 for item in self.knowledge.lookup("recent_bucket", cutoff_bucket)
+            if _timestamp_key(item["timestamp"]) > cutoff
+        )
+        return total
+
     def _is_recent(self, timestamp: str, days: int = 7) -> bool:
-        """Check if timestamp is within recent days."""
-        try:
-            dt = datetime.fromisoformat(timestamp)
-            return (datetime.now() - dt).days <= days
-        except:
-            return False
+        """Check if timestamp is within recent days (future timestamps count as recent)."""
+        epoch = _timestamp_key(timestamp)
+        return bool(epoch) and epoch > _recent_cutoff(days)
 
 # Global instance
 knowledge_manager = KnowledgeManager()
 
-@router.post("/ingest")
+@router.post("/ingest", response_model=IngestResponse)
 async def ingest_learning(payload: Dict[str, Any]) -> Dict[str, Any]:
     """Ingest new learning into the knowledge base."""
     content = payload.get("content", "")
@@ -208,20 +450,69 @@ async def ingest_learning(payload: Dict[str, Any]) -> Dict[str, Any]:
         raise HTTPException(status_code=400, detail="Content is required")
 
     try:
-        result = knowledge_manager.ingest_learning(content, source, metadata)
+        result = await knowledge_manager.ingest_learning(content, source, metadata)
         return result
+    except GeminiError as e:
+        raise HTTPException(status_code=502, detail=_analysis_error(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/search")
-async def search_knowledge(query: str, tags: Optional[str] = None, limit: int = 10) -> Dict[str, Any]:
-    """Search the knowledge base."""
+class DuplexStreamingResponse(StreamingResponse):
+    """Streaming response that leaves ``receive`` to the handler.
+
+    ``StreamingResponse`` normally listens for client disconnects on
+    ``receive``, which would swallow request body chunks that the batch
+    endpoint is still reading. Disconnects surface as send errors instead.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+
+async def _read_batch(request: Request) -> AsyncIterator[Dict[str, Any]]:
+    """Yield items from an NDJSON stream or a JSON array body."""
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+        if buffer.strip():
+            yield json.loads(buffer)
+        return
+
+    body = await request.json()
+    if not isinstance(body, list):
+        body = body.get("items", []) if isinstance(body, dict) else []
+    for item in body:
+        yield item
+
+@router.post("/ingest/batch")
+async def ingest_learning_batch(request: Request, concurrency: int = 8) -> DuplexStreamingResponse:
+    """Ingest a JSON array or NDJSON stream of items, streaming NDJSON results as they finish."""
+    concurrency = max(1, min(concurrency, INGEST_BATCH_MAX_CONCURRENCY))
+
+    async def stream_results() -> AsyncIterator[bytes]:
+        async for result in knowledge_manager.ingest_batch(_read_batch(request), concurrency):
+            yield (dumps(result) + "\n").encode()
+
+    return DuplexStreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@router.get("/search", response_model=SearchResponse)
+async def search_knowledge(query: str, tags: Optional[str] = None, limit: int = 10, mode: str = "keyword") -> Dict[str, Any]:
+    """Search the knowledge base (mode: keyword, semantic or hybrid)."""
     tag_list = tags.split(",") if tags else None
 
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"Mode must be one of: {', '.join(SEARCH_MODES)}")
+
     try:
-        results = knowledge_manager.search_knowledge(query, tag_list, limit)
+        results = await knowledge_manager.search_knowledge(query, tag_list, limit, mode)
         return {
             "query": query,
+            "mode": mode,
             "tags": tag_list,
             "total_results": len(results),
             "results": results
@@ -229,7 +520,7 @@ async def search_knowledge(query: str, tags: Optional[str] = None, limit: int =
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/ritual")
+@router.post("/ritual", response_model=RitualResponse)
 async def generate_ritual(payload: Dict[str, Any]) -> Dict[str, Any]:
     """Generate a ritual document for a milestone."""
     milestone = payload.get("milestone", "")
@@ -239,7 +530,7 @@ async def generate_ritual(payload: Dict[str, Any]) -> Dict[str, Any]:
         raise HTTPException(status_code=400, detail="Milestone is required")
 
     try:
-        ritual = knowledge_manager.generate_ritual_document(milestone, context)
+        ritual = await knowledge_manager.generate_ritual_document(milestone, context)
         return {
             "message": "Ritual generated",
             "ritual": ritual
@@ -247,7 +538,7 @@ async def generate_ritual(payload: Dict[str, Any]) -> Dict[str, Any]:
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/covenant")
+@router.get("/covenant", response_model=CovenantResponse)
 async def get_covenant_status() -> Dict[str, Any]:
     """Get current covenant index status."""
     try:
@@ -260,25 +551,33 @@ async def get_covenant_status() -> Dict[str, Any]:
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/stats")
+@router.get("/stats", response_model=KnowledgeStats)
 async def get_knowledge_stats() -> Dict[str, Any]:
     """Get knowledge base statistics."""
-    total_insights = len(knowledge_manager.knowledge)
-    tags = {}
-    sources = {}
-
-    for item in knowledge_manager.knowledge:
-        # Count tags
-        for tag in item.get("tags", []):
-            tags[tag] = tags.get(tag, 0) + 1
-
-        # Count sources
-        source = item.get("source", "unknown")
-        sources[source] = sources.get(source, 0) + 1
-
+    # Distributions are maintained by the store's indexes on every write
     return {
-        "total_insights": total_insights,
-        "tag_distribution": tags,
-        "source_distribution": sources,
-        "recent_insights": len([k for k in knowledge_manager.knowledge if knowledge_manager._is_recent(k["timestamp"])])
+        "total_insights": len(knowledge_manager.knowledge),
+        "tag_distribution": knowledge_manager.knowledge.distribution("tags"),
+        "source_distribution": knowledge_manager.knowledge.distribution("source"),
+        "recent_insights": knowledge_manager.count_recent()
     }
+
+@router.post("/tags", response_model=TagBatchResponse)
+async def tag_documents(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Tag a batch of {"content", "analysis"} documents without storing them."""
+    documents = payload.get("documents")
+    if not isinstance(documents, list) or not all(isinstance(d, dict) for d in documents):
+        raise HTTPException(status_code=400, detail="Documents must be a list of objects")
+
+    pairs = [(str(d.get("content") or ""), str(d.get("analysis") or "")) for d in documents]
+    # Large batches are tagged off the event loop
+    if len(pairs) > TAG_BATCH_INLINE_MAX:
+        tags = await asyncio.to_thread(tag_engine.tag_many, pairs)
+    else:
+        tags = tag_engine.tag_many(pairs)
+    return {"version": tag_engine.version, "tags": tags}
+
+@router.get("/tags/rules", response_model=TagRulesResponse)
+async def get_tag_rules() -> Dict[str, Any]:
+    """Current tag rules and how many times they have been replaced."""
+    return {"version": tag_engine.version, "path": tag_engine.path, "rules": tag_engine.rules}
@@ -1,33 +1,58 @@
-from typing import Any
+from typing import Any, Dict, Optional
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+
+from schemas.memory import DocumentAdded, DocumentPage
+from services.streaming import ndjson_response
+from services.vector_index import SemanticIndex
 
 router = APIRouter()
 
 # Placeholder for knowledge base - in production, use a database
 knowledge_base: list[Any] = []
+document_index = SemanticIndex()
+
 
+@router.get("/documents", response_model=DocumentPage)
+async def get_documents(cursor: int = 0, limit: Optional[int] = None):
+    """Retrieve documents in knowledge base, all of them unless ``limit`` is given."""
+    cursor = max(cursor, 0)
+    if limit is None:
+        return {"documents": knowledge_base[cursor:], "next_cursor": None}
+    end = cursor + max(limit, 0)
+    return {"documents": knowledge_base[cursor:end], "next_cursor": end if end < len(knowledge_base) else None}
 
-@router.get("/documents")
-async def get_documents():
-    """Retrieve all documents in knowledge base."""
-    return {"documents": knowledge_base}
 
+@router.get("/documents/stream")
+async def stream_documents():
+    """Stream every document as NDJSON."""
+    return ndjson_response(list(knowledge_base))
 
-@router.post("/add_document")
+
+@router.post("/add_document", response_model=DocumentAdded)
 async def add_document(payload: dict):
     """Add a document to the knowledge base."""
     title = payload.get("title", "")
     content = payload.get("content", "")
     doc = {"title": title, "content": content, "id": len(knowledge_base)}
     knowledge_base.append(doc)
+    document_index.add(doc["id"], f"{title}\n{content}")
     return {"message": "Document added", "document": doc}
 
 
 @router.post("/search")
-async def search_documents(payload: dict):
-    """Search knowledge base."""
+async def search_documents(payload: dict) -> Dict[str, Any]:
+    """Search knowledge base by substring, or by meaning with ``"mode": "semantic"``."""
     query = payload.get("query", "").lower()
+    mode = payload.get("mode", "substring")
+    if mode == "semantic":
+        limit = int(payload.get("limit", 10))
+        matches = await document_index.search(query, limit)
+        results = [knowledge_base[doc_id] for doc_id, _ in matches]
+        return {"query": query, "mode": mode, "results": results}
+    if mode != "substring":
+        raise HTTPException(status_code=400, detail="Mode must be substring or semantic")
+
     results = [
         doc
         for doc in knowledge_base
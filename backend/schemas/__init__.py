@@ -0,0 +1 @@
+# Pydantic response models shared by the routers
@@ -0,0 +1,44 @@
+from typing import Any, List, Optional, Union
+
+from pydantic import BaseModel, ConfigDict
+
+
+class Agent(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    # Agents created before ids were uuids have integer ids
+    id: Union[int, str]
+    name: str
+    description: str = ""
+    capabilities: List[Any] = []
+    status: str
+
+
+class AgentPage(BaseModel):
+    agents: List[Agent]
+    next_cursor: Optional[int] = None
+
+
+class AgentCreated(BaseModel):
+    message: str
+    agent: Agent
+
+
+class AgentTaskResult(BaseModel):
+    id: str
+    index: int
+    agent: str
+    task: Any
+    action: Optional[str] = None
+    status: str
+    result: Any = None
+    error: Optional[str] = None
+    queued_ms: float = 0.0
+    duration_ms: float
+
+
+class AgentBatchResult(BaseModel):
+    agent: str
+    succeeded: int
+    failed: int
+    results: List[AgentTaskResult]
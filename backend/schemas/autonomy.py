@@ -0,0 +1,98 @@
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class Task(BaseModel):
+    """An autonomous task created from a GitHub issue."""
+
+    # Execution adds fields such as queued_at, error and branch_created
+    model_config = ConfigDict(extra="allow")
+
+    id: str
+    type: str
+    title: str
+    description: Optional[str] = None
+    github_issue_number: int
+    status: str
+    created_at: str
+    branch_name: str
+    plan: Optional[str] = None
+
+
+class JobStatus(BaseModel):
+    id: str
+    status: str
+    priority: int
+    attempts: int
+    max_attempts: int
+    progress: float
+    message: str
+    depends_on: List[str]
+    error: Optional[str] = None
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+
+class TaskQueueResponse(BaseModel):
+    message: str
+    tasks: List[Task]
+
+
+class TaskQueueStatus(BaseModel):
+    total_tasks: int
+    pending: int
+    queued: int
+    in_progress: int
+    completed: int
+    failed: int
+    cancelled: int
+    tasks: List[Task]
+
+
+class TaskProgress(BaseModel):
+    task: Task
+    job: Optional[JobStatus] = None
+
+
+class ExecuteResponse(BaseModel):
+    message: str
+    task: Task
+    job: JobStatus
+    status_url: str
+    events_url: str
+
+
+class CancelResponse(BaseModel):
+    message: str
+    job: JobStatus
+
+
+class SchedulerStatus(BaseModel):
+    running: bool
+    workers: int
+    jobs: Dict[str, int]
+
+
+class PrepareBranchesRequest(BaseModel):
+    # None selects every pending task whose branch is not created yet
+    task_ids: Optional[List[str]] = None
+
+
+class BranchResult(BaseModel):
+    task_id: str
+    branch_name: str
+    status: str
+    error: Optional[str] = None
+
+
+class PrepareBranchesResponse(BaseModel):
+    base_branch: str
+    base_sha: str
+    created: int
+    exists: int
+    failed: int
+    # Default selection only: pending tasks without a branch left for the next call
+    remaining: int
+    results: List[BranchResult]
@@ -0,0 +1,84 @@
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class Insight(BaseModel):
+    """A stored learning extracted from development activity."""
+
+    model_config = ConfigDict(extra="allow")
+
+    id: str
+    source: str
+    content: str
+    insights: str
+    metadata: Dict[str, Any] = {}
+    timestamp: str
+    tags: List[str] = []
+    # Duplicate-detection signature; internal
+    signature: Optional[str] = Field(default=None, exclude=True)
+
+
+class Ritual(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    id: str
+    title: str
+    milestone: str
+    content: str
+    timestamp: str
+    context: str = ""
+
+
+class DuplicateMatch(BaseModel):
+    id: str
+    similarity: float
+
+
+class DuplicateReport(BaseModel):
+    threshold: float
+    matches: List[DuplicateMatch]
+
+
+class IngestResponse(BaseModel):
+    message: str
+    # None for a duplicate of an item still being ingested
+    insight: Optional[Insight] = None
+    duplicates: Optional[DuplicateReport] = None
+
+
+class SearchResponse(BaseModel):
+    query: str
+    mode: str
+    tags: Optional[List[str]] = None
+    total_results: int
+    results: List[Insight]
+
+
+class RitualResponse(BaseModel):
+    message: str
+    ritual: Ritual
+
+
+class CovenantResponse(BaseModel):
+    covenant_status: Dict[str, Any]
+    knowledge_base_size: int
+    ritual_count: int
+
+
+class KnowledgeStats(BaseModel):
+    total_insights: int
+    tag_distribution: Dict[str, int]
+    source_distribution: Dict[str, int]
+    recent_insights: int
+
+
+class TagBatchResponse(BaseModel):
+    version: int
+    tags: List[List[str]]
+
+
+class TagRulesResponse(BaseModel):
+    version: int
+    path: Optional[str] = None
+    rules: Dict[str, Dict[str, List[str]]]
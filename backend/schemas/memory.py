@@ -0,0 +1,19 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class Document(BaseModel):
+    id: int
+    title: str = ""
+    content: str = ""
+
+
+class DocumentPage(BaseModel):
+    documents: List[Document]
+    next_cursor: Optional[int] = None
+
+
+class DocumentAdded(BaseModel):
+    message: str
+    document: Document
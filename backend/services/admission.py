@@ -0,0 +1,296 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+from services.metrics import metrics
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() not in ("0", "false", "no")
+# Longest a request may wait for a slot; requests expected to wait longer are rejected on arrival
+ADMISSION_QUEUE_SLO_MS = float(os.getenv("ADMISSION_QUEUE_SLO_MS", "2000"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "100"))
+# Per-client token bucket over the limited routes: sustained requests per second and burst size
+ADMISSION_CLIENT_RATE = float(os.getenv("ADMISSION_CLIENT_RATE", "5"))
+ADMISSION_CLIENT_BURST = int(os.getenv("ADMISSION_CLIENT_BURST", "20"))
+ADMISSION_MAX_CLIENTS = int(os.getenv("ADMISSION_MAX_CLIENTS", "10000"))
+# Header naming the client (e.g. x-forwarded-for behind a trusted proxy); empty uses the peer address
+ADMISSION_CLIENT_HEADER = os.getenv("ADMISSION_CLIENT_HEADER", "").lower()
+# Requests served at once per limited route group, as "group=limit,..."; groups left out keep their default
+ADMISSION_LIMITS = os.getenv("ADMISSION_LIMITS", "")
+
+# Limited route groups: name -> (path pattern, default concurrency). Every other
+# path (health, metrics and the store-backed reads) is never queued or throttled.
+ROUTE_GROUPS: Dict[str, Tuple[Pattern[str], int]] = {
+    "knowledge.ingest": (re.compile(r"^/api/knowledge/ingest(/batch)?$"), 8),
+    "knowledge.ritual": (re.compile(r"^/api/knowledge/ritual$"), 2),
+    "autonomy.execute": (re.compile(r"^/api/autonomy/execute/[^/]+$"), 4),
+    "autonomy.branches": (re.compile(r"^/api/autonomy/branches$"), 1),
+    "github": (re.compile(r"^/api/github/"), 8),
+}
+# Priority classes within a group, lower first: reads overtake queued writes
+PRIORITIES = {"read": 0, "write": 1}
+READ_METHODS = ("GET", "HEAD")
+# Weight of the newest sample in the moving average of service time
+SERVICE_TIME_ALPHA = 0.2
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    limits = {name: default for name, (_, default) in ROUTE_GROUPS.items()}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = entry.partition("=")
+        if name.strip() not in limits:
+            raise ValueError(f"Unknown route group in ADMISSION_LIMITS: {name.strip()}")
+        limits[name.strip()] = int(value)
+    return limits
+
+
+class Rejected(Exception):
+    """A request turned away; ``retry_after`` is the suggested wait in seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBuckets:
+    """Per-client token buckets, keeping the ``max_clients`` most recently seen clients."""
+
+    def __init__(self, rate: float, burst: int, max_clients: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        # client -> (tokens, updated_at)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, client: str) -> None:
+        """Spend one of ``client``'s tokens; raises ``Rejected`` when none is left."""
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(client, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - updated_at) * self.rate)
+        if tokens < 1:
+            self._buckets[client] = (tokens, now)
+            raise Rejected("rate_limited", (1 - tokens) / self.rate)
+        self._buckets[client] = (tokens - 1, now)
+        # A client forgotten here returns with a full bucket, as an idle one would have anyway
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+
+
+class RouteLimit:
+    """Concurrency limit for one route group, with a priority queue of waiters.
+
+    A request that cannot start at once waits behind the waiters of its own
+    or a higher priority. Its wait is estimated from their number and the
+    recent service time; if that already exceeds ``slo`` it is rejected
+    straight away instead of timing out later, and a request that does wait
+    gives up once it has waited ``slo``.
+    """
+
+    def __init__(self, name: str, concurrency: int, slo: float, max_queue: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.slo = slo
+        self.max_queue = max_queue
+        self.active = 0
+        self.service_time: Optional[float] = None
+        # (priority, seq, future) of waiting requests; cancelled futures are skipped on release
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._queued: Dict[int, int] = {priority: 0 for priority in PRIORITIES.values()}
+        self._seq = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return sum(self._queued.values())
+
+    def expected_wait(self, priority: int) -> float:
+        """Estimated seconds a new request of ``priority`` would wait for a slot."""
+        if self.service_time is None:
+            return 0.0
+        ahead = sum(count for level, count in self._queued.items() if level <= priority)
+        return (ahead + 1) / self.concurrency * self.service_time
+
+    async def acquire(self, priority: int) -> None:
+        if self.active < self.concurrency and not self.queued:
+            self.active += 1
+            return
+        if self.queued >= self.max_queue:
+            raise Rejected("queue_full", self.expected_wait(priority) or self.slo)
+        expected = self.expected_wait(priority)
+        if expected > self.slo:
+            raise Rejected("slo", expected)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self._queued[priority] += 1
+        try:
+            await asyncio.wait_for(future, self.slo)
+        except asyncio.TimeoutError:
+            self._abandon(future)
+            raise Rejected("slo", self.expected_wait(priority) or self.slo)
+        except asyncio.CancelledError:
+            # The client went away while waiting
+            self._abandon(future)
+            raise
+        finally:
+            self._queued[priority] -= 1
+
+    def _abandon(self, future: asyncio.Future) -> None:
+        if future.done() and not future.cancelled():
+            # The slot was handed over just as the wait ended; pass it on
+            self.release(None)
+
+    def release(self, elapsed: Optional[float]) -> None:
+        if elapsed is not None:
+            previous = self.service_time
+            self.service_time = elapsed if previous is None else previous + SERVICE_TIME_ALPHA * (elapsed - previous)
+        # Hand the slot to the first live waiter, keeping it counted as active
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionController:
+    """Decides which requests to the limited route groups start, wait or are shed."""
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, int]] = None,
+        slo: float = ADMISSION_QUEUE_SLO_MS / 1000,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        rate: float = ADMISSION_CLIENT_RATE,
+        burst: int = ADMISSION_CLIENT_BURST,
+        enabled: bool = ADMISSION_ENABLED,
+    ):
+        self.enabled = enabled
+        limits = limits if limits is not None else _parse_limits(ADMISSION_LIMITS)
+        self.routes = {
+            name: (ROUTE_GROUPS[name][0], RouteLimit(name, limits[name], slo, max_queue)) for name in ROUTE_GROUPS
+        }
+        self.buckets = TokenBuckets(rate, burst, ADMISSION_MAX_CLIENTS)
+        # (group, priority, outcome) -> requests, also exported as kortana_admission_requests_total
+        self.decisions: Dict[Tuple[str, str, str], int] = {}
+
+    def record(self, group: str, priority: str, outcome: str) -> None:
+        key = (group, priority, outcome)
+        self.decisions[key] = self.decisions.get(key, 0) + 1
+        admission_requests.inc(*key)
+
+    def group_for(self, path: str) -> Optional[RouteLimit]:
+        for pattern, limit in self.routes.values():
+            if pattern.match(path):
+                return limit
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "groups": {
+                name: {
+                    "concurrency": limit.concurrency,
+                    "active": limit.active,
+                    "queued": limit.queued,
+                    "service_time_ms": round(limit.service_time * 1000, 3) if limit.service_time is not None else None,
+                }
+                for name, (_, limit) in self.routes.items()
+            },
+            "decisions": {"/".join(key): count for key, count in sorted(self.decisions.items())},
+        }
+
+
+def _client_id(scope: Dict[str, Any]) -> str:
+    if ADMISSION_CLIENT_HEADER:
+        for name, value in scope.get("headers", []):
+            if name.decode("latin-1") == ADMISSION_CLIENT_HEADER:
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying ``AdmissionController`` before a request reaches its route.
+
+    Rejected requests get 429 with ``Retry-After``, without touching the
+    upstreams or the worker threads.
+    """
+
+    def __init__(self, app: Any, controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.controller = controller or admission
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        # CORS preflights are answered by the CORS middleware and cost nothing upstream
+        limited = scope["type"] == "http" and scope["method"] != "OPTIONS" and self.controller.enabled
+        limit = self.controller.group_for(scope["path"]) if limited else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        priority = "read" if scope["method"] in READ_METHODS else "write"
+        start = time.perf_counter()
+        try:
+            self.controller.buckets.take(_client_id(scope))
+            await limit.acquire(PRIORITIES[priority])
+        except Rejected as e:
+            self.controller.record(limit.name, priority, e.reason)
+            await _reject(send, e)
+            return
+        self.controller.record(limit.name, priority, "admitted")
+        admission_wait.observe(time.perf_counter() - start, limit.name, priority)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release(time.perf_counter() - start)
+
+
+async def _reject(send: Any, rejection: Rejected) -> None:
+    body = f'{{"detail":"Too many requests ({rejection.reason}), retry later"}}'.encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(rejection.retry_after))).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+# Global instance
+admission = AdmissionController()
+
+admission_requests = metrics.counter(
+    "kortana_admission_requests_total",
+    "Requests to limited route groups by group, priority and outcome "
+    "(admitted, rate_limited, queue_full, slo)",
+    ("group", "priority", "outcome"),
+)
+admission_wait = metrics.histogram(
+    "kortana_admission_wait_seconds",
+    "Time admitted requests waited for a slot, by group and priority",
+    ("group", "priority"),
+)
+metrics.gauge(
+    "kortana_admission_in_flight",
+    "Requests being served, by limited route group",
+    lambda: {(name,): limit.active for name, (_, limit) in admission.routes.items()},
+    ("group",),
+)
+metrics.gauge(
+    "kortana_admission_queued",
+    "Requests waiting for a slot, by limited route group",
+    lambda: {(name,): limit.queued for name, (_, limit) in admission.routes.items()},
+    ("group",),
+)
@@ -0,0 +1,367 @@
+import asyncio
+import math
+import multiprocessing
+import os
+import re
+import signal
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple
+
+from services.metrics import metrics
+
+try:
+    import resource
+except ImportError:  # resource is POSIX-only; without it only the wall-clock timeout applies
+    resource = None
+
+# Agent tasks run in this many worker processes, so CPU-bound work never blocks the API event loop
+AGENT_WORKERS = int(os.getenv("AGENT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Tasks of one agent running at the same time; the rest wait their turn
+AGENT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "4"))
+# Wall-clock limit on running a task, counted from when a worker starts it
+AGENT_TASK_TIMEOUT = float(os.getenv("AGENT_TASK_TIMEOUT", "30"))
+# Longest a task waits for its agent's turn and a free worker before it fails
+AGENT_QUEUE_TIMEOUT = float(os.getenv("AGENT_QUEUE_TIMEOUT", "60"))
+AGENT_CPU_SECONDS = int(os.getenv("AGENT_CPU_SECONDS", "10"))
+# Address-space cap per worker process; 0 disables it
+AGENT_MEMORY_LIMIT_MB = int(os.getenv("AGENT_MEMORY_LIMIT_MB", "1024"))
+AGENT_BATCH_MAX = int(os.getenv("AGENT_BATCH_MAX", "500"))
+
+DEFAULT_ACTION = "echo"
+# Extra wall-clock time the API waits beyond the worker's own timer before giving up on a task
+TIMEOUT_GRACE = 1.0
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i in is it its of on or that the this to was were will with".split()
+)
+
+
+class AgentLimitExceeded(Exception):
+    """Raised inside a worker when a task exceeds its CPU or wall-clock budget."""
+
+
+# --- Worker side: runs in the pool processes, stdlib only ---
+
+
+def _echo(text: str, agent_name: str) -> str:
+    return f"Agent {agent_name} executed task: {text}"
+
+
+def _word_count(text: str, agent_name: str) -> Dict[str, int]:
+    return {"characters": len(text), "words": len(text.split()), "lines": text.count("\n") + 1 if text else 0}
+
+
+def _keywords(text: str, agent_name: str, limit: int = 10) -> List[Tuple[str, int]]:
+    counts = Counter(word for word in WORD_PATTERN.findall(text.lower()) if word not in STOPWORDS)
+    return counts.most_common(limit)
+
+
+def _summarize(text: str, agent_name: str, sentences: int = 3) -> str:
+    """Extractive summary: the sentences with the most frequent content words, in original order."""
+    parts = [part for part in SENTENCE_PATTERN.split(text.strip()) if part]
+    if len(parts) <= sentences:
+        return " ".join(parts)
+    counts = Counter(word for word in WORD_PATTERN.findall(text.lower()) if word not in STOPWORDS)
+
+    def score(sentence: str) -> float:
+        words = WORD_PATTERN.findall(sentence.lower())
+        return sum(counts[word] for word in words) / (len(words) or 1)
+
+    best = sorted(sorted(range(len(parts)), key=lambda i: score(parts[i]), reverse=True)[:sentences])
+    return " ".join(parts[i] for i in best)
+
+
+# Action name -> handler(text, agent name); an agent's capabilities select among these
+ACTIONS: Dict[str, Callable[[str, str], Any]] = {
+    "echo": _echo,
+    "word_count": _word_count,
+    "keywords": _keywords,
+    "summarize": _summarize,
+}
+
+
+def _on_limit(signum: int, frame: Any) -> None:
+    raise AgentLimitExceeded("CPU time limit exceeded" if signum == getattr(signal, "SIGXCPU", None) else "Timed out")
+
+
+def _initialize_worker(memory_limit_mb: int) -> None:
+    """Pool initializer: cap the worker's memory and turn limit signals into exceptions."""
+    if resource is not None and memory_limit_mb > 0:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    if hasattr(signal, "SIGXCPU"):
+        signal.signal(signal.SIGXCPU, _on_limit)
+    if hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _on_limit)
+
+
+def _run_action(action: str, text: str, agent_name: str, cpu_seconds: int, timeout: float) -> Dict[str, Any]:
+    """Run one task inside a worker, bounded by a CPU budget and a wall-clock timer.
+
+    Workers are reused, so the CPU limit is set relative to the time the
+    process has already used and lifted again afterwards.
+    """
+    cpu_limit = None
+    if resource is not None and cpu_seconds > 0:
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        used = resource.getrusage(resource.RUSAGE_SELF)
+        cpu_limit = math.ceil(used.ru_utime + used.ru_stime) + cpu_seconds
+        if hard != resource.RLIM_INFINITY:
+            cpu_limit = min(cpu_limit, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, hard))
+    if hasattr(signal, "setitimer") and timeout:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return {"status": "succeeded", "result": ACTIONS[action](text, agent_name), "error": None}
+    except AgentLimitExceeded as e:
+        return {"status": "failed", "result": None, "error": str(e)}
+    except MemoryError:
+        return {"status": "failed", "result": None, "error": "Memory limit exceeded"}
+    except Exception as e:
+        return {"status": "failed", "result": None, "error": str(e) or e.__class__.__name__}
+    finally:
+        if hasattr(signal, "setitimer"):
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        if cpu_limit is not None:
+            resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+# --- API side ---
+
+
+def parse_task(task: Any, capabilities: Sequence[Any]) -> Tuple[str, str]:
+    """``(action, input)`` for a task given as text or ``{"action", "input"}``.
+
+    Plain text runs the agent's first known capability, or ``echo``.
+    """
+    if isinstance(task, dict):
+        action = task.get("action") or _default_action(capabilities)
+        text = task.get("input", "")
+    else:
+        action, text = _default_action(capabilities), task
+    if action not in ACTIONS:
+        raise ValueError(f"Unknown action: {action}")
+    if capabilities and action != DEFAULT_ACTION and action not in capabilities:
+        raise ValueError(f"Agent lacks capability: {action}")
+    return action, text if isinstance(text, str) else str(text)
+
+
+def _default_action(capabilities: Sequence[Any]) -> str:
+    return next((capability for capability in capabilities if capability in ACTIONS), DEFAULT_ACTION)
+
+
+class AgentRunner:
+    """Runs agent tasks on a process pool, isolated from the API process.
+
+    Each worker process caps its address space at ``memory_limit_mb`` and
+    gives every task ``cpu_seconds`` of CPU time and ``timeout`` seconds of
+    wall-clock time, so a runaway task fails on its own instead of stalling
+    the API. Tasks of one agent are limited to ``max_concurrency`` at a
+    time, and at most ``workers`` tasks are handed to the pool at once, so
+    a task handed over starts right away and its ``timeout`` covers only
+    its own run. Tasks beyond those limits queue up here for at most
+    ``queue_timeout`` seconds. The pool starts on first use. A worker that
+    dies (killed by the OS, say) fails its tasks and the pool is replaced.
+
+    A task keeps its worker slot and its agent's turn until its worker has
+    actually stopped, even when the caller was answered with a timeout or
+    went away. A worker still running once its own timer and the grace
+    period are up is not going to stop by itself: the pool is killed and
+    replaced, which fails the other tasks running on it too. An agent's
+    limit is dropped once none of its tasks is queued or running.
+    """
+
+    def __init__(
+        self,
+        workers: int = AGENT_WORKERS,
+        max_concurrency: int = AGENT_MAX_CONCURRENCY,
+        timeout: float = AGENT_TASK_TIMEOUT,
+        cpu_seconds: int = AGENT_CPU_SECONDS,
+        memory_limit_mb: int = AGENT_MEMORY_LIMIT_MB,
+        queue_timeout: float = AGENT_QUEUE_TIMEOUT,
+    ):
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_limit_mb = memory_limit_mb
+        self.queue_timeout = queue_timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Agent id -> (its concurrency limit, tasks queued or running under it)
+        self._limits: Dict[Any, Tuple[asyncio.Semaphore, int]] = {}
+        # Free workers, made on first use in each event loop along with the agents' limits
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_initialize_worker,
+                initargs=(self.memory_limit_mb,),
+            )
+        return self._pool
+
+    def _replace_pool(self, broken: ProcessPoolExecutor) -> None:
+        if self._pool is broken:
+            self._pool = None
+            broken.shutdown(wait=False, cancel_futures=True)
+
+    def _kill_pool(self, pool: ProcessPoolExecutor) -> None:
+        """Replace the pool and kill its workers, failing every task still running on it."""
+        # ProcessPoolExecutor cannot stop a running task, so its processes are killed directly
+        processes = list((getattr(pool, "_processes", None) or {}).values())
+        self._replace_pool(pool)
+        for process in processes:
+            process.kill()
+
+    def _limit(self, agent_id: Any) -> asyncio.Semaphore:
+        """The agent's concurrency limit, counted as in use until ``_release`` is called for it."""
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            # Semaphores belong to one event loop, so a new loop starts from fresh ones
+            self._slots = asyncio.Semaphore(self.workers)
+            self._slots_loop = loop
+            self._limits = {}
+        limit, users = self._limits.get(agent_id, (None, 0))
+        if limit is None:
+            limit = asyncio.Semaphore(self.max_concurrency)
+        self._limits[agent_id] = (limit, users + 1)
+        return limit
+
+    def _release(self, agent_id: Any, slots: Optional[asyncio.Semaphore] = None) -> None:
+        """Give back a worker slot and the agent's turn, if taken; idle limits are dropped."""
+        limit, users = self._limits[agent_id]
+        if slots is not None:
+            slots.release()
+            limit.release()
+        if users > 1:
+            self._limits[agent_id] = (limit, users - 1)
+        else:
+            del self._limits[agent_id]
+
+    async def _acquire(self, limit: asyncio.Semaphore) -> asyncio.Semaphore:
+        """Wait for the agent's turn, then for a free worker; returns the worker slot."""
+        slots = self._slots
+        await limit.acquire()
+        try:
+            await slots.acquire()
+        except BaseException:
+            limit.release()
+            raise
+        return slots
+
+    async def run(self, agent: Dict[str, Any], task: Any, index: int = 0) -> Dict[str, Any]:
+        """Run one task for ``agent``; failures are reported in the result, not raised."""
+        result = {
+            "id": uuid.uuid4().hex,
+            "index": index,
+            "agent": agent["name"],
+            "task": task,
+            "action": None,
+            "status": "failed",
+            "result": None,
+            "error": None,
+            "queued_ms": 0.0,
+            "duration_ms": 0.0,
+        }
+        try:
+            result["action"], text = parse_task(task, agent.get("capabilities") or [])
+        except ValueError as e:
+            result["error"] = str(e)
+            agent_tasks.inc("rejected")
+            return result
+
+        limit = self._limit(agent["id"])
+        queued = time.perf_counter()
+        try:
+            slots = await asyncio.wait_for(self._acquire(limit), self.queue_timeout)
+        except BaseException as e:
+            self._release(agent["id"])
+            if not isinstance(e, asyncio.TimeoutError):
+                raise
+            result["queued_ms"] = round((time.perf_counter() - queued) * 1000, 3)
+            result["error"] = f"No free agent worker within {self.queue_timeout}s"
+            agent_tasks.inc("queue_timeout")
+            return result
+        start = time.perf_counter()
+        agent_queue_wait.observe(start - queued)
+        running = None
+        try:
+            pool = self._executor()
+            try:
+                running = asyncio.wrap_future(
+                    pool.submit(_run_action, result["action"], text, agent["name"], self.cpu_seconds, self.timeout)
+                )
+                # Unlike wait_for, a timeout here leaves the task running, so its slot is kept until it stops
+                await asyncio.wait((running,), timeout=self.timeout + TIMEOUT_GRACE)
+                if not running.done():
+                    result["error"] = f"Timed out after {self.timeout}s"
+                    self._kill_pool(pool)
+                else:
+                    result.update(running.result())
+            except BrokenProcessPool:
+                self._replace_pool(pool)
+                result["error"] = "Agent worker process died"
+            duration = time.perf_counter() - start
+        finally:
+            if running is None or running.done():
+                self._release(agent["id"], slots)
+            else:
+                running.add_done_callback(lambda running: self._stopped(running, agent["id"], slots))
+        result["queued_ms"] = round((start - queued) * 1000, 3)
+        result["duration_ms"] = round(duration * 1000, 3)
+        agent_tasks.inc(result["status"])
+        agent_task_duration.observe(duration, result["action"])
+        return result
+
+    def _stopped(self, running: asyncio.Future, agent_id: Any, slots: asyncio.Semaphore) -> None:
+        """Free the slot of a task that outlived its caller, once its worker has stopped."""
+        if not running.cancelled():
+            running.exception()  # Nobody is left to read its outcome
+        self._release(agent_id, slots)
+
+    async def run_many(self, agent: Dict[str, Any], tasks: Sequence[Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Run a batch concurrently, yielding each result as soon as it finishes."""
+        if len(tasks) > AGENT_BATCH_MAX:
+            raise ValueError(f"At most {AGENT_BATCH_MAX} tasks per batch")
+        pending = [asyncio.ensure_future(self.run(agent, task, index)) for index, task in enumerate(tasks)]
+        try:
+            for finished in asyncio.as_completed(pending):
+                yield await finished
+        finally:
+            # A client that disconnects mid-stream should not leave its batch running
+            for future in pending:
+                future.cancel()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# Global instance, closed by the app lifespan
+agent_runner = AgentRunner()
+
+agent_tasks = metrics.counter(
+    "kortana_agent_tasks_total",
+    "Agent tasks by outcome (succeeded, failed, rejected, queue_timeout)",
+    ("outcome",),
+)
+agent_task_duration = metrics.histogram(
+    "kortana_agent_task_duration_seconds",
+    "Time to run an agent task once a worker is free",
+    ("action",),
+)
+agent_queue_wait = metrics.histogram(
+    "kortana_agent_queue_wait_seconds",
+    "Time an agent task waited for its agent's turn and a free worker",
+)
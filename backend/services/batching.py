@@ -0,0 +1,139 @@
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, List, Optional, Set
+
+from services.metrics import metrics
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+BATCH_WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+
+class QueueFull(Exception):
+    """Raised by ``submit`` when the batcher already holds ``max_queue`` queued or in-flight items."""
+
+
+class _Entry:
+    __slots__ = ("item", "future", "enqueued_at")
+
+    def __init__(self, item: Any, future: asyncio.Future, enqueued_at: float):
+        self.item = item
+        self.future = future
+        self.enqueued_at = enqueued_at
+
+
+class MicroBatcher:
+    """Coalesces concurrent calls into batched upstream requests.
+
+    ``submit`` queues one item and waits for its result. Queued items are
+    sent together through ``send`` (items in, results or exceptions out, in
+    order) as soon as ``max_size`` are waiting, or ``max_wait`` seconds after
+    the first of them arrived, whichever comes first. Each caller waits at
+    most its own ``timeout``; items whose caller gave up before the batch
+    left are dropped from it. At most ``max_queue`` items are queued or in
+    batches still awaiting their response, so a stalled upstream sheds load
+    instead of piling up queued items or open requests.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        send: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_size: int,
+        max_wait: float,
+        max_queue: int,
+        timeout: Optional[float] = None,
+    ):
+        self.name = name
+        self.send = send
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._queue: Deque[_Entry] = deque()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._sending: Set[asyncio.Task] = set()
+        self._in_flight = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    @property
+    def in_flight(self) -> int:
+        """Items in batches sent upstream and not yet answered."""
+        return self._in_flight
+
+    async def submit(self, item: Any, timeout: Optional[float] = None) -> Any:
+        """Result for ``item``; raises ``QueueFull`` or ``asyncio.TimeoutError`` past the deadline."""
+        if len(self._queue) + self._in_flight >= self.max_queue:
+            batch_rejected.inc(self.name, "queue_full")
+            raise QueueFull(f"{self.name} batch queue is full")
+        loop = asyncio.get_running_loop()
+        entry = _Entry(item, loop.create_future(), loop.time())
+        self._queue.append(entry)
+        if len(self._queue) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        try:
+            # On timeout wait_for cancels the future, which drops a still-queued item from its batch
+            return await asyncio.wait_for(entry.future, timeout if timeout is not None else self.timeout)
+        except asyncio.TimeoutError:
+            batch_rejected.inc(self.name, "deadline")
+            raise
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._queue:
+            batch: List[_Entry] = []
+            while self._queue and len(batch) < self.max_size:
+                entry = self._queue.popleft()
+                if not entry.future.done():
+                    batch.append(entry)
+            if batch:
+                self._in_flight += len(batch)
+                task = asyncio.get_running_loop().create_task(self._send(batch))
+                self._sending.add(task)
+                task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: List[_Entry]) -> None:
+        now = asyncio.get_running_loop().time()
+        batch_size.observe(len(batch), self.name)
+        for entry in batch:
+            batch_wait.observe(now - entry.enqueued_at, self.name)
+        try:
+            results = await self.send([entry.item for entry in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name} batch returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            results = [e] * len(batch)
+        finally:
+            self._in_flight -= len(batch)
+        for entry, result in zip(batch, results):
+            if entry.future.done():
+                continue
+            if isinstance(result, Exception):
+                entry.future.set_exception(result)
+            else:
+                entry.future.set_result(result)
+
+
+batch_size = metrics.histogram(
+    "kortana_batch_size",
+    "Items per upstream batch, by batcher",
+    ("batcher",),
+    buckets=BATCH_SIZE_BUCKETS,
+)
+batch_wait = metrics.histogram(
+    "kortana_batch_wait_seconds",
+    "Time items waited for their batch to be sent, by batcher",
+    ("batcher",),
+    buckets=BATCH_WAIT_BUCKETS,
+)
+batch_rejected = metrics.counter(
+    "kortana_batch_rejected_total",
+    "Items that failed before a result, by batcher and reason (queue_full, deadline)",
+    ("batcher", "reason"),
+)
@@ -0,0 +1,141 @@
+import base64
+import os
+import re
+import threading
+import zlib
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+import numpy as np
+
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() not in ("0", "false", "no")
+# Estimated Jaccard similarity of word shingles at which content counts as a duplicate
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "64"))
+DEDUP_SHINGLE_SIZE = int(os.getenv("DEDUP_SHINGLE_SIZE", "3"))
+
+TOKEN_PATTERN = re.compile(r"\w+")
+SEED = 1
+# Odd multipliers that mix the token hashes of one shingle into a single 64-bit value
+SHINGLE_MULTIPLIERS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0x27D4EB2F165667C5)
+# Largest shingle the multipliers cover
+MAX_SHINGLE_SIZE = len(SHINGLE_MULTIPLIERS)
+# Shingles hashed per step, bounding the (num_perm x chunk) temporary for long documents
+SIGNATURE_CHUNK = 8192
+
+
+def _bands_for(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """``(bands, rows)`` with the highest LSH threshold, (1/bands)**(1/rows), not above ``threshold``.
+
+    Erring low only adds candidates, which are verified against the full
+    signature; erring high would miss true duplicates.
+    """
+    options = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    below = [option for option in options if (1 / option[0]) ** (1 / option[1]) <= threshold]
+    return max(below, key=lambda option: (1 / option[0]) ** (1 / option[1])) if below else options[0]
+
+
+class MinHashLSH:
+    """Near-duplicate index over MinHash signatures of word shingles.
+
+    Each document is reduced to ``num_perm`` minimum hashes of its
+    ``shingle_size``-word shingles; the share of equal positions between two
+    signatures estimates the Jaccard similarity of their shingle sets. The
+    signature is cut into bands, and documents sharing any whole band are
+    candidates, so a query touches a handful of buckets instead of every
+    stored document. Candidates are then kept only if their estimated
+    similarity reaches ``threshold``.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEDUP_THRESHOLD,
+        num_perm: int = DEDUP_NUM_PERM,
+        shingle_size: int = DEDUP_SHINGLE_SIZE,
+    ):
+        if not 0 < threshold <= 1:
+            raise ValueError("Threshold must be in (0, 1]")
+        if not 1 <= shingle_size <= MAX_SHINGLE_SIZE:
+            raise ValueError(f"Shingle size must be between 1 and {MAX_SHINGLE_SIZE}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _bands_for(threshold, num_perm)
+        # Multiply-shift hash family: ((a * x + b) mod 2**64) >> 32 for 32-bit x
+        rng = np.random.default_rng(SEED)
+        self._a = rng.integers(1, 2 ** 63, num_perm, dtype=np.uint64)[:, None] | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)[:, None]
+        self._buckets: List[Dict[int, List[Hashable]]] = [{} for _ in range(self.bands)]
+        # Raw signature bytes: a bytes object is smaller than an ndarray of the same data
+        self._signatures: Dict[Hashable, bytes] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, doc_id: Hashable) -> bool:
+        return doc_id in self._signatures
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature (``num_perm`` uint32 values) of a text's word shingles."""
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        hashes = np.fromiter((zlib.crc32(token.encode()) for token in tokens), dtype=np.uint64, count=len(tokens))
+        size = min(self.shingle_size, len(hashes))
+        if size == 0:
+            hashes = np.zeros(1, dtype=np.uint64)
+            size = 1
+        shingles = np.zeros(len(hashes) - size + 1, dtype=np.uint64)
+        for offset in range(size):
+            shingles += hashes[offset : len(hashes) - size + 1 + offset] * np.uint64(SHINGLE_MULTIPLIERS[offset])
+        shingles = np.unique((shingles >> np.uint64(32)) ^ (shingles & np.uint64(0xFFFFFFFF)))
+        signature = np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint64)
+        for start in range(0, len(shingles), SIGNATURE_CHUNK):
+            chunk = shingles[None, start : start + SIGNATURE_CHUNK]
+            np.minimum(signature, ((self._a * chunk + self._b) >> np.uint64(32)).min(axis=1), out=signature)
+        return signature.astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        return [hash(band.tobytes()) for band in signature.reshape(self.bands, self.rows)]
+
+    def query(self, signature: np.ndarray, exclude: Optional[Hashable] = None) -> List[Tuple[Hashable, float]]:
+        """Indexed documents at least ``threshold`` similar, most similar first."""
+        candidates: Set[Hashable] = set()
+        with self._lock:
+            for buckets, key in zip(self._buckets, self._band_keys(signature)):
+                candidates.update(buckets.get(key, ()))
+            candidates.discard(exclude)
+            scored = [
+                (doc_id, float(np.mean(np.frombuffer(self._signatures[doc_id], dtype=np.uint32) == signature)))
+                for doc_id in candidates
+            ]
+        matches = [(doc_id, round(similarity, 4)) for doc_id, similarity in scored if similarity >= self.threshold]
+        return sorted(matches, key=lambda match: match[1], reverse=True)
+
+    def add(self, doc_id: Hashable, signature: np.ndarray) -> None:
+        with self._lock:
+            self._remove(doc_id)
+            self._signatures[doc_id] = signature.tobytes()
+            for buckets, key in zip(self._buckets, self._band_keys(signature)):
+                buckets.setdefault(key, []).append(doc_id)
+
+    def remove(self, doc_id: Hashable) -> None:
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: Hashable) -> None:
+        signature = self._signatures.pop(doc_id, None)
+        if signature is None:
+            return
+        for buckets, key in zip(self._buckets, self._band_keys(np.frombuffer(signature, dtype=np.uint32))):
+            ids = buckets[key]
+            ids.remove(doc_id)
+            if not ids:
+                del buckets[key]
+
+    def encode(self, signature: np.ndarray) -> str:
+        """Signature as text, for storing with the document."""
+        return base64.b64encode(signature.astype("<u4").tobytes()).decode()
+
+    def decode(self, encoded: str) -> Optional[np.ndarray]:
+        """Stored signature, or None if it was made with other settings."""
+        signature = np.frombuffer(base64.b64decode(encoded), dtype="<u4").astype(np.uint32)
+        return signature if len(signature) == self.num_perm else None
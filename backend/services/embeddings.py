@@ -0,0 +1,112 @@
+import asyncio
+import os
+import zlib
+from typing import List
+
+import numpy as np
+
+from services.http_client import HTTPError, http_client
+from services.search_index import tokenize
+
+# "hashing" is deterministic and local, "gemini" calls the Gemini embedding API
+EMBEDDER = os.getenv("EMBEDDER", "hashing")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "256"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# Hashing text up to this many characters stays on the event loop; a thread hop costs more than that
+EMBED_INLINE_MAX_CHARS = 2000
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_EMBEDDING_MODEL = os.getenv("GEMINI_EMBEDDING_MODEL", "text-embedding-004")
+GEMINI_API_URL = os.getenv("GEMINI_API_URL", "https://generativelanguage.googleapis.com/v1beta")
+
+
+class EmbeddingError(Exception):
+    """Raised when an embedder cannot produce vectors."""
+
+
+class Embedder:
+    """Turns batches of text into L2-normalized float32 vectors."""
+
+    dim: int
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+class HashingEmbedder(Embedder):
+    """Deterministic feature-hashing embedder for tests and offline use.
+
+    Words and their character trigrams are hashed into signed buckets, so
+    inflections of the same word ("optimize", "optimizing") land close
+    together. It captures no real semantics; use ``GeminiEmbedder`` for that.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        features = []
+        for token in tokenize(text):
+            features.append(token)
+            padded = f"#{token}#"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        # CPU-bound: batches of documents run in a worker thread, short queries inline
+        if sum(len(text) for text in texts) <= EMBED_INLINE_MAX_CHARS:
+            return self._embed(texts)
+        return await asyncio.to_thread(self._embed, texts)
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = zlib.crc32(feature.encode())
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                vectors[row, digest % self.dim] += sign
+        return _normalize(vectors)
+
+
+class GeminiEmbedder(Embedder):
+    """Embeddings from the Gemini ``batchEmbedContents`` API."""
+
+    def __init__(self, model: str = GEMINI_EMBEDDING_MODEL, api_key: str = GEMINI_API_KEY, dim: int = 768):
+        if not api_key:
+            raise EmbeddingError("GEMINI_API_KEY is required for the gemini embedder")
+        self.model = model
+        self.api_key = api_key
+        self.dim = dim
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        payload = {
+            "requests": [
+                {"model": f"models/{self.model}", "content": {"parts": [{"text": text}]}}
+                for text in texts
+            ]
+        }
+        url = f"{GEMINI_API_URL}/models/{self.model}:batchEmbedContents"
+        try:
+            response = await http_client.post(url, params={"key": self.api_key}, json=payload)
+        except HTTPError as e:
+            raise EmbeddingError(str(e)) from e
+        if response.status_code != 200:
+            raise EmbeddingError(f"Embedding request failed with status {response.status_code}")
+        values = [item["values"] for item in response.json()["embeddings"]]
+        return _normalize(np.asarray(values, dtype=np.float32))
+
+
+def create_embedder(kind: str = EMBEDDER) -> Embedder:
+    """Build the configured embedder."""
+    if kind == "hashing":
+        return HashingEmbedder()
+    if kind == "gemini":
+        return GeminiEmbedder()
+    raise ValueError(f"Unknown embedder: {kind}")
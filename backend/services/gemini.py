@@ -0,0 +1,216 @@
+import asyncio
+import json
+import os
+import re
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from services.batching import MicroBatcher, QueueFull
+from services.http_client import HTTPError, http_client
+from services.llm_cache import LLMCache, llm_cache
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+KORTANA_BACKEND_URL = os.getenv("KORTANA_BACKEND_URL", "http://localhost:8000")
+# "local" runs Gemini calls in-process, "remote" forwards them to another Kor'tana backend
+GEMINI_DISPATCH_MODE = os.getenv("GEMINI_DISPATCH_MODE", "local")
+# Remote analyze/generate calls arriving together are sent as one batch request; 1 disables batching
+GEMINI_BATCH_MAX_SIZE = int(os.getenv("GEMINI_BATCH_MAX_SIZE", "16"))
+GEMINI_BATCH_MAX_WAIT_MS = float(os.getenv("GEMINI_BATCH_MAX_WAIT_MS", "5"))
+# Calls waiting for or awaiting a batch; beyond this they fail fast with 503
+GEMINI_BATCH_MAX_QUEUE = int(os.getenv("GEMINI_BATCH_MAX_QUEUE", "1000"))
+# Longest a caller waits for a batched result, queueing included
+GEMINI_DEADLINE = float(os.getenv("GEMINI_DEADLINE", "60"))
+
+# Operation -> (request field, response field holding the generated text)
+STREAM_FIELDS = {
+    "analyze": ("text", "analysis"),
+    "generate": ("description", "code"),
+    "chat": ("message", "response"),
+}
+# Operations with a /batch endpoint
+BATCH_OPERATIONS = ("analyze", "generate")
+TOKEN_PATTERN = re.compile(r"\S+\s*|\s+")
+
+
+class GeminiError(Exception):
+    """Raised when a Gemini call cannot be completed."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class GeminiService:
+    """Gemini operations shared by the gemini router and internal callers.
+
+    In ``local`` mode calls are plain coroutine calls inside this process, so
+    internal callers no longer pay for an HTTP round trip to their own server.
+    ``remote`` mode keeps the old behaviour of posting to
+    ``KORTANA_BACKEND_URL`` for deployments that split Gemini out; there,
+    concurrent analyze and generate calls that miss the cache are
+    micro-batched into one ``/batch`` request, so the per-request overhead
+    and per-host connection limit are paid once per batch.
+    """
+
+    def __init__(
+        self,
+        mode: str = GEMINI_DISPATCH_MODE,
+        base_url: str = KORTANA_BACKEND_URL,
+        model: str = GEMINI_MODEL,
+        cache: Optional[LLMCache] = llm_cache,
+        batch_size: int = GEMINI_BATCH_MAX_SIZE,
+    ):
+        if mode not in ("local", "remote"):
+            raise ValueError(f"Unknown Gemini dispatch mode: {mode}")
+        self.mode = mode
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.cache = cache
+        self.batchers: Dict[str, MicroBatcher] = {}
+        if mode == "remote" and batch_size > 1:
+            self.batchers = {
+                operation: MicroBatcher(
+                    f"gemini_{operation}",
+                    lambda prompts, operation=operation: self._remote_batch(operation, prompts),
+                    max_size=batch_size,
+                    max_wait=GEMINI_BATCH_MAX_WAIT_MS / 1000,
+                    max_queue=GEMINI_BATCH_MAX_QUEUE,
+                    timeout=GEMINI_DEADLINE,
+                )
+                for operation in BATCH_OPERATIONS
+            }
+
+    async def _cached(self, operation: str, prompt: str, compute) -> Dict[str, Any]:
+        """Serve a deterministic call from the LLM cache, computing it at most once."""
+        if self.cache is None:
+            return await compute()
+        key = self.cache.make_key(prompt, operation=operation, model=self.model)
+        return await self.cache.get_or_compute(key, compute)
+
+    async def _remote(self, endpoint: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            response = await http_client.post(f"{self.base_url}/api/gemini/{endpoint}", json=payload)
+        except HTTPError as e:
+            raise GeminiError(str(e)) from e
+        if response.status_code != 200:
+            raise GeminiError("Gemini request failed", status_code=response.status_code)
+        return response.json()
+
+    async def _dispatch(self, operation: str, prompt: str, timeout: Optional[float]) -> Dict[str, Any]:
+        """Send one remote call, through the operation's batcher when batching is on."""
+        batcher = self.batchers.get(operation)
+        if batcher is None:
+            return await self._remote(operation, {STREAM_FIELDS[operation][0]: prompt})
+        try:
+            return await batcher.submit(prompt, timeout)
+        except QueueFull as e:
+            raise GeminiError(str(e), status_code=503) from e
+        except asyncio.TimeoutError as e:
+            raise GeminiError("Gemini request deadline exceeded", status_code=504) from e
+
+    async def _remote_batch(self, operation: str, prompts: List[str]) -> List[Any]:
+        """One upstream request for many prompts; per-item failures come back as ``GeminiError``."""
+        field = STREAM_FIELDS[operation][0]
+        try:
+            response = await http_client.post(
+                f"{self.base_url}/api/gemini/{operation}/batch", json={"items": [{field: p} for p in prompts]}
+            )
+        except HTTPError as e:
+            raise GeminiError(str(e)) from e
+        if response.status_code == 404:
+            # The other backend predates batching: fall back to one request per prompt
+            return await asyncio.gather(
+                *(self._remote(operation, {field: p}) for p in prompts), return_exceptions=True
+            )
+        if response.status_code != 200:
+            raise GeminiError("Gemini request failed", status_code=response.status_code)
+        return [
+            item["result"] if "result" in item else GeminiError(item.get("error", "Gemini request failed"), item.get("status_code"))
+            for item in response.json()["results"]
+        ]
+
+    async def batch(self, operation: str, prompts: List[str]) -> List[Dict[str, Any]]:
+        """Run many analyze or generate calls at once, as ``{"result"}`` or ``{"error", "status_code"}`` items."""
+        if operation not in BATCH_OPERATIONS:
+            raise ValueError(f"Unknown Gemini batch operation: {operation}")
+        results = await asyncio.gather(*(getattr(self, operation)(p) for p in prompts), return_exceptions=True)
+        items = []
+        for result in results:
+            if isinstance(result, GeminiError):
+                items.append({"error": str(result), "status_code": result.status_code})
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                items.append({"result": result})
+        return items
+
+    async def analyze(self, text: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Pass GitHub issue/PR text to Gemini for analysis."""
+        return await self._cached("analyze", text, lambda: self._analyze(text, timeout))
+
+    async def _analyze(self, text: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        if self.mode == "remote":
+            return await self._dispatch("analyze", text, timeout)
+        # Placeholder Gemini call - implement actual Gemini integration
+        return {"input": text, "analysis": f"Gemini would analyze: {text}"}
+
+    async def generate(self, description: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Generate code based on description."""
+        return await self._cached("generate", description, lambda: self._generate(description, timeout))
+
+    async def _generate(self, description: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        if self.mode == "remote":
+            return await self._dispatch("generate", description, timeout)
+        # Placeholder - implement code generation
+        return {"description": description, "code": f"# Generated code for: {description}"}
+
+    async def chat(self, message: str) -> Dict[str, Any]:
+        """Basic chat (conversational, so never cached)."""
+        if self.mode == "remote":
+            return await self._remote("chat", {"message": message})
+        # Placeholder - implement Gemini chat
+        return {"response": f"Echo: {message}"}
+
+    async def stream(self, operation: str, prompt: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield ``{"token": ...}`` chunks, then ``{"done": True, "result": ...}``.
+
+        The local backend still produces placeholder text in one piece, so it
+        is emitted token by token; remote mode relays the other backend's
+        stream as it arrives.
+        """
+        if operation not in STREAM_FIELDS:
+            raise ValueError(f"Unknown Gemini operation: {operation}")
+        request_field, response_field = STREAM_FIELDS[operation]
+
+        if self.mode == "remote":
+            async for event in self._remote_stream(operation, {request_field: prompt}):
+                yield event
+            return
+
+        result = await getattr(self, operation)(prompt)
+        for token in TOKEN_PATTERN.findall(result.get(response_field, "")):
+            yield {"token": token}
+        yield {"done": True, "result": result}
+
+    async def _remote_stream(self, operation: str, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        url = f"{self.base_url}/api/gemini/{operation}/stream"
+        try:
+            async with http_client.stream("POST", url, json=payload) as response:
+                if response.status_code != 200:
+                    raise GeminiError("Gemini request failed", status_code=response.status_code)
+                event = None
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line[len("event: "):]
+                    elif line.startswith("data: "):
+                        data = json.loads(line[len("data: "):])
+                        if event == "error":
+                            raise GeminiError(data.get("error", "Gemini request failed"), data.get("status_code"))
+                        yield {"done": True, "result": data} if event == "done" else data
+                        event = None
+        except HTTPError as e:
+            raise GeminiError(str(e)) from e
+
+
+# Global instance
+gemini_service = GeminiService()
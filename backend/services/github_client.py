@@ -0,0 +1,270 @@
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from services.http_client import AsyncHTTPClient, HTTPError, http_client
+from services.metrics import metrics
+
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+# Requests kept in hand for interactive use once the budget runs low
+GITHUB_RATE_LIMIT_RESERVE = int(os.getenv("GITHUB_RATE_LIMIT_RESERVE", "50"))
+GITHUB_RATE_LIMIT_MAX_WAIT = float(os.getenv("GITHUB_RATE_LIMIT_MAX_WAIT", "60"))
+GITHUB_PAGE_CONCURRENCY = int(os.getenv("GITHUB_PAGE_CONCURRENCY", "4"))
+GITHUB_MAX_PAGES = int(os.getenv("GITHUB_MAX_PAGES", "10"))
+# Most pages a caller may ask the routes for with ``max_pages``
+GITHUB_MAX_PAGES_LIMIT = int(os.getenv("GITHUB_MAX_PAGES_LIMIT", "50"))
+GITHUB_ETAG_CACHE_SIZE = int(os.getenv("GITHUB_ETAG_CACHE_SIZE", "2048"))
+
+LINK_PATTERN = re.compile(r'<([^>]+)>;\s*rel="([^"]+)"')
+
+
+class GitHubError(Exception):
+    """Raised when the GitHub API cannot serve a request."""
+
+    def __init__(self, message: str, status_code: int = 502):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def parse_link_header(header: Optional[str]) -> Dict[str, str]:
+    """Map ``rel`` names to URLs from a ``Link`` header."""
+    if not header:
+        return {}
+    return {rel: url for url, rel in LINK_PATTERN.findall(header)}
+
+
+class GitHubClient:
+    """GitHub REST client with pagination, ETag caching and rate-limit budgeting.
+
+    GET responses are cached by URL together with their ``ETag``; repeating a
+    request sends ``If-None-Match`` and a ``304`` is answered from the cache,
+    which GitHub does not count against the rate limit. ``X-RateLimit-*``
+    headers are tracked per resource and, once fewer than ``reserve`` calls
+    remain, requests are paced until the window resets (or rejected when the
+    reset is further away than ``max_wait``).
+    """
+
+    def __init__(
+        self,
+        token: Optional[str] = GITHUB_TOKEN,
+        base_url: str = GITHUB_API_URL,
+        client: AsyncHTTPClient = http_client,
+        reserve: int = GITHUB_RATE_LIMIT_RESERVE,
+        max_wait: float = GITHUB_RATE_LIMIT_MAX_WAIT,
+        page_concurrency: int = GITHUB_PAGE_CONCURRENCY,
+        cache_size: int = GITHUB_ETAG_CACHE_SIZE,
+    ):
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.client = client
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self.page_concurrency = page_concurrency
+        self.cache_size = cache_size
+        self._etags: "OrderedDict[str, Tuple[str, Any, Dict[str, str]]]" = OrderedDict()
+        self.rate_limits: Dict[str, Dict[str, int]] = {}
+        # Earliest time the next paced call per resource may go out
+        self._next_call: Dict[str, float] = {}
+        self.counters = {"requests": 0, "not_modified": 0, "rate_limited_waits": 0}
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.token)
+
+    def _url(self, path: str, params: Optional[Dict[str, Any]] = None) -> str:
+        url = path if path.startswith("http") else f"{self.base_url}{path}"
+        if params:
+            query = {k: v for k, v in params.items() if v is not None}
+            url = f"{url}{'&' if '?' in url else '?'}{urlencode(query)}"
+        return url
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {"Accept": "application/vnd.github+json", "X-GitHub-Api-Version": "2022-11-28"}
+        if self.token:
+            headers["Authorization"] = f"token {self.token}"
+        return headers
+
+    def _record_rate_limit(self, headers) -> None:
+        if "X-RateLimit-Remaining" not in headers:
+            return
+        resource = headers.get("X-RateLimit-Resource", "core")
+        previous = self.rate_limits.get(resource, {})
+        self.rate_limits[resource] = {
+            "limit": int(headers.get("X-RateLimit-Limit", previous.get("limit", 0))),
+            "remaining": int(headers["X-RateLimit-Remaining"]),
+            "reset": int(headers.get("X-RateLimit-Reset", previous.get("reset", 0))),
+        }
+
+    async def _wait_for_budget(self, resource: str = "core") -> None:
+        state = self.rate_limits.get(resource)
+        if state is None or state["remaining"] > self.reserve:
+            return
+        now = time.time()
+        wait = state["reset"] - now
+        if wait <= 0:
+            return
+        if state["remaining"] > 0:
+            # Spread the remaining calls over what is left of the window. Each caller
+            # takes the next free slot, so concurrent callers reading the same
+            # snapshot are spaced out instead of all firing after the same delay
+            call_at = max(now, self._next_call.get(resource, 0.0)) + wait / state["remaining"]
+            wait = call_at - now
+        if wait > self.max_wait:
+            raise GitHubError("GitHub rate limit budget exhausted", status_code=429)
+        if state["remaining"] > 0:
+            self._next_call[resource] = call_at
+        self.counters["rate_limited_waits"] += 1
+        await asyncio.sleep(wait)
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Any = None,
+        resource: str = "core",
+    ) -> Tuple[int, Any, Dict[str, str]]:
+        """Send a request and return ``(status, body, headers)``."""
+        url = self._url(path, params)
+        headers = self._headers()
+        cached = self._etags.get(url) if method == "GET" else None
+        if cached is not None:
+            headers["If-None-Match"] = cached[0]
+
+        await self._wait_for_budget(resource)
+        try:
+            response = await self.client.request(method, url, headers=headers, json=json)
+        except HTTPError as e:
+            raise GitHubError(f"Failed to reach GitHub: {str(e)}") from e
+
+        self.counters["requests"] += 1
+        self._record_rate_limit(response.headers)
+
+        if response.status_code == 304 and cached is not None:
+            self.counters["not_modified"] += 1
+            self._etags.move_to_end(url)
+            return 200, cached[1], cached[2]
+
+        try:
+            body = response.json() if response.content else None
+        except ValueError as e:
+            # An HTML error page from a proxy, or a truncated body
+            status = response.status_code if response.status_code >= 400 else 502
+            raise GitHubError(f"GitHub returned a non-JSON {response.status_code} response", status_code=status) from e
+        kept_headers = {name: response.headers[name] for name in ("Link", "ETag") if name in response.headers}
+
+        if method == "GET" and response.status_code == 200 and "ETag" in response.headers:
+            self._etags[url] = (response.headers["ETag"], body, kept_headers)
+            self._etags.move_to_end(url)
+            while len(self._etags) > self.cache_size:
+                self._etags.popitem(last=False)
+
+        return response.status_code, body, kept_headers
+
+    async def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """GET a resource, raising ``GitHubError`` on any non-200 status."""
+        status, body, _ = await self.request("GET", path, params)
+        if status != 200:
+            raise GitHubError(f"GitHub returned {status} for {path}", status_code=status)
+        return body
+
+    async def paginate(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        per_page: int = 100,
+        max_pages: Optional[int] = GITHUB_MAX_PAGES,
+    ) -> List[Any]:
+        """Fetch every page of a list endpoint by following ``Link`` headers."""
+        items: List[Any] = []
+        async for page_items in self.iter_pages(path, params, per_page, max_pages):
+            items.extend(page_items)
+        return items
+
+    async def iter_pages(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        per_page: int = 100,
+        max_pages: Optional[int] = GITHUB_MAX_PAGES,
+    ) -> AsyncIterator[List[Any]]:
+        """Yield the pages of a list endpoint in order as they become available.
+
+        When the first page advertises ``rel="last"``, the remaining pages are
+        fetched concurrently (bounded by ``page_concurrency``); otherwise
+        ``rel="next"`` is followed one page at a time.
+        """
+        query = {**(params or {}), "per_page": per_page}
+        status, first, headers = await self.request("GET", path, query)
+        if status != 200:
+            raise GitHubError(f"GitHub returned {status} for {path}", status_code=status)
+
+        yield list(first or [])
+        links = parse_link_header(headers.get("Link"))
+        pages_fetched = 1
+
+        if "last" in links:
+            last_page = int(parse_qs(urlsplit(links["last"]).query).get("page", ["1"])[0])
+            if max_pages is not None:
+                last_page = min(last_page, max_pages)
+            semaphore = asyncio.Semaphore(self.page_concurrency)
+
+            async def fetch(page: int) -> List[Any]:
+                async with semaphore:
+                    return await self.get(path, {**query, "page": page})
+
+            tasks = [asyncio.ensure_future(fetch(page)) for page in range(2, last_page + 1)]
+            try:
+                for task in tasks:
+                    yield list(await task or [])
+            finally:
+                for task in tasks:
+                    task.cancel()
+                # Let cancelled fetches finish unwinding before the caller moves on
+                await asyncio.gather(*tasks, return_exceptions=True)
+            return
+
+        next_url = links.get("next")
+        while next_url and (max_pages is None or pages_fetched < max_pages):
+            status, page_items, headers = await self.request("GET", next_url)
+            if status != 200:
+                raise GitHubError(f"GitHub returned {status} for {path}", status_code=status)
+            yield list(page_items or [])
+            pages_fetched += 1
+            next_url = parse_link_header(headers.get("Link")).get("next")
+
+    async def page(
+        self, path: str, params: Optional[Dict[str, Any]] = None, page: int = 1, per_page: int = 100
+    ) -> Tuple[List[Any], Optional[int]]:
+        """Fetch a single page and the number of the next one, if any."""
+        status, items, headers = await self.request("GET", path, {**(params or {}), "per_page": per_page, "page": page})
+        if status != 200:
+            raise GitHubError(f"GitHub returned {status} for {path}", status_code=status)
+        next_url = parse_link_header(headers.get("Link")).get("next")
+        next_page = int(parse_qs(urlsplit(next_url).query).get("page", [page + 1])[0]) if next_url else None
+        return list(items or []), next_page
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "etag_entries": len(self._etags), "rate_limits": self.rate_limits}
+
+
+# Global instance
+github_client = GitHubClient()
+
+metrics.gauge(
+    "kortana_github_rate_limit_remaining",
+    "GitHub requests left in the current rate-limit window, by resource",
+    lambda: {(resource,): limits["remaining"] for resource, limits in github_client.rate_limits.items()},
+    ("resource",),
+)
+metrics.gauge(
+    "kortana_github_requests",
+    "GitHub client requests, 304 responses and rate-limit waits",
+    lambda: {(name,): count for name, count in github_client.counters.items()},
+    ("kind",),
+)
@@ -0,0 +1,157 @@
+import asyncio
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from services.metrics import metrics, upstream_duration, upstream_errors, upstream_retries
+
+HTTPError = httpx.HTTPError
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "10"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.25"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "5"))
+
+RETRYABLE_STATUS = {429, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# Errors raised before the request reached the server are safe to retry for any method
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class AsyncHTTPClient:
+    """Shared async HTTP client with pooling, per-host limits and retries.
+
+    One ``httpx.AsyncClient`` is kept for the lifetime of the app so
+    connections to GitHub and Gemini are reused across requests. Every host
+    gets its own semaphore so a slow upstream cannot take every pooled
+    connection.
+    """
+
+    def __init__(
+        self,
+        timeout: float = HTTP_TIMEOUT,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive: int = HTTP_MAX_KEEPALIVE,
+        per_host_limit: int = HTTP_PER_HOST_LIMIT,
+        retries: int = HTTP_RETRIES,
+        backoff_base: float = HTTP_BACKOFF_BASE,
+        backoff_max: float = HTTP_BACKOFF_MAX,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.per_host_limit = per_host_limit
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def started(self) -> bool:
+        return self._client is not None and not self._client.is_closed
+
+    async def start(self) -> None:
+        """Open the connection pool."""
+        if not self.started:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits, transport=self.transport)
+
+    async def close(self) -> None:
+        """Close the connection pool and drop idle connections."""
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._host_limits.clear()
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        semaphore = self._host_limits.get(host)
+        if semaphore is None:
+            semaphore = self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return semaphore
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """Full-jitter exponential backoff, honouring ``Retry-After`` when present."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def request(self, method: str, url: str, retries: Optional[int] = None, **kwargs: Any) -> httpx.Response:
+        """Send a request, retrying transient failures with jittered backoff."""
+        if not self.started:
+            await self.start()
+        if not metrics.enabled:
+            return await self._request(method, url, retries, **kwargs)
+
+        upstream = urlsplit(url).netloc
+        start = time.perf_counter()
+        try:
+            response = await self._request(method, url, retries, upstream=upstream, **kwargs)
+        except httpx.TransportError:
+            upstream_errors.inc(upstream, "transport")
+            raise
+        finally:
+            upstream_duration.observe(time.perf_counter() - start, upstream, method.upper())
+        if response.status_code >= 400:
+            upstream_errors.inc(upstream, f"{response.status_code // 100}xx")
+        return response
+
+    async def _request(
+        self, method: str, url: str, retries: Optional[int], upstream: Optional[str] = None, **kwargs: Any
+    ) -> httpx.Response:
+        method = method.upper()
+        max_retries = self.retries if retries is None else retries
+        idempotent = method in IDEMPOTENT_METHODS
+        attempt = 0
+
+        while True:
+            try:
+                async with self._host_limit(url):
+                    response = await self._client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                retryable = idempotent or isinstance(e, UNSENT_ERRORS)
+                if not retryable or attempt >= max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+            else:
+                if response.status_code not in RETRYABLE_STATUS or attempt >= max_retries:
+                    return response
+                if not idempotent and response.status_code not in (429, 503):
+                    return response
+                await response.aclose()
+                await asyncio.sleep(self._backoff(attempt, response))
+            attempt += 1
+            if upstream is not None:
+                upstream_retries.inc(upstream)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs: Any) -> AsyncIterator[httpx.Response]:
+        """Open a streaming response (not retried, since the body may already be consumed)."""
+        if not self.started:
+            await self.start()
+        async with self._host_limit(url):
+            async with self._client.stream(method.upper(), url, **kwargs) as response:
+                yield response
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+
+# Global instance, opened and closed by the app lifespan
+http_client = AsyncHTTPClient()
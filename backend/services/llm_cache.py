@@ -0,0 +1,274 @@
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from services.metrics import metrics
+
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+LLM_CACHE_DISK_MAX_ENTRIES = int(os.getenv("LLM_CACHE_DISK_MAX_ENTRIES", "100000"))
+# Set LLM_CACHE_DIR to an empty string to keep the cache in memory only
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(tempfile.gettempdir(), "kortana-llm-cache"))
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+MISSING = object()
+# Result of an in-flight computation whose caller was cancelled; a waiting caller retries it
+_ABANDONED = object()
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so indentation changes do not defeat the cache."""
+    return WHITESPACE_PATTERN.sub(" ", prompt).strip()
+
+
+class LLMCache:
+    """Content-addressed cache for LLM responses.
+
+    Entries are keyed by a SHA-256 of the normalized prompt and the model
+    parameters. A bounded LRU memory tier sits in front of an optional disk
+    tier with its own size limit, both honouring the same TTL. Concurrent
+    misses on the same key are coalesced so only one upstream call is made.
+    Every caller gets its own copy of a cached value, so a caller mutating
+    its result cannot change what later callers are served.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        ttl: float = LLM_CACHE_TTL,
+        cache_dir: Optional[str] = LLM_CACHE_DIR,
+        disk_max_entries: int = LLM_CACHE_DISK_MAX_ENTRIES,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache_dir = cache_dir or None
+        self.disk_max_entries = disk_max_entries
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._disk_writes = 0
+        self.counters = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "disk_evictions": 0,
+            "expirations": 0,
+        }
+
+    @staticmethod
+    def make_key(prompt: str, **params: Any) -> str:
+        """Hash a prompt together with the parameters that affect the response."""
+        material = json.dumps({"prompt": normalize_prompt(prompt), "params": params}, sort_keys=True)
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus current tier sizes."""
+        # Coalesced callers were served without an upstream call, so they count as hits
+        served = self.counters["hits"] + self.counters["coalesced"]
+        lookups = served + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(served / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "disk_enabled": self.cache_dir is not None,
+            "inflight": len(self._inflight),
+        }
+
+    # Memory tier
+
+    def _memory_get(self, key: str) -> Any:
+        entry = self._memory.get(key)
+        if entry is None:
+            return MISSING
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._memory[key]
+            self.counters["expirations"] += 1
+            return MISSING
+        self._memory.move_to_end(key)
+        return value
+
+    def _memory_set(self, key: str, value: Any, expires_at: float) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    # Disk tier
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _disk_get(self, key: str) -> Tuple[float, Any]:
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return 0.0, MISSING
+        if entry["expires_at"] < time.time():
+            self.counters["expirations"] += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return 0.0, MISSING
+        # Touch so the disk tier evicts by last use
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry["expires_at"], entry["value"]
+
+    def _disk_set(self, key: str, value: Any, expires_at: float) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"expires_at": expires_at, "value": value}, f)
+        os.replace(tmp_path, path)
+
+        self._disk_writes += 1
+        # Sweeping the directory is O(n), so only do it once every few hundred writes
+        if self._disk_writes % 256 == 0:
+            self._disk_evict()
+
+    def _disk_evict(self) -> None:
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        entries.append((os.path.getmtime(path), path))
+                    except OSError:
+                        continue
+        overflow = len(entries) - self.disk_max_entries
+        if overflow <= 0:
+            return
+        entries.sort()
+        for _, path in entries[:overflow]:
+            try:
+                os.remove(path)
+                self.counters["disk_evictions"] += 1
+            except OSError:
+                pass
+
+    def _disk_clear(self) -> None:
+        # Only cache files and their key-prefix directories; the directory may be shared
+        for root, _, files in os.walk(self.cache_dir, topdown=False):
+            for name in files:
+                if name.endswith((".json", ".tmp")):
+                    try:
+                        os.remove(os.path.join(root, name))
+                    except OSError:
+                        pass
+            if root != self.cache_dir:
+                try:
+                    os.rmdir(root)
+                except OSError:
+                    pass
+
+    # Public API
+
+    async def get(self, key: str) -> Any:
+        """Return a cached value or ``MISSING``."""
+        value = self._memory_get(key)
+        if value is not MISSING:
+            self.counters["hits"] += 1
+            self.counters["memory_hits"] += 1
+            return value
+
+        if self.cache_dir is not None:
+            expires_at, value = await asyncio.to_thread(self._disk_get, key)
+            if value is not MISSING:
+                self.counters["hits"] += 1
+                self.counters["disk_hits"] += 1
+                self._memory_set(key, value, expires_at)
+                return value
+
+        self.counters["misses"] += 1
+        return MISSING
+
+    async def set(self, key: str, value: Any) -> None:
+        """Store a value in both tiers."""
+        expires_at = time.time() + self.ttl
+        self._memory_set(key, value, expires_at)
+        if self.cache_dir is not None:
+            try:
+                await asyncio.to_thread(self._disk_set, key, value, expires_at)
+            except (OSError, TypeError, ValueError):
+                # The disk tier is best effort; the memory tier already has the value
+                pass
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Return a copy of the cached value, or compute it once for all concurrent callers.
+
+        If the caller computing it is cancelled, one of the callers waiting
+        on it takes over instead of all of them failing.
+        """
+        inflight = self._inflight.get(key)
+        while inflight is not None:
+            value = await asyncio.shield(inflight)
+            if value is not _ABANDONED:
+                self.counters["coalesced"] += 1
+                return copy.deepcopy(value)
+            inflight = self._inflight.get(key)
+
+        # Register before the lookup so callers arriving during a disk read also coalesce
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self.get(key)
+            if value is MISSING:
+                value = await compute()
+                await self.set(key, value)
+        except asyncio.CancelledError:
+            future.set_result(_ABANDONED)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody else was waiting
+            raise
+        else:
+            future.set_result(value)
+            return copy.deepcopy(value)
+        finally:
+            self._inflight.pop(key, None)
+
+    async def clear(self) -> None:
+        """Drop both tiers and reset counters."""
+        self._memory.clear()
+        if self.cache_dir is not None:
+            await asyncio.to_thread(self._disk_clear)
+        for name in self.counters:
+            self.counters[name] = 0
+
+
+# Global instance
+llm_cache = LLMCache()
+
+metrics.gauge(
+    "kortana_llm_cache_hit_ratio",
+    "Share of LLM cache lookups served without an upstream call",
+    lambda: llm_cache.stats()["hit_rate"],
+)
+metrics.gauge(
+    "kortana_llm_cache_events",
+    "LLM cache hits, misses, coalesced callers and evictions since the last clear",
+    lambda: {(event,): count for event, count in llm_cache.counters.items()},
+    ("event",),
+)
+metrics.gauge("kortana_llm_cache_entries", "Entries in the LLM cache memory tier", lambda: len(llm_cache._memory))
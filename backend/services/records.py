@@ -0,0 +1,320 @@
+import base64
+import binascii
+import sys
+import zlib
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Callable, Dict, ItemsView, Iterator, Optional, Tuple, Union, ValuesView
+
+# Text at least this long is kept zlib-compressed; shorter text would not shrink
+COMPRESS_MIN_LENGTH = 256
+COMPRESS_LEVEL = 6
+# Recently decoded texts and timestamps kept, so hot records (search hits, status tails) decode once
+DECODE_CACHE_SIZE = 4096
+# Key of the JSON object a compressed text is persisted as
+ZLIB_KEY = "$zlib"
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+_MISSING = object()
+
+
+class Field:
+    """How one record field is stored; the base class stores values as given."""
+
+    def encode(self, record: "CompactRecord", value: Any) -> Any:
+        return value
+
+    def decode(self, record: "CompactRecord", raw: Any) -> Any:
+        return raw
+
+    def persist(self, record: "CompactRecord", raw: Any) -> Any:
+        """The JSON value persisted for ``raw``; ``encode`` must accept it back."""
+        return self.decode(record, raw)
+
+
+class Symbol(Field):
+    """Short strings repeated across records (status, source), interned."""
+
+    def encode(self, record: "CompactRecord", value: Any) -> Any:
+        return sys.intern(value) if type(value) is str else value
+
+
+class Timestamp(Field):
+    """Naive ISO timestamps as integer microseconds since 1970-01-01.
+
+    Values that would not round-trip exactly (other formats, offsets) are
+    kept as strings.
+    """
+
+    def encode(self, record: "CompactRecord", value: Any) -> Any:
+        if type(value) is not str:
+            return value
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+        if parsed.tzinfo is not None or parsed.isoformat() != value:
+            return value
+        return (parsed - EPOCH) // MICROSECOND
+
+    def decode(self, record: "CompactRecord", raw: Any) -> Any:
+        return _isoformat(raw) if type(raw) is int else raw
+
+
+@lru_cache(maxsize=DECODE_CACHE_SIZE)
+def _isoformat(microseconds: int) -> str:
+    return (EPOCH + microseconds * MICROSECOND).isoformat()
+
+
+class Text(Field):
+    """Long text, compressed.
+
+    With ``dictionary`` naming other text fields, their values seed the
+    compressor, so text quoting it (LLM output echoing its input) stores
+    the quoted part as back-references instead of a second copy. ``preset``
+    adds fixed text to the seed, such as the prompt template the text was
+    generated from.
+
+    Text compressed without a seed is persisted compressed too (as
+    ``{"$zlib": <base64>}``), so loading it back costs no compression.
+    Seeded text is persisted as plain text: its compressed form is only
+    readable with the same seed, which changes with the prompt or the
+    source fields.
+    """
+
+    def __init__(self, dictionary: Union[str, Tuple[str, ...]] = (), preset: str = ""):
+        self.dictionary = (dictionary,) if isinstance(dictionary, str) else tuple(dictionary)
+        self.preset = preset.encode()
+        self.seeded = bool(self.dictionary or self.preset)
+
+    def _zdict(self, record: "CompactRecord", cached: bool = True) -> Optional[bytes]:
+        # Text nearest the end of a zlib dictionary is the cheapest to reference
+        sources = [_text(record, name, cached) for name in self.dictionary]
+        zdict = self.preset + b"".join(source.encode() for source in sources if isinstance(source, str))
+        return zdict or None
+
+    def encode(self, record: "CompactRecord", value: Any) -> Any:
+        if type(value) is dict and len(value) == 1 and ZLIB_KEY in value:
+            raw = base64.b64decode(value[ZLIB_KEY])
+            if not self.seeded:
+                return raw
+            value = _decompress.__wrapped__(raw, None)
+        if type(value) is not str or len(value) < COMPRESS_MIN_LENGTH:
+            return value
+        # Decoding the dictionary here must not fill the decode cache: bulk
+        # loads would otherwise keep a decoded copy of every record's source
+        zdict = self._zdict(record, cached=False)
+        if zdict is None:
+            return zlib.compress(value.encode(), COMPRESS_LEVEL)
+        compressor = zlib.compressobj(COMPRESS_LEVEL, zdict=zdict)
+        return compressor.compress(value.encode()) + compressor.flush()
+
+    def decode(self, record: "CompactRecord", raw: Any, cached: bool = True) -> Any:
+        if type(raw) is not bytes:
+            return raw
+        decompress = _decompress if cached else _decompress.__wrapped__
+        return decompress(raw, self._zdict(record, cached))
+
+    def persist(self, record: "CompactRecord", raw: Any) -> Any:
+        if type(raw) is bytes and not self.seeded:
+            return {ZLIB_KEY: base64.b64encode(raw).decode()}
+        return self.decode(record, raw, cached=False)
+
+
+def _text(record: "CompactRecord", name: str, cached: bool) -> Any:
+    raw = getattr(record, name, None)
+    field = record.FIELDS.get(name)
+    return field.decode(record, raw, cached) if isinstance(field, Text) else record.get(name)
+
+
+@lru_cache(maxsize=DECODE_CACHE_SIZE)
+def _decompress(raw: bytes, zdict: Optional[bytes]) -> str:
+    if zdict is None:
+        return zlib.decompress(raw).decode()
+    return zlib.decompressobj(zdict=zdict).decompress(raw).decode()
+
+
+class SharedList(Field):
+    """Lists of strings drawn from a small vocabulary (tags).
+
+    Each distinct combination is stored once as a tuple of interned strings
+    and shared by every record holding it. Reads return that tuple, so a
+    change is made by assigning a new list (``record["tags"] = [...]``);
+    an in-place edit fails instead of being lost.
+    """
+
+    def __init__(self):
+        self._shared: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+    def encode(self, record: "CompactRecord", value: Any) -> Any:
+        if type(value) not in (list, tuple) or not all(type(item) is str for item in value):
+            return value
+        key = tuple(sys.intern(item) for item in value)
+        return self._shared.setdefault(key, key)
+
+
+class OptionalMapping(Field):
+    """Dicts that are usually empty (metadata); an empty dict is not stored."""
+
+    def encode(self, record: "CompactRecord", value: Any) -> Any:
+        return None if value == {} else value
+
+    def decode(self, record: "CompactRecord", raw: Any) -> Any:
+        return {} if raw is None else raw
+
+
+class Packed(Field):
+    """Binary values carried as base64 text (signatures), held as raw bytes."""
+
+    def encode(self, record: "CompactRecord", value: Any) -> Any:
+        if type(value) is not str:
+            return value
+        try:
+            return base64.b64decode(value, validate=True)
+        except binascii.Error:
+            return value
+
+    def decode(self, record: "CompactRecord", raw: Any) -> Any:
+        return base64.b64encode(raw).decode() if type(raw) is bytes else raw
+
+
+class CompactRecord(MutableMapping):
+    """A dict-like record whose known fields live in ``__slots__``.
+
+    Subclasses declare ``FIELDS`` (name -> ``Field``) and
+    ``__slots__ = tuple(FIELDS)``. Each field is stored in its encoded form
+    and decoded on access, so callers keep using ``record["x"]``,
+    ``record.get("x")`` and ``update`` while a record costs a fraction of a
+    plain dict. Keys outside ``FIELDS`` go to a per-record overflow dict.
+    Iteration yields fields in declaration order, then overflow keys.
+    """
+
+    __slots__ = ("_extra",)
+    FIELDS: Dict[str, Field] = {}
+    # Field -> text fields compressed against it, re-encoded when it changes
+    _DEPENDENTS: Dict[str, Tuple[str, ...]] = {}
+    # Field -> decode function, None where values are stored as given
+    _DECODERS: Dict[str, Optional[Callable[["CompactRecord", Any], Any]]] = {}
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        cls._DECODERS = {
+            name: None if type(field).decode is Field.decode else field.decode for name, field in cls.FIELDS.items()
+        }
+        dependents: Dict[str, Tuple[str, ...]] = {}
+        for name, field in cls.FIELDS.items():
+            for source in field.dictionary if isinstance(field, Text) else ():
+                dependents[source] = dependents.get(source, ()) + (name,)
+        cls._DEPENDENTS = dependents
+
+    def __init__(self, data: Any = (), **fields: Any):
+        self._extra: Optional[Dict[str, Any]] = None
+        self.update(data, **fields)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._DECODERS:
+            if self._extra is not None and key in self._extra:
+                return self._extra[key]
+            raise KeyError(key)
+        raw = getattr(self, key, _MISSING)
+        if raw is _MISSING:
+            raise KeyError(key)
+        decode = self._DECODERS[key]
+        return raw if decode is None else decode(self, raw)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        field = self.FIELDS.get(key)
+        if field is None:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+            return
+        dependents = self._detach(key)
+        setattr(self, key, field.encode(self, value))
+        self._attach(dependents)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        if key not in self.FIELDS:
+            del self._extra[key]
+            return
+        dependents = self._detach(key)
+        delattr(self, key)
+        self._attach(dependents)
+
+    def _detach(self, key: str) -> Dict[str, Any]:
+        """Decode the text fields compressed against ``key`` before it changes."""
+        return {name: self[name] for name in self._DEPENDENTS.get(key, ()) if name in self}
+
+    def _attach(self, dependents: Dict[str, Any]) -> None:
+        for name, value in dependents.items():
+            setattr(self, name, self.FIELDS[name].encode(self, value))
+
+    def __contains__(self, key: object) -> bool:
+        if key in self.FIELDS:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        for name in self.FIELDS:
+            if hasattr(self, name):
+                yield name
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """A plain dict copy, for JSON encoding and responses typed as ``Any``."""
+        data = {}
+        for name, decode in self._DECODERS.items():
+            raw = getattr(self, name, _MISSING)
+            if raw is not _MISSING:
+                data[name] = raw if decode is None else decode(self, raw)
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    def to_stored(self) -> Dict[str, Any]:
+        """A plain dict of the form persisted to storage, which the record type reads back as is."""
+        data = {}
+        for name, field in self.FIELDS.items():
+            raw = getattr(self, name, _MISSING)
+            if raw is not _MISSING:
+                data[name] = field.persist(self, raw)
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    # Whole-record reads (pydantic validation, dict(record)) decode each field once
+    def items(self) -> ItemsView[str, Any]:
+        return self.to_dict().items()
+
+    def values(self) -> ValuesView[Any]:
+        return self.to_dict().values()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+def json_default(value: Any) -> Any:
+    """``default`` hook for JSON encoders: compact records encode as dicts.
+
+    Anything else the encoder cannot handle is an error, as it is without
+    the hook.
+    """
+    if isinstance(value, CompactRecord):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def stored_default(value: Any) -> Any:
+    """``json_default`` for the storage backend: compact records encode as ``to_stored``."""
+    if isinstance(value, CompactRecord):
+        return value.to_stored()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
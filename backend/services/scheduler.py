@@ -0,0 +1,306 @@
+import asyncio
+import itertools
+import os
+import random
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+from services.metrics import metrics
+
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "4"))
+SCHEDULER_TASK_TIMEOUT = float(os.getenv("SCHEDULER_TASK_TIMEOUT", "300"))
+SCHEDULER_RETRY_BACKOFF = float(os.getenv("SCHEDULER_RETRY_BACKOFF", "1.0"))
+# Finished jobs are kept for status and event replay this many seconds, and at most this many of them
+SCHEDULER_JOB_RETENTION = float(os.getenv("SCHEDULER_JOB_RETENTION", "3600"))
+SCHEDULER_MAX_FINISHED_JOBS = int(os.getenv("SCHEDULER_MAX_FINISHED_JOBS", "1000"))
+# Events kept per job for late subscribers; the oldest progress events go first
+SCHEDULER_MAX_JOB_EVENTS = int(os.getenv("SCHEDULER_MAX_JOB_EVENTS", "200"))
+
+TERMINAL_STATES = {"succeeded", "failed", "cancelled"}
+
+
+class Job:
+    """A unit of work tracked by the scheduler."""
+
+    def __init__(
+        self,
+        job_id: str,
+        func: Callable[["Job"], Awaitable[Any]],
+        priority: int = 0,
+        timeout: Optional[float] = SCHEDULER_TASK_TIMEOUT,
+        retries: int = 0,
+        depends_on: Optional[List[str]] = None,
+        on_finish: Optional[Callable[["Job"], None]] = None,
+    ):
+        self.id = job_id
+        self.func = func
+        self.priority = priority
+        self.timeout = timeout
+        self.retries = retries
+        self.depends_on = list(depends_on or [])
+        self.on_finish = on_finish
+        self.status = "waiting" if self.depends_on else "queued"
+        self.attempts = 0
+        self.progress = 0.0
+        self.message = ""
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=SCHEDULER_MAX_JOB_EVENTS)
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._cancel_requested = False
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "attempts": self.attempts,
+            "max_attempts": self.retries + 1,
+            "progress": self.progress,
+            "message": self.message,
+            "depends_on": self.depends_on,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def report(self, progress: float, message: str = "") -> None:
+        """Record progress (0..1) and notify subscribers."""
+        self.progress = max(0.0, min(1.0, progress))
+        self.message = message
+        self._publish("progress")
+
+    def _publish(self, event: str) -> None:
+        payload = {"event": event, "timestamp": datetime.now().isoformat(), **self.to_dict()}
+        self.events.append(payload)
+        for queue in self._subscribers:
+            queue.put_nowait(payload)
+
+    async def subscribe(self) -> AsyncIterator[Dict[str, Any]]:
+        """Yield past events, then live ones until the job finishes."""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.add(queue)
+        try:
+            for event in list(self.events):
+                yield event
+            if self.done:
+                return
+            while True:
+                event = await queue.get()
+                yield event
+                if event["status"] in TERMINAL_STATES:
+                    return
+        finally:
+            self._subscribers.discard(queue)
+
+
+class TaskScheduler:
+    """Bounded async worker pool with priorities, retries and a dependency DAG.
+
+    Jobs are queued by priority (higher first, FIFO among equals) and run by
+    ``workers`` coroutines, each attempt bounded by the job's timeout.
+    Failed attempts are retried with jittered exponential backoff. A job that
+    depends on others waits until they all succeed, and fails as soon as any
+    of them fails or is cancelled. Dependencies must already be submitted,
+    which keeps the graph acyclic.
+
+    Finished jobs stay visible for ``retention`` seconds, and only the
+    ``max_finished`` most recent of them are kept.
+    """
+
+    def __init__(
+        self,
+        workers: int = SCHEDULER_WORKERS,
+        retry_backoff: float = SCHEDULER_RETRY_BACKOFF,
+        retention: float = SCHEDULER_JOB_RETENTION,
+        max_finished: int = SCHEDULER_MAX_FINISHED_JOBS,
+    ):
+        self.worker_count = workers
+        self.retry_backoff = retry_backoff
+        self.retention = retention
+        self.max_finished = max_finished
+        self.jobs: Dict[str, Job] = {}
+        # Finished job id -> monotonic finish time, oldest first
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        self._dependents: Dict[str, Set[str]] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers: List[asyncio.Task] = []
+        self._sequence = itertools.count()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+        # Jobs submitted before start were parked until a queue existed
+        for job in self.jobs.values():
+            if job.status == "queued":
+                self._enqueue(job)
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        for job in self.jobs.values():
+            if job._task is not None:
+                job._task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    def submit(self, job: Job) -> Job:
+        """Queue a job, replacing a finished job with the same id."""
+        existing = self.jobs.get(job.id)
+        if existing is not None and not existing.done:
+            raise ValueError(f"Job {job.id} is already {existing.status}")
+        for dependency in job.depends_on:
+            if dependency not in self.jobs:
+                raise ValueError(f"Unknown dependency: {dependency}")
+
+        self._finished.pop(job.id, None)
+        self.jobs[job.id] = job
+        self.evict()
+        for dependency in job.depends_on:
+            self._dependents.setdefault(dependency, set()).add(job.id)
+        job._publish("submitted")
+        self._release(job)
+        return job
+
+    def cancel(self, job_id: str) -> Job:
+        job = self.jobs[job_id]
+        if job.done:
+            return job
+        if job._task is not None:
+            job._cancel_requested = True
+            job._task.cancel()
+        else:
+            self._finish(job, "cancelled", error="Cancelled before start")
+        return job
+
+    def _enqueue(self, job: Job) -> None:
+        if self._queue is not None:
+            self._queue.put_nowait((-job.priority, next(self._sequence), job.id))
+
+    def _release(self, job: Job) -> None:
+        """Queue a job whose dependencies succeeded, or fail it if one did not."""
+        if job.done or job.status not in ("waiting", "queued"):
+            return
+        # An evicted dependency succeeded: had it failed, this job would already have failed with it
+        states = [
+            self.jobs[dependency].status if dependency in self.jobs else "succeeded" for dependency in job.depends_on
+        ]
+        if any(state in ("failed", "cancelled") for state in states):
+            self._finish(job, "failed", error="Dependency failed")
+        elif all(state == "succeeded" for state in states):
+            job.status = "queued"
+            if job.depends_on:
+                job._publish("queued")
+            self._enqueue(job)
+
+    def _finish(self, job: Job, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = datetime.now().isoformat()
+        if status == "succeeded":
+            job.progress = 1.0
+        job._publish(status)
+        if job.on_finish is not None:
+            job.on_finish(job)
+        for dependent in self._dependents.pop(job.id, ()):
+            self._release(self.jobs[dependent])
+        self._finished[job.id] = time.monotonic()
+        self.evict()
+
+    def evict(self) -> int:
+        """Forget finished jobs past ``retention`` or beyond ``max_finished``; returns how many."""
+        expired_before = time.monotonic() - self.retention
+        evicted = 0
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if finished_at >= expired_before and len(self._finished) <= self.max_finished:
+                break
+            del self._finished[job_id]
+            del self.jobs[job_id]
+            evicted += 1
+        return evicted
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self.jobs.get(job_id)
+            # Cancelled or replaced while it sat in the queue
+            if job is None or job.status != "queued":
+                continue
+            job._task = asyncio.current_task()
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                if not job.done:
+                    self._finish(job, "cancelled", error="Cancelled")
+                # Only swallow the cancellation aimed at the job, not a scheduler shutdown
+                if job._cancel_requested:
+                    asyncio.current_task().uncancel()
+                    continue
+                raise
+            finally:
+                job._task = None
+
+    async def _run(self, job: Job) -> None:
+        job.status = "running"
+        job.started_at = datetime.now().isoformat()
+        while True:
+            job.attempts += 1
+            job._publish("started")
+            try:
+                result = await asyncio.wait_for(job.func(job), job.timeout)
+            except asyncio.TimeoutError:
+                error = f"Timed out after {job.timeout}s"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = str(e) or e.__class__.__name__
+            else:
+                self._finish(job, "succeeded", result=result)
+                return
+
+            if job.attempts > job.retries:
+                self._finish(job, "failed", error=error)
+                return
+            job.error = error
+            job._publish("retrying")
+            await asyncio.sleep(random.uniform(0, self.retry_backoff * 2 ** (job.attempts - 1)))
+
+
+# Global instance, started and stopped by the app lifespan
+scheduler = TaskScheduler()
+
+metrics.gauge(
+    "kortana_scheduler_jobs",
+    "Scheduler jobs by state",
+    lambda: {(state,): count for state, count in scheduler.stats().items()},
+    ("state",),
+)
@@ -0,0 +1,379 @@
+import heapq
+import math
+import re
+from collections import Counter
+from typing import AbstractSet, Any, Callable, Collection, Dict, Iterable, List, Optional, Set, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# Slack on term score bounds, so float rounding never prunes a document that ties the k-th score
+BOUND_SLACK = 1e-9
+# Terms with at least this many postings are also kept in impact tiers (see ``InvertedIndex``)
+TIER_MIN_POSTINGS = 1024
+# Impact tiers per doubling of document length
+TIER_LENGTH_CLASSES = 4
+# A tiered search first scores the documents with every term when its rarest term has at most this many
+SEED_MAX_POSTINGS = 16384
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _length_class(length: int) -> int:
+    """Tier of a document length; every length in class ``c`` is at least ``2 ** (c / TIER_LENGTH_CLASSES)``."""
+    return int(TIER_LENGTH_CLASSES * math.log2(length)) if length > 0 else 0
+
+
+class InvertedIndex:
+    """Incrementally maintained inverted index with BM25 ranking.
+
+    Postings map each term to ``{doc_id: term_frequency}`` so documents can be
+    added, replaced and removed without rebuilding the index. Queries only touch
+    the postings of their own terms and select the top results with a bounded
+    heap, so the cost follows the matching documents rather than the corpus.
+
+    ``search`` prunes with MaxScore: terms are scored from the highest score
+    bound down, and once no document outside the current candidates could
+    reach the top ``limit``, the remaining (common, low-weight) terms only
+    look up those candidates instead of walking their postings. Results are
+    the same as scoring every matching document.
+
+    A query with a common term (``TIER_MIN_POSTINGS`` postings or more) and no
+    filters would still walk most of that term's postings, so those terms
+    are also kept in impact tiers: their documents grouped by term frequency
+    and length class, each group with a bound on its score contribution.
+    ``search`` then visits the tiers from the highest bound down, scoring
+    each document it meets in full, and stops once the ``limit``-th score
+    exceeds what any unvisited document could reach (Fagin's threshold
+    algorithm). Tiers are built the first time a query needs them and kept
+    up to date from then on.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.doc_terms: Dict[str, Tuple[str, ...]] = {}
+        self.recency: Dict[str, float] = {}
+        self.documents: Dict[str, Any] = {}
+        self.total_length = 0
+        # Score bounds: highest frequency per term and shortest indexed document,
+        # raised only by adds (a stale value after a removal is still a bound)
+        self.max_tf: Dict[str, int] = {}
+        self.min_length = 0
+        # term -> (term frequency, length class) -> documents
+        self.tiers: Dict[str, Dict[Tuple[int, int], Set[str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.doc_lengths
+
+    @staticmethod
+    def analyze(text: str) -> Counter:
+        """Term frequencies of a text; pure, so it can run off the thread that owns the index."""
+        return Counter(tokenize(text))
+
+    def add(self, doc_id: str, text: str, document: Any, recency: float = 0.0) -> None:
+        """Index a document, replacing any previous version with the same id."""
+        self.add_analyzed(doc_id, self.analyze(text), document, recency)
+
+    def add_analyzed(self, doc_id: str, frequencies: Counter, document: Any, recency: float = 0.0) -> None:
+        """``add`` with the ``analyze``d text, for callers that tokenized it elsewhere."""
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+
+        length = sum(frequencies.values())
+        max_tf = self.max_tf
+        tiers = self.tiers
+        length_class = _length_class(length)
+        for term, count in frequencies.items():
+            self.postings.setdefault(term, {})[doc_id] = count
+            if count > max_tf.get(term, 0):
+                max_tf[term] = count
+            if term in tiers:
+                tiers[term].setdefault((count, length_class), set()).add(doc_id)
+        if length and (not self.min_length or length < self.min_length):
+            self.min_length = length
+
+        self.doc_lengths[doc_id] = length
+        self.doc_terms[doc_id] = tuple(frequencies)
+        self.recency[doc_id] = recency
+        self.documents[doc_id] = document
+        self.total_length += length
+
+    def remove(self, doc_id: str) -> None:
+        """Drop a document and its postings from the index."""
+        if doc_id not in self.doc_lengths:
+            return
+
+        length_class = _length_class(self.doc_lengths[doc_id])
+        for term in self.doc_terms.pop(doc_id):
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            count = postings.pop(doc_id, None)
+            tiers = self.tiers.get(term)
+            if tiers is not None and count is not None:
+                tier = tiers.get((count, length_class))
+                if tier is not None:
+                    tier.discard(doc_id)
+                    if not tier:
+                        del tiers[(count, length_class)]
+            if not postings:
+                del self.postings[term]
+                self.max_tf.pop(term, None)
+                self.tiers.pop(term, None)
+
+        self.total_length -= self.doc_lengths.pop(doc_id)
+        if not self.total_length:
+            self.min_length = 0
+        self.recency.pop(doc_id, None)
+        self.documents.pop(doc_id, None)
+
+    def idf(self, term: str) -> float:
+        """BM25 inverse document frequency (always positive)."""
+        doc_count = len(self.doc_lengths)
+        doc_freq = len(self.postings.get(term, ()))
+        return math.log(1 + (doc_count - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def score(
+        self,
+        query: str,
+        doc_filter: Optional[Callable[[Any], bool]] = None,
+        candidates: Optional[Collection[str]] = None,
+    ) -> Dict[str, float]:
+        """Compute BM25 scores for every document matching at least one query term."""
+        if not self.doc_lengths:
+            return {}
+
+        k1 = self.k1
+        b = self.b
+        avg_length = (self.total_length / len(self.doc_lengths)) or 1.0
+        doc_lengths = self.doc_lengths
+        scores: Dict[str, float] = {}
+
+        for _, _, idf, postings in self._terms(query, avg_length):
+            for doc_id, tf in postings.items():
+                norm = k1 * (1 - b + b * doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+
+        if candidates is not None:
+            scores = {doc_id: s for doc_id, s in scores.items() if doc_id in candidates}
+        if doc_filter is not None:
+            documents = self.documents
+            scores = {doc_id: s for doc_id, s in scores.items() if doc_filter(documents[doc_id])}
+
+        return scores
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        doc_filter: Optional[Callable[[Any], bool]] = None,
+        candidates: Optional[Collection[str]] = None,
+    ) -> List[Tuple[Any, float]]:
+        """Return the ``limit`` best ``(document, score)`` pairs for a query.
+
+        ``candidates`` restricts results to a set of document ids (for example
+        from a tag index). Ties on score are broken by recency, newest first,
+        then by document id. A
+        query without any indexable terms returns the most recent documents
+        that pass the filters.
+        """
+        if limit <= 0:
+            return []
+
+        recency = self.recency
+        documents = self.documents
+
+        if not tokenize(query):
+            pool: Iterable[str] = recency if candidates is None else (d for d in candidates if d in recency)
+            if doc_filter is not None:
+                pool = (doc_id for doc_id in pool if doc_filter(documents[doc_id]))
+            newest = heapq.nlargest(limit, pool, key=recency.__getitem__)
+            return [(documents[doc_id], 0.0) for doc_id in newest]
+
+        if candidates is None and doc_filter is None and any(
+            len(self.postings.get(term, ())) >= TIER_MIN_POSTINGS for term in set(tokenize(query))
+        ):
+            scores = self._top_scores_by_impact(query, limit)
+        else:
+            scores = self._top_scores(query, limit, doc_filter, candidates)
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], recency[item[0]], item[0]))
+        return [(documents[doc_id], score) for doc_id, score in best]
+
+    def _bound(self, idf: float, tf: int, length: float, avg_length: float) -> float:
+        """Upper bound on a term's contribution with frequency ``tf`` to a document at least ``length`` long."""
+        norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+        return idf * tf * (self.k1 + 1) / (tf + norm) * (1 + BOUND_SLACK)
+
+    def _terms(self, query: str, avg_length: float) -> List[Tuple[float, str, float, Dict[str, int]]]:
+        """Query terms with postings as ``(score bound, term, idf, postings)``, highest bound first.
+
+        Every scoring path adds a document's term contributions in this order,
+        so they agree on its score to the last bit.
+        """
+        terms = []
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if postings:
+                idf = self.idf(term)
+                terms.append((self._bound(idf, self.max_tf[term], self.min_length, avg_length), term, idf, postings))
+        terms.sort(key=lambda item: (-item[0], item[1]))
+        return terms
+
+    def _tiers(self, term: str, idf: float, avg_length: float) -> List[Tuple[float, AbstractSet[str]]]:
+        """A term's documents as ``(score bound, documents)`` groups, highest bound first."""
+        postings = self.postings[term]
+        if len(postings) < TIER_MIN_POSTINGS and term not in self.tiers:
+            return [(self._bound(idf, self.max_tf[term], self.min_length, avg_length), postings.keys())]
+        tiers = self.tiers.get(term)
+        if tiers is None:
+            tiers = self.tiers[term] = {}
+            doc_lengths = self.doc_lengths
+            for doc_id, tf in postings.items():
+                tiers.setdefault((tf, _length_class(doc_lengths[doc_id])), set()).add(doc_id)
+        groups = [
+            (self._bound(idf, tf, max(self.min_length, 2 ** (length_class / TIER_LENGTH_CLASSES)), avg_length), docs)
+            for (tf, length_class), docs in tiers.items()
+        ]
+        groups.sort(key=lambda group: group[0], reverse=True)
+        return groups
+
+    def _top_scores_by_impact(self, query: str, limit: int) -> Dict[str, float]:
+        """Exact scores of the ``limit`` best matches, visiting impact tiers best first."""
+        k1 = self.k1
+        b = self.b
+        avg_length = (self.total_length / len(self.doc_lengths)) or 1.0
+        doc_lengths = self.doc_lengths
+        recency = self.recency
+
+        terms = self._terms(query, avg_length)
+        tiers = [self._tiers(term, idf, avg_length) for _, term, idf, _ in terms]
+        positions = [0] * len(terms)
+        scores: Dict[str, float] = {}
+        # The best ``limit`` as a min-heap of (score, recency, doc id)
+        best: List[Tuple[float, float, str]] = []
+
+        def visit(docs: Iterable[str]) -> None:
+            for doc_id in docs:
+                if doc_id in scores:
+                    continue
+                norm = k1 * (1 - b + b * doc_lengths[doc_id] / avg_length)
+                score = 0.0
+                for _, _, idf, postings in terms:
+                    tf = postings.get(doc_id)
+                    if tf is not None:
+                        score += idf * tf * (k1 + 1) / (tf + norm)
+                scores[doc_id] = score
+                entry = (score, recency[doc_id], doc_id)
+                if len(best) < limit:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+
+        # Documents with the rarest term and another one score highest; when the rarest term is cheap to
+        # intersect from, score those first, so the k-th score prunes the tiers from the start
+        # (terms in most documents, stopwords in effect, add too little to be worth it)
+        by_size = sorted((postings for _, _, _, postings in terms), key=len)
+        if len(by_size) > 1 and len(by_size[0]) <= SEED_MAX_POSTINGS:
+            rarest = by_size[0].keys()
+            half = len(doc_lengths) / 2
+            visit(set().union(*(rarest & postings.keys() for postings in by_size[1:] if len(postings) <= half)))
+
+        while True:
+            # No document in an unvisited tier of every term can score more than this
+            next_bounds = [groups[i][0] if i < len(groups) else 0.0 for groups, i in zip(tiers, positions)]
+            threshold = sum(next_bounds)
+            if threshold == 0.0 or (len(best) >= limit and best[0][0] > threshold):
+                break
+            term_number = max(range(len(terms)), key=next_bounds.__getitem__)
+            bound, docs = tiers[term_number][positions[term_number]]
+            positions[term_number] += 1
+            if len(best) >= limit:
+                # Every document in a visited tier is scored, so another term adds at most its next bound to
+                # the rest. Skip the documents whose other terms could not lift them past the k-th score.
+                kth = best[0][0]
+                others = sorted((next_bounds[i], i) for i in range(len(terms)) if i != term_number)
+                reachable = bound + sum(other for other, _ in others)
+                if reachable < kth:
+                    continue
+                # Terms a document must have to make it, then terms it needs at least one of
+                required = [i for other, i in others if reachable - other < kth]
+                if required:
+                    for i in sorted(required, key=lambda i: len(terms[i][3])):
+                        docs = docs & terms[i][3].keys()
+                else:
+                    skipped = 0
+                    while skipped < len(others) and bound + others[skipped][0] < kth:
+                        bound += others[skipped][0]
+                        skipped += 1
+                    if skipped:
+                        docs = set().union(*(docs & terms[i][3].keys() for _, i in others[skipped:]))
+            visit(docs)
+        return {doc_id: score for score, _, doc_id in best}
+
+    def _top_scores(
+        self,
+        query: str,
+        limit: int,
+        doc_filter: Optional[Callable[[Any], bool]],
+        candidates: Optional[Collection[str]],
+    ) -> Dict[str, float]:
+        """Exact scores of a superset of the ``limit`` best matches (MaxScore)."""
+        if not self.doc_lengths:
+            return {}
+
+        k1 = self.k1
+        b = self.b
+        avg_length = (self.total_length / len(self.doc_lengths)) or 1.0
+        doc_lengths = self.doc_lengths
+        documents = self.documents
+
+        terms = self._terms(query, avg_length)
+        # remaining[i]: the most that terms i.. can add to any document's score
+        remaining = [0.0] * (len(terms) + 1)
+        for i in range(len(terms) - 1, -1, -1):
+            remaining[i] = remaining[i + 1] + terms[i][0]
+
+        scores: Dict[str, float] = {}
+        rejected = set()
+        threshold = 0.0
+        for i, (_, _, idf, postings) in enumerate(terms):
+            if len(scores) >= limit and remaining[i] < threshold:
+                # No unseen document can reach the top; drop the candidates that cannot either
+                scores = {doc_id: s for doc_id, s in scores.items() if s + remaining[i] >= threshold}
+                for doc_id in scores:
+                    tf = postings.get(doc_id)
+                    if tf is not None:
+                        norm = k1 * (1 - b + b * doc_lengths[doc_id] / avg_length)
+                        scores[doc_id] += idf * tf * (k1 + 1) / (tf + norm)
+            elif candidates is None and doc_filter is None:
+                for doc_id, tf in postings.items():
+                    norm = k1 * (1 - b + b * doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+            else:
+                if candidates is not None and len(candidates) < len(postings):
+                    matches: Iterable[Tuple[str, int]] = (
+                        (doc_id, postings[doc_id]) for doc_id in candidates if doc_id in postings
+                    )
+                else:
+                    matches = postings.items()
+                for doc_id, tf in matches:
+                    if doc_id not in scores:
+                        if doc_id in rejected:
+                            continue
+                        if (candidates is not None and doc_id not in candidates) or (
+                            doc_filter is not None and not doc_filter(documents[doc_id])
+                        ):
+                            rejected.add(doc_id)
+                            continue
+                    norm = k1 * (1 - b + b * doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+            if len(scores) >= limit and i + 1 < len(terms):
+                threshold = heapq.nlargest(limit, scores.values())[-1]
+        return scores
@@ -0,0 +1,418 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from services.records import stored_default
+
+# "sqlite" persists to KORTANA_DB_PATH, "memory" keeps everything in-process
+KORTANA_STORAGE = os.getenv("KORTANA_STORAGE", "sqlite")
+KORTANA_DB_PATH = os.getenv("KORTANA_DB_PATH", "kortana.db")
+STORAGE_BATCH_SIZE = int(os.getenv("STORAGE_BATCH_SIZE", "500"))
+STORAGE_FLUSH_INTERVAL = float(os.getenv("STORAGE_FLUSH_INTERVAL", "1.0"))
+# Seconds between checks for space to reclaim; 0 disables compaction
+STORAGE_COMPACT_INTERVAL = float(os.getenv("STORAGE_COMPACT_INTERVAL", "3600"))
+# Share of the database's pages that must be free before compaction rewrites it
+STORAGE_COMPACT_FREE_RATIO = float(os.getenv("STORAGE_COMPACT_FREE_RATIO", "0.25"))
+STORAGE_LOAD_CHUNK = 10000
+
+# Identifies this process's writes and leases among every worker sharing the backend
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+Record = Dict[str, Any]
+Condition = Callable[[Record], bool]
+
+
+class StorageBackend:
+    """Interface for persisting collections of JSON records keyed by id.
+
+    ``put`` and ``delete`` may be buffered. ``insert`` and ``update`` are
+    atomic read-modify-writes that take effect immediately, so on a
+    ``shared`` backend they are how workers coordinate: a conditional
+    ``update`` is a compare-and-set that exactly one worker can win.
+    """
+
+    # True when other processes read and write the same data
+    shared = False
+    # Called by a buffering backend when a batch is ready, instead of committing it in the writer
+    on_batch_full: Optional[Callable[[], None]] = None
+
+    def load(self, collection: str) -> Iterator[Record]:
+        """Yield a collection's records in insertion order."""
+        raise NotImplementedError
+
+    def put(self, collection: str, record_id: Hashable, record: Record) -> None:
+        raise NotImplementedError
+
+    def delete(self, collection: str, record_id: Hashable) -> None:
+        raise NotImplementedError
+
+    def get(self, collection: str, record_id: Hashable) -> Optional[Record]:
+        """The current stored record, including other workers' writes."""
+        raise NotImplementedError
+
+    def insert(self, collection: str, record_id: Hashable, record: Record) -> Tuple[Record, bool]:
+        """Store ``record`` unless the id exists; returns ``(stored record, inserted)``."""
+        raise NotImplementedError
+
+    def update(
+        self, collection: str, record_id: Hashable, changes: Record, condition: Optional[Condition] = None
+    ) -> Optional[Record]:
+        """Apply ``changes`` if the record exists and satisfies ``condition``.
+
+        Returns the updated record, or None when nothing was changed.
+        """
+        raise NotImplementedError
+
+    def revision(self) -> int:
+        """Counter advanced by every committed write, for ``changed_since``."""
+        return 0
+
+    def changed_since(self, collection: str, revision: int) -> Tuple[List[Record], int]:
+        """Records other workers wrote after ``revision``, and the revision to poll from next.
+
+        Deletions are not reported.
+        """
+        return [], revision
+
+    def count(self, collection: str) -> int:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Write out any buffered changes."""
+
+    def compact(self) -> bool:
+        """Reclaim space left by overwritten and deleted records; True if anything was rewritten."""
+        return False
+
+    def ping(self) -> bool:
+        """True when the backend can currently serve reads."""
+        return True
+
+    def close(self) -> None:
+        self.flush()
+
+
+class MemoryStorage(StorageBackend):
+    """Process-local backend, for tests and throwaway deployments."""
+
+    def __init__(self):
+        self.collections: Dict[str, Dict[str, Record]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, collection: str) -> Iterator[Record]:
+        return iter(list(self.collections.get(collection, {}).values()))
+
+    def put(self, collection: str, record_id: Hashable, record: Record) -> None:
+        self.collections.setdefault(collection, {})[str(record_id)] = record
+
+    def delete(self, collection: str, record_id: Hashable) -> None:
+        self.collections.get(collection, {}).pop(str(record_id), None)
+
+    def get(self, collection: str, record_id: Hashable) -> Optional[Record]:
+        return self.collections.get(collection, {}).get(str(record_id))
+
+    def insert(self, collection: str, record_id: Hashable, record: Record) -> Tuple[Record, bool]:
+        with self._lock:
+            records = self.collections.setdefault(collection, {})
+            existing = records.get(str(record_id))
+            if existing is not None:
+                return existing, False
+            records[str(record_id)] = record
+            return record, True
+
+    def update(
+        self, collection: str, record_id: Hashable, changes: Record, condition: Optional[Condition] = None
+    ) -> Optional[Record]:
+        with self._lock:
+            record = self.get(collection, record_id)
+            if record is None or (condition is not None and not condition(record)):
+                return None
+            record.update(changes)
+            return record
+
+    def count(self, collection: str) -> int:
+        return len(self.collections.get(collection, {}))
+
+
+UPSERT = (
+    "INSERT INTO records (collection, id, data, updated_at, rev, writer) VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (collection, id) DO UPDATE SET "
+    "data = excluded.data, updated_at = excluded.updated_at, rev = excluded.rev, writer = excluded.writer"
+)
+
+
+class SQLiteStorage(StorageBackend):
+    """Embedded SQLite backend in WAL mode, shared by every worker on the host.
+
+    Writes are buffered and committed in batches, either when the buffer
+    reaches ``batch_size`` or when ``flush`` is called (the app flushes every
+    ``STORAGE_FLUSH_INTERVAL`` seconds and on shutdown). With ``on_batch_full``
+    set, a full buffer calls it instead of committing in the caller, so ``put``
+    and ``delete`` never wait on the database; the app uses it to wake its
+    flusher, which commits in a worker thread. WAL mode lets other
+    uvicorn workers read while one of them commits. Records keep their first
+    insertion position, so collections reload in the original order.
+
+    Every commit takes the next value of a shared revision counter and tags
+    its rows with it and with ``WORKER_ID``, which is how ``changed_since``
+    finds what other workers wrote. ``insert`` and ``update`` run in their
+    own ``BEGIN IMMEDIATE`` transaction, which serializes them across
+    processes.
+    """
+
+    shared = True
+
+    def __init__(self, path: str = KORTANA_DB_PATH, batch_size: int = STORAGE_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self._lock = threading.RLock()
+        # Guards only the write buffers, so buffering never waits on a commit holding ``_lock``
+        self._buffer_lock = threading.Lock()
+        self._pending: Dict[Tuple[str, str], Optional[str]] = {}
+        # The batch being committed, still readable by ``get`` until it is
+        self._flushing: Dict[Tuple[str, str], Optional[str]] = {}
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=30000")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " collection TEXT NOT NULL,"
+                " id TEXT NOT NULL,"
+                " data TEXT NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " UNIQUE (collection, id))"
+            )
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(records)")}
+            # Databases created before revisions were tracked gain the columns in place
+            if "rev" not in columns:
+                connection.execute("ALTER TABLE records ADD COLUMN rev INTEGER NOT NULL DEFAULT 0")
+            if "writer" not in columns:
+                connection.execute("ALTER TABLE records ADD COLUMN writer TEXT NOT NULL DEFAULT ''")
+            connection.execute("CREATE INDEX IF NOT EXISTS records_rev ON records (collection, rev)")
+            connection.execute("CREATE INDEX IF NOT EXISTS records_seq ON records (collection, seq)")
+            connection.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            connection.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('rev', 0)")
+            self._connection = connection
+        return self._connection
+
+    def load(self, collection: str) -> Iterator[Record]:
+        self.flush()
+        # Page by position rather than hold a cursor open, so writes on the shared
+        # connection can commit between pages of a load running in the background
+        seq = 0
+        while True:
+            with self._lock:
+                rows = self.connection.execute(
+                    "SELECT seq, data FROM records WHERE collection = ? AND seq > ? ORDER BY seq LIMIT ?",
+                    (collection, seq, STORAGE_LOAD_CHUNK),
+                ).fetchall()
+            if not rows:
+                break
+            seq = rows[-1][0]
+            for _, data in rows:
+                yield json.loads(data)
+
+    def put(self, collection: str, record_id: Hashable, record: Record) -> None:
+        self._buffer((collection, str(record_id)), json.dumps(record, default=stored_default))
+
+    def delete(self, collection: str, record_id: Hashable) -> None:
+        self._buffer((collection, str(record_id)), None)
+
+    def _buffer(self, key: Tuple[str, str], data: Optional[str]) -> None:
+        with self._buffer_lock:
+            self._pending[key] = data
+            full = len(self._pending) >= self.batch_size
+        if full:
+            if self.on_batch_full is not None:
+                self.on_batch_full()
+            else:
+                self.flush()
+
+    def count(self, collection: str) -> int:
+        self.flush()
+        row = self.connection.execute("SELECT COUNT(*) FROM records WHERE collection = ?", (collection,)).fetchone()
+        return row[0]
+
+    def flush(self) -> None:
+        with self._lock:
+            with self._buffer_lock:
+                if not self._pending:
+                    return
+                pending, self._pending = self._pending, {}
+                self._flushing = pending
+            now = time.time()
+            connection = self.connection
+            try:
+                connection.execute("BEGIN IMMEDIATE")
+                rev = self._next_revision()
+                upserts: List[Tuple[str, str, str, float, int, str]] = []
+                deletes: List[Tuple[str, str]] = []
+                for (collection, record_id), data in pending.items():
+                    if data is None:
+                        deletes.append((collection, record_id))
+                    else:
+                        upserts.append((collection, record_id, data, now, rev, WORKER_ID))
+                if upserts:
+                    connection.executemany(UPSERT, upserts)
+                if deletes:
+                    connection.executemany("DELETE FROM records WHERE collection = ? AND id = ?", deletes)
+                connection.execute("COMMIT")
+            except BaseException:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                # Keep the batch so the next flush retries it, without clobbering newer writes
+                with self._buffer_lock:
+                    for key, data in pending.items():
+                        self._pending.setdefault(key, data)
+                raise
+            finally:
+                with self._buffer_lock:
+                    self._flushing = {}
+
+    def _next_revision(self) -> int:
+        """Advance the shared revision counter; call inside a write transaction."""
+        self.connection.execute("UPDATE counters SET value = value + 1 WHERE name = 'rev'")
+        return self.connection.execute("SELECT value FROM counters WHERE name = 'rev'").fetchone()[0]
+
+    def _write_one(self, collection: str, record_id: str, record: Record) -> None:
+        self.connection.execute(
+            UPSERT, (collection, record_id, json.dumps(record, default=stored_default), time.time(), self._next_revision(), WORKER_ID)
+        )
+
+    def _read_one(self, collection: str, record_id: str) -> Optional[Record]:
+        row = self.connection.execute(
+            "SELECT data FROM records WHERE collection = ? AND id = ?", (collection, record_id)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get(self, collection: str, record_id: Hashable) -> Optional[Record]:
+        key = (collection, str(record_id))
+        with self._buffer_lock:
+            for buffer in (self._pending, self._flushing):
+                if key in buffer:
+                    data = buffer[key]
+                    return json.loads(data) if data is not None else None
+        # Not buffered, so the database already has its latest write
+        with self._lock:
+            return self._read_one(collection, str(record_id))
+
+    def insert(self, collection: str, record_id: Hashable, record: Record) -> Tuple[Record, bool]:
+        with self._lock:
+            self.flush()
+            connection = self.connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                existing = self._read_one(collection, str(record_id))
+                if existing is None:
+                    self._write_one(collection, str(record_id), record)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return (existing, False) if existing is not None else (record, True)
+
+    def update(
+        self, collection: str, record_id: Hashable, changes: Record, condition: Optional[Condition] = None
+    ) -> Optional[Record]:
+        with self._lock:
+            self.flush()
+            connection = self.connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                record = self._read_one(collection, str(record_id))
+                if record is None or (condition is not None and not condition(record)):
+                    connection.execute("ROLLBACK")
+                    return None
+                record.update(changes)
+                self._write_one(collection, str(record_id), record)
+                connection.execute("COMMIT")
+            except BaseException:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                raise
+        return record
+
+    def revision(self) -> int:
+        with self._lock:
+            self.flush()
+            return self.connection.execute("SELECT value FROM counters WHERE name = 'rev'").fetchone()[0]
+
+    def changed_since(self, collection: str, revision: int) -> Tuple[List[Record], int]:
+        with self._lock:
+            self.flush()
+            connection = self.connection
+            # One read transaction, so the cursor returned is the revision of the rows read:
+            # a write committed between two autocommit reads would otherwise be skipped for good
+            connection.execute("BEGIN")
+            try:
+                rows = connection.execute(
+                    "SELECT data FROM records WHERE collection = ? AND rev > ? AND writer != ? ORDER BY rev",
+                    (collection, revision, WORKER_ID),
+                ).fetchall()
+                latest = connection.execute("SELECT value FROM counters WHERE name = 'rev'").fetchone()[0]
+            finally:
+                connection.execute("COMMIT")
+        return [json.loads(data) for data, in rows], latest
+
+    def compact(self, min_free_ratio: float = STORAGE_COMPACT_FREE_RATIO) -> bool:
+        """Rewrite the database once at least ``min_free_ratio`` of its pages are free.
+
+        Runs on a connection of its own, so this worker's reads and buffered
+        writes are not held up behind the rewrite. Once one worker has
+        compacted, the others find nothing to reclaim.
+        """
+        self.flush()
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            pages = connection.execute("PRAGMA page_count").fetchone()[0]
+            free = connection.execute("PRAGMA freelist_count").fetchone()[0]
+            if not pages or free / pages < min_free_ratio:
+                return False
+            connection.execute("VACUUM")
+            connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            return True
+        finally:
+            connection.close()
+
+    def ping(self) -> bool:
+        try:
+            with self._lock:
+                self.connection.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            if self._connection is not None:
+                self._connection.execute("PRAGMA optimize")
+                self._connection.close()
+                self._connection = None
+
+
+def create_storage(kind: str = KORTANA_STORAGE) -> StorageBackend:
+    """Build the configured storage backend."""
+    if kind == "memory":
+        return MemoryStorage()
+    if kind == "sqlite":
+        return SQLiteStorage()
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+# Global instance shared by every store in this process
+storage = create_storage()
@@ -0,0 +1,450 @@
+import asyncio
+from itertools import islice
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple
+
+from services.storage import Condition, StorageBackend
+
+Record = Dict[str, Any]
+IndexFunction = Callable[[Record], Iterable[Hashable]]
+
+# Stores on a shared backend, refreshed by ``sync_stores``
+_shared_stores: List["IndexedStore"] = []
+# Stores backed by storage, loaded up front by ``load_stores``
+_persisted_stores: List["IndexedStore"] = []
+# Records a background load installs on the event loop at a time, between yields to other tasks
+STORE_LOAD_BATCH = 100
+
+
+def field_index(field: str, default: Any = None) -> IndexFunction:
+    """Index a scalar field of each record."""
+    return lambda record: (record.get(field, default),)
+
+
+def multi_field_index(field: str) -> IndexFunction:
+    """Index every element of a list field (e.g. tags)."""
+    return lambda record: record.get(field) or ()
+
+
+class IndexedStore:
+    """Insertion-ordered records keyed by id, with secondary hash indexes.
+
+    Lookups by id and by any indexed value are O(1). Iteration yields records
+    in insertion order, so callers that used to hold a list keep the same
+    ordering in their responses. Records changed in place must go through
+    ``update`` (or be followed by ``reindex``) to keep the indexes in sync.
+
+    With a ``storage`` backend every write is persisted under ``collection``,
+    and the collection is loaded lazily on first access; ``on_load`` is called
+    for each loaded record so derived structures can be rebuilt. When
+    ``prepare_load`` is given, it runs for each record in the thread that
+    loads it in the background and its result is passed to ``on_load`` as a
+    second argument, keeping the pure part of rebuilding off the event loop
+    (``on_load`` must also accept being called with the record alone). The app
+    instead loads stores with ``load_async`` while it serves: until that
+    finishes, listings see the records loaded so far, and a lookup by id of a
+    record not loaded yet reads it from storage.
+
+    ``record_type`` (e.g. a ``services.records.CompactRecord`` subclass)
+    converts records as they are added or loaded, so large collections can
+    hold something smaller than a dict per record.
+
+    On a shared backend (several workers on one database) each store is a
+    cache that ``sync`` refreshes with other workers' writes. With
+    ``atomic_updates``, ``add``, ``update``, ``insert`` and ``update_if``
+    write through to storage as atomic field changes, so workers never
+    overwrite each other's fields with a stale copy, and ``update_if``
+    works as a compare-and-set across all of them.
+    """
+
+    def __init__(
+        self,
+        key: str = "id",
+        indexes: Optional[Dict[str, IndexFunction]] = None,
+        storage: Optional[StorageBackend] = None,
+        collection: Optional[str] = None,
+        on_load: Optional[Callable[[Record], None]] = None,
+        record_type: Optional[Callable[[Record], Record]] = None,
+        atomic_updates: bool = False,
+        prepare_load: Optional[Callable[[Record], Any]] = None,
+    ):
+        self.key = key
+        self.records: Dict[Hashable, Record] = {}
+        self.storage = storage
+        self.collection = collection
+        self.on_load = on_load
+        self.prepare_load = prepare_load
+        self.record_type = record_type
+        self.shared = storage is not None and storage.shared
+        self.atomic_updates = atomic_updates and self.shared
+        self._revision = 0
+        self._loaded = storage is None
+        self.loading = False
+        # Ids removed while loading, which the load must not bring back
+        self._removed: Set[Hashable] = set()
+        self._index_functions = indexes or {}
+        self._indexes: Dict[str, Dict[Hashable, Dict[Hashable, None]]] = {name: {} for name in self._index_functions}
+        self._indexed_values: Dict[str, Dict[Hashable, Tuple[Hashable, ...]]] = {name: {} for name in self._index_functions}
+        if storage is not None:
+            _persisted_stores.append(self)
+        if self.shared:
+            _shared_stores.append(self)
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.shared:
+            # Taken before loading, so writes racing the load are picked up by the next sync
+            self._revision = self.storage.revision()
+        for record in self.storage.load(self.collection):
+            record = self._convert(record)
+            self._install(record[self.key], record)
+
+    def load(self) -> None:
+        """Load the persisted collection now instead of on first access."""
+        self._ensure_loaded()
+
+    async def load_async(self, batch: int = STORE_LOAD_BATCH) -> None:
+        """Load the persisted collection without holding up the event loop.
+
+        Records are read and converted in a worker thread, then installed
+        (indexed, ``on_load``) on the loop ``batch`` at a time. Records
+        written or removed while the load runs are newer than what it read,
+        so it leaves them alone.
+        """
+        if self._loaded and not self.loading:
+            return
+        self._loaded = True
+        self.loading = True
+        try:
+            if self.shared:
+                self._revision = await asyncio.to_thread(self.storage.revision)
+            rows = self.storage.load(self.collection)
+            while True:
+                records = await asyncio.to_thread(self._read_batch, rows, batch)
+                if not records:
+                    break
+                for record, prepared in records:
+                    record_id = record[self.key]
+                    if record_id not in self.records and record_id not in self._removed:
+                        self._install(record_id, record, prepared)
+                await asyncio.sleep(0)
+        finally:
+            self.loading = False
+            self._removed.clear()
+
+    def _read_batch(self, rows: Iterator[Record], batch: int) -> List[Tuple[Record, Any]]:
+        records = []
+        for row in islice(rows, batch):
+            record = self._convert(row)
+            records.append((record, self.prepare_load(record) if self.prepare_load is not None else None))
+        return records
+
+    def _install(self, record_id: Hashable, record: Record, prepared: Any = None) -> None:
+        self.records[record_id] = record
+        self._index(record_id, record)
+        if self.on_load is not None:
+            if prepared is None:
+                self.on_load(record)
+            else:
+                self.on_load(record, prepared)
+
+    def _known(self, record_id: Hashable) -> Optional[Record]:
+        """The cached record, read from storage first if a running load has not reached it."""
+        record = self.records.get(record_id)
+        if record is None and self.loading and record_id not in self._removed:
+            stored = self.storage.get(self.collection, record_id)
+            if stored is not None:
+                record = self._convert(stored)
+                self._install(record_id, record)
+        return record
+
+    def _convert(self, record: Record) -> Record:
+        if self.record_type is None or isinstance(record, self.record_type):
+            return record
+        return self.record_type(record)
+
+    def _persist(self, record_id: Hashable, record: Optional[Record]) -> None:
+        if self.storage is None:
+            return
+        if record is None:
+            self.storage.delete(self.collection, record_id)
+        else:
+            self.storage.put(self.collection, record_id, record)
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[Record]:
+        self._ensure_loaded()
+        return iter(self.records.values())
+
+    def __contains__(self, record_id: Hashable) -> bool:
+        self._ensure_loaded()
+        return self._known(record_id) is not None
+
+    def get(self, record_id: Hashable) -> Optional[Record]:
+        self._ensure_loaded()
+        return self._known(record_id)
+
+    def list(self) -> List[Record]:
+        """All records in insertion order."""
+        self._ensure_loaded()
+        return list(self.records.values())
+
+    def page(self, offset: int, limit: int) -> List[Record]:
+        """Up to ``limit`` records starting at insertion position ``offset``."""
+        self._ensure_loaded()
+        return list(islice(self.records.values(), max(offset, 0), max(offset, 0) + max(limit, 0)))
+
+    def tail(self, count: int) -> List[Record]:
+        """The ``count`` most recently inserted records, oldest first."""
+        self._ensure_loaded()
+        if count <= 0:
+            return []
+        return list(islice(reversed(self.records.values()), count))[::-1]
+
+    def add(self, record: Record) -> Record:
+        """Insert a record, or merge it into the stored record with the same id."""
+        self._ensure_loaded()
+        record_id = record[self.key]
+        if self.atomic_updates:
+            stored, inserted = self.storage.insert(self.collection, record_id, record)
+            if not inserted:
+                stored = self.storage.update(self.collection, record_id, dict(record))
+            return self._apply(stored)
+        existing = self._known(record_id)
+        if existing is not None:
+            existing.update(record)
+            self.reindex(record_id)
+            return existing
+        record = self._convert(record)
+        self.records[record_id] = record
+        self._index(record_id, record)
+        self._persist(record_id, record)
+        return record
+
+    def insert(self, record: Record) -> Tuple[Record, bool]:
+        """Add a record unless its id is already stored; returns ``(stored record, inserted)``."""
+        self._ensure_loaded()
+        record_id = record[self.key]
+        if self.atomic_updates:
+            stored, inserted = self.storage.insert(self.collection, record_id, record)
+            return self._apply(stored), inserted
+        existing = self._known(record_id)
+        if existing is not None:
+            return existing, False
+        return self.add(record), True
+
+    def update(self, record_id: Hashable, **changes: Any) -> Record:
+        """Apply field changes to a stored record and refresh its index entries."""
+        self._ensure_loaded()
+        if self.atomic_updates:
+            stored = self.storage.update(self.collection, record_id, changes)
+            if stored is None:
+                raise KeyError(record_id)
+            return self._apply(stored)
+        record = self._known(record_id)
+        if record is None:
+            raise KeyError(record_id)
+        record.update(changes)
+        self.reindex(record_id)
+        return record
+
+    def update_if(self, record_id: Hashable, condition: Condition, **changes: Any) -> Optional[Record]:
+        """Apply field changes only if the record satisfies ``condition``; None otherwise.
+
+        With ``atomic_updates`` the condition is checked against the stored
+        record inside the write, so of several workers racing on the same
+        transition exactly one succeeds. It sees the record as persisted,
+        where long text of a compact record type is still compressed.
+        """
+        self._ensure_loaded()
+        if self.atomic_updates:
+            stored = self.storage.update(self.collection, record_id, changes, condition)
+            if stored is None:
+                # Lost the race or the cache was stale: bring the cached copy up to date
+                self.fresh(record_id)
+                return None
+            return self._apply(stored)
+        record = self._known(record_id)
+        if record is None or not condition(record):
+            return None
+        return self.update(record_id, **changes)
+
+    def fresh(self, record_id: Hashable) -> Optional[Record]:
+        """A record as currently stored, including changes made by other workers."""
+        self._ensure_loaded()
+        if not self.shared:
+            return self.records.get(record_id)
+        stored = self.storage.get(self.collection, record_id)
+        return self._apply(stored) if stored is not None else self.records.get(record_id)
+
+    # Async counterparts of the write-through methods, for callers on the event loop. The
+    # storage round trip (a BEGIN IMMEDIATE that may wait on other workers' transactions)
+    # runs in a thread; the cached copy is still updated on the loop, which owns it.
+
+    async def insert_async(self, record: Record) -> Tuple[Record, bool]:
+        """``insert`` without blocking the event loop on a shared backend."""
+        self._ensure_loaded()
+        if not self.atomic_updates:
+            return self.insert(record)
+        stored, inserted = await asyncio.to_thread(self.storage.insert, self.collection, record[self.key], record)
+        return self._apply(stored), inserted
+
+    async def update_async(self, record_id: Hashable, **changes: Any) -> Record:
+        """``update`` without blocking the event loop on a shared backend."""
+        self._ensure_loaded()
+        if not self.atomic_updates:
+            return self.update(record_id, **changes)
+        stored = await asyncio.to_thread(self.storage.update, self.collection, record_id, changes)
+        if stored is None:
+            raise KeyError(record_id)
+        return self._apply(stored)
+
+    async def update_if_async(self, record_id: Hashable, condition: Condition, **changes: Any) -> Optional[Record]:
+        """``update_if`` without blocking the event loop on a shared backend.
+
+        ``condition`` runs in the storage thread, so it must only read the
+        record it is given.
+        """
+        self._ensure_loaded()
+        if not self.atomic_updates:
+            return self.update_if(record_id, condition, **changes)
+        stored = await asyncio.to_thread(self.storage.update, self.collection, record_id, changes, condition)
+        if stored is None:
+            await self.fresh_async(record_id)
+            return None
+        return self._apply(stored)
+
+    async def fresh_async(self, record_id: Hashable) -> Optional[Record]:
+        """``fresh`` without blocking the event loop on a shared backend."""
+        self._ensure_loaded()
+        if not self.shared:
+            return self.records.get(record_id)
+        stored = await asyncio.to_thread(self.storage.get, self.collection, record_id)
+        return self._apply(stored) if stored is not None else self.records.get(record_id)
+
+    def sync(self) -> int:
+        """Apply records other workers wrote since the last sync; returns how many."""
+        # A running load took its revision before reading, so skipping it here loses nothing
+        if not self.shared or not self._loaded or self.loading:
+            return 0
+        changed, self._revision = self.storage.changed_since(self.collection, self._revision)
+        for stored in changed:
+            record = self._apply(stored)
+            if self.on_load is not None:
+                self.on_load(record)
+        return len(changed)
+
+    def _apply(self, stored: Record) -> Record:
+        """Make the cached copy of a record match ``stored`` without writing it back."""
+        record_id = stored[self.key]
+        record = self.records.get(record_id)
+        if record is None:
+            record = self._convert(stored)
+            self.records[record_id] = record
+        else:
+            if record is not stored:
+                for key in [key for key in record if key not in stored]:
+                    del record[key]
+                record.update(stored)
+            self._unindex(record_id)
+        self._index(record_id, record)
+        return record
+
+    def remove(self, record_id: Hashable) -> Optional[Record]:
+        self._ensure_loaded()
+        record = self._known(record_id)
+        if self.loading:
+            self._removed.add(record_id)
+        if record is not None:
+            del self.records[record_id]
+            self._unindex(record_id)
+            self._persist(record_id, None)
+        return record
+
+    def reindex(self, record_id: Hashable) -> None:
+        """Refresh index entries and storage after a record was changed in place."""
+        self._ensure_loaded()
+        record = self.records[record_id]
+        self._unindex(record_id)
+        self._index(record_id, record)
+        self._persist(record_id, record)
+
+    def lookup(self, index: str, value: Hashable) -> List[Record]:
+        """Records whose indexed ``index`` values include ``value``."""
+        self._ensure_loaded()
+        ids = self._indexes[index].get(value, {})
+        return [self.records[record_id] for record_id in ids]
+
+    def ids(self, index: str, value: Hashable) -> Iterable[Hashable]:
+        """Ids of the records whose indexed ``index`` values include ``value``."""
+        self._ensure_loaded()
+        return self._indexes[index].get(value, {}).keys()
+
+    def count(self, index: str, value: Hashable) -> int:
+        self._ensure_loaded()
+        return len(self._indexes[index].get(value, ()))
+
+    def distribution(self, index: str) -> Dict[Hashable, int]:
+        """Record count per indexed value, read straight from the index."""
+        self._ensure_loaded()
+        return {value: len(ids) for value, ids in self._indexes[index].items()}
+
+    def index_values(self, index: str) -> List[Hashable]:
+        """Distinct values currently present in an index."""
+        self._ensure_loaded()
+        return list(self._indexes[index])
+
+    def _index(self, record_id: Hashable, record: Record) -> None:
+        for name, function in self._index_functions.items():
+            values = tuple(dict.fromkeys(function(record)))
+            self._indexed_values[name][record_id] = values
+            index = self._indexes[name]
+            for value in values:
+                index.setdefault(value, {})[record_id] = None
+
+    def _unindex(self, record_id: Hashable) -> None:
+        for name in self._index_functions:
+            index = self._indexes[name]
+            for value in self._indexed_values[name].pop(record_id, ()):
+                ids = index.get(value)
+                if ids is None:
+                    continue
+                ids.pop(record_id, None)
+                if not ids:
+                    del index[value]
+
+
+def sync_stores() -> int:
+    """Refresh every shared store with other workers' writes; returns records applied."""
+    return sum(store.sync() for store in _shared_stores)
+
+
+def load_stores() -> int:
+    """Load every persisted store not loaded yet; returns how many records they hold."""
+    for store in _persisted_stores:
+        store.load()
+    return sum(len(store.records) for store in _persisted_stores)
+
+
+async def load_stores_async() -> int:
+    """``load_stores`` for a serving app: each store loads with ``load_async``."""
+    pending = [store for store in _persisted_stores if not store._loaded]
+    # Every store counts as loading from the start, so no request falls back to a blocking load
+    for store in pending:
+        store._loaded = store.loading = True
+    for store in pending:
+        await store.load_async()
+    return sum(len(store.records) for store in _persisted_stores)
+
+
+def loading_stores() -> Dict[str, int]:
+    """Records loaded so far per collection, for stores not fully loaded yet."""
+    return {
+        store.collection: len(store.records)
+        for store in _persisted_stores
+        if store.loading or not store._loaded
+    }
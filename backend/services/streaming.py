@@ -0,0 +1,62 @@
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Optional, Union
+
+from fastapi.responses import StreamingResponse
+
+from services.records import json_default
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is the fallback
+    orjson = None
+
+# Records per NDJSON chunk; batching keeps per-send overhead low without large bodies
+NDJSON_CHUNK_RECORDS = 64
+
+
+def dumps(data: Any) -> str:
+    """Encode JSON for hand-built stream bodies, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(data, default=json_default, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(data, default=json_default)
+
+
+def sse_event(data: Any, event: Optional[str] = None) -> str:
+    """Format one server-sent event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {dumps(data)}\n\n"
+
+
+async def _aiter(items: Union[Iterable[Any], AsyncIterable[Any]]) -> AsyncIterator[Any]:
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def ndjson_lines(items: Union[Iterable[Any], AsyncIterable[Any]], chunk_records: int = NDJSON_CHUNK_RECORDS) -> AsyncIterator[bytes]:
+    """Serialize records as NDJSON, a few records per chunk."""
+    buffer = []
+    async for item in _aiter(items):
+        buffer.append(dumps(item))
+        if len(buffer) >= chunk_records:
+            yield ("\n".join(buffer) + "\n").encode()
+            buffer = []
+    if buffer:
+        yield ("\n".join(buffer) + "\n").encode()
+
+
+def ndjson_response(items: Union[Iterable[Any], AsyncIterable[Any]]) -> StreamingResponse:
+    """Stream a collection as NDJSON without building the whole body."""
+    return StreamingResponse(ndjson_lines(items), media_type="application/x-ndjson")
+
+
+def sse_response(events: AsyncIterable[str]) -> StreamingResponse:
+    """Stream pre-formatted server-sent events."""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
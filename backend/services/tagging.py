@@ -0,0 +1,240 @@
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+# JSON file of {"content": {tag: [keywords]}, "analysis": {tag: [keywords]}}; reloaded when it changes
+TAG_RULES_PATH = os.getenv("TAG_RULES_PATH")
+TAG_RULES_CHECK_INTERVAL = float(os.getenv("TAG_RULES_CHECK_INTERVAL", "5"))
+
+FIELDS = ("content", "analysis")
+
+# Keywords are single words matched on word boundaries; a trailing "*" also
+# matches longer words ("test*" -> tests, testing)
+DEFAULT_TAG_RULES: Dict[str, Dict[str, List[str]]] = {
+    "content": {
+        "backend": ["api*", "endpoint*", "router*", "backend*"],
+        "frontend": ["frontend*", "react", "ui", "component*"],
+        "testing": ["test*", "pytest", "coverage"],
+        "deployment": ["deploy*", "cloud", "docker*"],
+    },
+    "analysis": {
+        "autonomy": ["autonomous*", "autonomy", "self", "ai"],
+        "debugging": ["error*", "fix*", "bug*"],
+        # Not "optimi*": that also matches "optimizations", which every insight prompt contains
+        "performance": ["performance", "optimize*", "speed*"],
+    },
+}
+KEYWORD_PATTERN = re.compile(r"^\w+\*?$")
+
+Rules = Dict[str, Dict[str, List[str]]]
+
+# Word characters, shared by both matchers: ASCII letters, digits, underscore
+# and anything non-ASCII (matched on lowercased text)
+ASCII_WORD_CHARS = frozenset("0123456789abcdefghijklmnopqrstuvwxyz_")
+WORD_BYTES = np.zeros(256, dtype=bool)
+for _byte in b"0123456789abcdefghijklmnopqrstuvwxyz_":
+    WORD_BYTES[_byte] = True
+WORD_BYTES[0x80:] = True
+SEPARATOR = "\0"
+
+
+def _is_word_char(char: str) -> bool:
+    return char in ASCII_WORD_CHARS or char > "\x7f"
+
+
+class CompiledRules:
+    """A rule set prepared for single-document and batch matching."""
+
+    def __init__(self, rules: Rules):
+        self.rules = rules
+        self.order: List[str] = []
+        # field -> [(tag, [(keyword, is_prefix)])], for single documents
+        self.by_tag: Dict[str, List[Tuple[str, List[Tuple[str, bool]]]]] = {}
+        # field -> first byte -> [(keyword bytes, is_prefix, tag bitmask)], for batches
+        self.keywords: Dict[str, Dict[int, List[Tuple[bytes, bool, int]]]] = {}
+        self.max_length = 0
+
+        for field in FIELDS:
+            for tag in rules.get(field, {}):
+                if tag not in self.order:
+                    self.order.append(tag)
+        if len(self.order) > 63:
+            raise ValueError("At most 63 distinct tags are supported")
+
+        for field in FIELDS:
+            by_tag: List[Tuple[str, List[Tuple[str, bool]]]] = []
+            bits: Dict[Tuple[str, bool], int] = {}
+            for tag, keywords in rules.get(field, {}).items():
+                parsed = [(keyword.rstrip("*").lower(), keyword.endswith("*")) for keyword in keywords]
+                by_tag.append((tag, parsed))
+                for keyword in parsed:
+                    bits[keyword] = bits.get(keyword, 0) | 1 << self.order.index(tag)
+            self.by_tag[field] = by_tag
+
+            by_first: Dict[int, List[Tuple[bytes, bool, int]]] = {}
+            for (word, is_prefix), mask in bits.items():
+                encoded = word.encode()
+                self.max_length = max(self.max_length, len(encoded))
+                by_first.setdefault(encoded[0], []).append((encoded, is_prefix, mask))
+            self.keywords[field] = by_first
+
+    def tags_from_mask(self, mask: int) -> List[str]:
+        return [tag for i, tag in enumerate(self.order) if mask >> i & 1]
+
+
+class TagEngine:
+    """Whole-word keyword tagger whose rules can be reloaded from a file.
+
+    Keywords only match on word boundaries, so "ui" no longer fires inside
+    "build". ``tag`` finds occurrences with C substring search and checks only
+    those for boundaries. ``tag_many`` joins a batch into one buffer and
+    matches every keyword against its word starts with numpy, so a large
+    batch costs a few array passes instead of a Python loop per keyword and
+    document.
+    """
+
+    def __init__(
+        self,
+        rules: Optional[Rules] = None,
+        path: Optional[str] = TAG_RULES_PATH,
+        check_interval: float = TAG_RULES_CHECK_INTERVAL,
+    ):
+        self.path = path
+        self.check_interval = check_interval
+        self.version = 0
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._compiled = CompiledRules(rules or DEFAULT_TAG_RULES)
+        if path:
+            self.reload()
+
+    @property
+    def rules(self) -> Rules:
+        return self._compiled.rules
+
+    def set_rules(self, rules: Rules) -> None:
+        """Validate and swap in a new rule set."""
+        if not isinstance(rules, dict) or not all(isinstance(tags, dict) for tags in rules.values()):
+            raise ValueError("Tag rules must map fields to {tag: [keywords]} objects")
+        for field, tags in rules.items():
+            if field not in FIELDS:
+                raise ValueError(f"Unknown tag rule field: {field}")
+            for tag, keywords in tags.items():
+                if not isinstance(keywords, list) or not all(
+                    isinstance(k, str) and KEYWORD_PATTERN.match(k) for k in keywords
+                ):
+                    raise ValueError(f"Keywords for tag {tag!r} must be single words, optionally ending in '*'")
+        compiled = CompiledRules(rules)
+        with self._lock:
+            self._compiled = compiled
+            self.version += 1
+
+    def reload(self) -> bool:
+        """Load rules from ``path`` if the file changed; True when new rules were applied."""
+        if not self.path:
+            return False
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        with open(self.path) as f:
+            rules = json.load(f)
+        self.set_rules(rules)
+        self._mtime = mtime
+        return True
+
+    def _maybe_reload(self) -> None:
+        if not self.path:
+            return
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        try:
+            self.reload()
+        except (OSError, ValueError):
+            # Keep serving the last good rules while the file is mid-edit
+            pass
+
+    def tag(self, content: str, analysis: str = "") -> List[str]:
+        """Tags for one document, in rule order."""
+        self._maybe_reload()
+        compiled = self._compiled
+        found: Set[str] = set()
+        for field, text in (("content", content), ("analysis", analysis)):
+            if not text:
+                continue
+            text = text.lower()
+            length = len(text)
+            for tag, keywords in compiled.by_tag[field]:
+                if tag in found:
+                    continue
+                for keyword, is_prefix in keywords:
+                    # str.find runs in C; only actual occurrences are checked for word boundaries
+                    start = text.find(keyword)
+                    while start != -1:
+                        end = start + len(keyword)
+                        if (start == 0 or not _is_word_char(text[start - 1])) and (
+                            is_prefix or end == length or not _is_word_char(text[end])
+                        ):
+                            found.add(tag)
+                            break
+                        start = text.find(keyword, start + 1)
+                    if tag in found:
+                        break
+        return [tag for tag in compiled.order if tag in found]
+
+    def tag_many(self, documents: Sequence[Tuple[str, str]]) -> List[List[str]]:
+        """Tags for a batch of ``(content, analysis)`` pairs, same results as ``tag``."""
+        self._maybe_reload()
+        compiled = self._compiled
+        if not documents:
+            return []
+
+        # Bit per tag for every document, so no Python work happens per match
+        masks = np.zeros(len(documents), dtype=np.int64)
+        for position, field in enumerate(FIELDS):
+            keywords = compiled.keywords[field]
+            if not keywords:
+                continue
+            joined = SEPARATOR.join((document[position] or "").replace(SEPARATOR, " ") for document in documents)
+            encoded = joined.lower().encode()
+            length = len(encoded)
+            # Padding lets every keyword comparison read past the end without bounds checks
+            data = np.frombuffer(encoded + b"\0" * (compiled.max_length + 1), dtype=np.uint8)
+            separators = np.flatnonzero(data[:length] == 0)
+
+            is_word = WORD_BYTES[data]
+            starts = np.flatnonzero(is_word[1:] & ~is_word[:-1]) + 1
+            if length and is_word[0]:
+                starts = np.concatenate(([0], starts))
+            first_bytes = data[starts]
+
+            for first, candidates in keywords.items():
+                positions = starts[first_bytes == first]
+                if not len(positions):
+                    continue
+                for keyword, is_prefix, bits in candidates:
+                    matched = np.ones(len(positions), dtype=bool)
+                    for offset in range(1, len(keyword)):
+                        matched &= data[positions + offset] == keyword[offset]
+                    if not is_prefix:
+                        matched &= ~is_word[positions + len(keyword)]
+                    hits = positions[matched]
+                    if len(hits):
+                        np.bitwise_or.at(masks, np.searchsorted(separators, hits), bits)
+
+        tag_lists = {mask: compiled.tags_from_mask(mask) for mask in np.unique(masks).tolist()}
+        return [list(tag_lists[mask]) for mask in masks.tolist()]
+
+
+# Global instance
+tag_engine = TagEngine()
@@ -0,0 +1,362 @@
+import asyncio
+import math
+import os
+from itertools import islice
+from typing import Callable, Collection, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from services.embeddings import EMBED_BATCH_SIZE, Embedder, create_embedder
+from services.metrics import metrics
+
+# Below this many vectors search is exact; above it an IVF index is trained
+IVF_TRAIN_THRESHOLD = int(os.getenv("IVF_TRAIN_THRESHOLD", "20000"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 100000
+
+
+class VectorIndex:
+    """Float32 vector matrix with an inverted-file (IVF) ANN index.
+
+    Vectors are L2-normalized, so inner product is cosine similarity. Rows are
+    appended to a preallocated matrix that doubles when full; replaced or
+    removed vectors are tombstoned. Once ``train_threshold`` live vectors
+    exist, spherical k-means partitions them into ``sqrt(n)`` lists and
+    queries only scan the ``nprobe`` lists whose centroids are closest to the
+    query.
+
+    ``add_many`` never trains or compacts; ``maintain`` does, retraining each
+    time the live count doubles and compacting once tombstones outnumber live
+    rows (re-embedded documents would otherwise grow the matrix without
+    bound). It rebuilds from a snapshot in a worker thread while the index
+    keeps serving, then swaps the result in on the event loop, catching up
+    with the rows added and removed meanwhile.
+    """
+
+    def __init__(self, dim: int, train_threshold: int = IVF_TRAIN_THRESHOLD, nprobe: int = IVF_NPROBE):
+        self.dim = dim
+        self.train_threshold = train_threshold
+        self.nprobe = nprobe
+        self._vectors = np.zeros((1024, dim), dtype=np.float32)
+        self._alive = np.zeros(1024, dtype=bool)
+        self._size = 0
+        self.row_ids: List[Hashable] = []
+        self.rows: Dict[Hashable, int] = {}
+        self.centroids: Optional[np.ndarray] = None
+        self._lists: List[List[int]] = []
+        self._trained_size = 0
+        self._maintaining = False
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, doc_id: Hashable) -> bool:
+        return doc_id in self.rows
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self._vectors)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._vectors, self._alive = vectors, alive
+
+    def add_many(self, doc_ids: List[Hashable], vectors: np.ndarray) -> None:
+        """Insert or replace vectors for the given ids."""
+        if not doc_ids:
+            return
+        for doc_id in doc_ids:
+            self.remove(doc_id)
+        start = self._size
+        self._grow(start + len(doc_ids))
+        self._vectors[start:start + len(doc_ids)] = vectors
+        self._alive[start:start + len(doc_ids)] = True
+        self._size += len(doc_ids)
+        for offset, doc_id in enumerate(doc_ids):
+            self.rows[doc_id] = start + offset
+            self.row_ids.append(doc_id)
+        self._assign(start)
+
+    def _assign(self, start: int) -> None:
+        """Add rows from ``start`` on to the IVF lists of their nearest centroids."""
+        if self.centroids is None:
+            return
+        assignments = np.argmax(self._vectors[start:self._size] @ self.centroids.T, axis=1)
+        for offset, list_number in enumerate(assignments):
+            self._lists[list_number].append(start + offset)
+
+    def remove(self, doc_id: Hashable) -> None:
+        row = self.rows.pop(doc_id, None)
+        if row is not None:
+            self._alive[row] = False
+
+    @property
+    def needs_training(self) -> bool:
+        live = len(self.rows)
+        return live >= self.train_threshold and live >= 2 * self._trained_size
+
+    @property
+    def needs_compaction(self) -> bool:
+        return self._size - len(self.rows) > max(len(self.rows), 1024)
+
+    async def maintain(self) -> None:
+        """Train or compact in a worker thread if due; a call while one runs does nothing."""
+        if self._maintaining or not (self.needs_training or self.needs_compaction):
+            return
+        self._maintaining = True
+        try:
+            snapshot = self._snapshot()
+            rebuilt = await asyncio.to_thread(self._rebuild, snapshot, self.needs_training)
+            self._install(snapshot, rebuilt)
+        finally:
+            self._maintaining = False
+
+    def train(self) -> None:
+        """(Re)build the IVF partition with spherical k-means, blocking until done."""
+        snapshot = self._snapshot()
+        self._install(snapshot, self._rebuild(snapshot, True))
+
+    def _snapshot(self) -> Tuple[np.ndarray, np.ndarray, List[Hashable], Optional[np.ndarray], List[List[int]]]:
+        """What a rebuild reads: rows below the current size are never rewritten until it is installed."""
+        size = self._size
+        return self._vectors, self._alive[:size].copy(), self.row_ids, self.centroids, self._lists
+
+    def _rebuild(self, snapshot, train: bool):
+        """Compact the snapshot's live rows and partition them; pure, so it can run in a thread."""
+        matrix, alive, row_ids, centroids, lists = snapshot
+        live_rows = np.flatnonzero(alive)
+        count = len(live_rows)
+        vectors = np.zeros((max(1024, count * 2), self.dim), dtype=np.float32)
+        vectors[:count] = matrix[live_rows]
+        new_ids = [row_ids[row] for row in live_rows]
+        rows = dict(zip(new_ids, range(count)))
+
+        if train and count:
+            centroids = _kmeans(vectors[:count])
+            new_lists: List[List[int]] = [[] for _ in range(len(centroids))]
+            for start in range(0, count, 65536):
+                block = np.argmax(vectors[start:min(start + 65536, count)] @ centroids.T, axis=1)
+                for offset, list_number in enumerate(block):
+                    new_lists[list_number].append(start + offset)
+        elif centroids is not None:
+            # Keep the partition, renumbering its rows; rows added since the snapshot are assigned on install
+            renumber = np.full(len(alive), -1, dtype=np.int64)
+            renumber[live_rows] = np.arange(count)
+            new_lists = []
+            for members in lists:
+                members = np.array(members[:], dtype=np.int64)
+                members = renumber[members[members < len(alive)]]
+                new_lists.append(members[members >= 0].tolist())
+        else:
+            new_lists = []
+        return vectors, live_rows, new_ids, rows, centroids, new_lists, train and count > 0
+
+    def _install(self, snapshot, rebuilt) -> None:
+        """Swap in a rebuild, applying the adds and removes made since its snapshot."""
+        _, alive, _, _, _ = snapshot
+        vectors, live_rows, row_ids, rows, centroids, lists, trained = rebuilt
+        count, size = len(live_rows), len(alive)
+        added = self._size - size
+        still_alive = self._alive[live_rows]
+        if len(vectors) < count + added:
+            vectors = np.concatenate([vectors, np.zeros((count + added, self.dim), dtype=np.float32)])
+        vectors[count:count + added] = self._vectors[size:self._size]
+        new_alive = np.zeros(len(vectors), dtype=bool)
+        new_alive[:count] = still_alive
+        new_alive[count:count + added] = self._alive[size:self._size]
+
+        for row in np.flatnonzero(~still_alive):
+            del rows[row_ids[row]]
+        for row, doc_id in enumerate(self.row_ids[size:], count):
+            row_ids.append(doc_id)
+            if new_alive[row]:
+                rows[doc_id] = row
+        self._vectors, self._alive, self._size = vectors, new_alive, count + added
+        self.row_ids, self.rows = row_ids, rows
+        self.centroids, self._lists = centroids, lists
+        if trained:
+            self._trained_size = count
+        self._assign(count)
+
+    def search(
+        self,
+        query: np.ndarray,
+        limit: int = 10,
+        candidates: Optional[Collection[Hashable]] = None,
+    ) -> List[Tuple[Hashable, float]]:
+        """Return up to ``limit`` ``(id, cosine similarity)`` pairs, best first."""
+        if limit <= 0 or not self.rows:
+            return []
+
+        if candidates is not None:
+            rows = np.fromiter((self.rows[c] for c in candidates if c in self.rows), dtype=np.int64)
+        elif self.centroids is None:
+            rows = np.flatnonzero(self._alive[:self._size])
+        else:
+            nprobe = min(self.nprobe, len(self.centroids))
+            probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+            rows = np.fromiter((row for probe in probes for row in self._lists[probe]), dtype=np.int64)
+            rows = rows[self._alive[rows]]
+
+        if len(rows) == 0:
+            return []
+        scores = self._vectors[rows] @ query
+        if len(rows) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(-scores[top])]
+        return [(self.row_ids[rows[i]], float(scores[i])) for i in top]
+
+
+def _kmeans(vectors: np.ndarray) -> np.ndarray:
+    """``sqrt(n)`` spherical k-means centroids of unit ``vectors``."""
+    list_count = max(1, int(math.sqrt(len(vectors))))
+    rng = np.random.default_rng(0)
+    sample = vectors[rng.choice(len(vectors), size=min(len(vectors), KMEANS_SAMPLE), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=list_count, replace=False)].copy()
+
+    for _ in range(KMEANS_ITERATIONS):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        centroids = np.where(empty[:, None], centroids, sums / np.where(norms == 0, 1, norms))
+    return centroids.astype(np.float32)
+
+
+class SemanticIndex:
+    """Embeds documents in batches and queries them through a ``VectorIndex``.
+
+    ``add`` only queues text; embeddings are computed ``batch_size`` at a time
+    by ``flush``. When ``add`` runs on the event loop it also starts a
+    background task that drains the queue batch by batch, so ingesting and
+    loading never wait for embeddings. A query embeds at most
+    ``search_flush`` queued documents first and leaves the rest to the
+    background task, so its latency stays bounded under a large backlog at
+    the cost of briefly missing the newest documents. Training and
+    compaction of the vector index (``VectorIndex.maintain``) also run in
+    the background once a batch makes them due.
+
+    With ``text_for``, ``add`` may queue just an id; the text is looked up
+    when its batch is embedded, so a large backlog (e.g. every insight loaded
+    at startup) does not hold a second copy of each document.
+    """
+
+    def __init__(
+        self,
+        embedder: Optional[Embedder] = None,
+        batch_size: int = EMBED_BATCH_SIZE,
+        text_for: Optional[Callable[[Hashable], Optional[str]]] = None,
+        search_flush: Optional[int] = None,
+    ):
+        self.embedder = embedder or create_embedder()
+        self.batch_size = batch_size
+        self.text_for = text_for
+        self.search_flush = batch_size if search_flush is None else search_flush
+        self.vectors = VectorIndex(self.embedder.dim)
+        self._pending: Dict[Hashable, Optional[str]] = {}
+        self._drainer: Optional[asyncio.Task] = None
+        self._maintainer: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def add(self, doc_id: Hashable, text: Optional[str] = None) -> None:
+        if text is None and self.text_for is None:
+            raise ValueError("Text is required without a text_for lookup")
+        self._pending[doc_id] = text
+        self.schedule()
+
+    def schedule(self) -> None:
+        """Start embedding the queue in the background, unless already running.
+
+        Does nothing off the event loop (e.g. when a collection is loaded in
+        a worker thread); call it again from the loop afterwards.
+        """
+        if not self._pending:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        # A task left on a loop that has since closed never finishes; start over on this one
+        if self._drainer is not None and not self._drainer.done() and self._drainer.get_loop() is loop:
+            return
+        self._drainer = loop.create_task(self._drain())
+
+    async def _drain(self) -> None:
+        while self._pending:
+            try:
+                await self.flush(self.batch_size)
+            except Exception:
+                # Left queued; the next add or query tries again
+                embedding_errors.inc()
+                return
+
+    async def close(self) -> None:
+        """Stop the background embedding and maintenance tasks."""
+        for task in (self._drainer, self._maintainer):
+            if task is not None and task.get_loop() is asyncio.get_running_loop():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._drainer = self._maintainer = None
+
+    def remove(self, doc_id: Hashable) -> None:
+        self._pending.pop(doc_id, None)
+        self.vectors.remove(doc_id)
+
+    async def flush(self, limit: Optional[int] = None) -> None:
+        """Embed queued documents, all of them or the oldest ``limit``, ``batch_size`` per embedder call."""
+        remaining = len(self._pending) if limit is None else limit
+        while self._pending and remaining > 0:
+            batch = list(islice(self._pending.items(), min(self.batch_size, remaining)))
+            remaining -= len(batch)
+            for doc_id, _ in batch:
+                del self._pending[doc_id]
+            batch = [(doc_id, text if text is not None else self.text_for(doc_id)) for doc_id, text in batch]
+            # Documents removed since they were queued have no text left
+            batch = [(doc_id, text) for doc_id, text in batch if text is not None]
+            if not batch:
+                continue
+            try:
+                vectors = await self.embedder.embed([text for _, text in batch])
+            except BaseException:
+                # Requeue so the next flush retries, without overwriting newer text
+                for doc_id, text in batch:
+                    self._pending.setdefault(doc_id, text)
+                raise
+            self.vectors.add_many([doc_id for doc_id, _ in batch], vectors)
+            self._maintain()
+
+    def _maintain(self) -> None:
+        if not (self.vectors.needs_training or self.vectors.needs_compaction):
+            return
+        loop = asyncio.get_running_loop()
+        if self._maintainer is not None and not self._maintainer.done() and self._maintainer.get_loop() is loop:
+            return
+        self._maintainer = loop.create_task(self.vectors.maintain())
+
+    async def search(
+        self,
+        query: str,
+        limit: int = 10,
+        candidates: Optional[Collection[Hashable]] = None,
+    ) -> List[Tuple[Hashable, float]]:
+        await self.flush(self.search_flush)
+        self.schedule()
+        query_vector = (await self.embedder.embed([query]))[0]
+        return self.vectors.search(query_vector, limit, candidates)
+
+
+embedding_errors = metrics.counter(
+    "kortana_embedding_errors_total",
+    "Background embedding batches that failed and were left queued",
+)
@@ -0,0 +1,12 @@
+import os
+import sys
+
+# The backend reads its configuration at import time: in-memory storage, no
+# disk cache and in-process Gemini, so tests touch nothing outside the process
+os.environ.setdefault("KORTANA_STORAGE", "memory")
+os.environ.setdefault("GEMINI_DISPATCH_MODE", "local")
+os.environ.setdefault("LLM_CACHE_DIR", "")
+os.environ.setdefault("GITHUB_TOKEN", "test")
+os.environ.setdefault("METRICS_ENABLED", "true")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,110 @@
+"""AgentRunner: the task timeout covers the run, the queue wait is bounded on its own."""
+import asyncio
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services import agent_runner as agent_runner_module
+from services.agent_runner import AgentRunner
+
+AGENT = {"id": "sleepy", "name": "sleepy", "capabilities": []}
+
+
+def _sleep(action: str, text: str, agent_name: str, cpu_seconds: int, timeout: float):
+    time.sleep(float(text))
+    return {"status": "succeeded", "result": text, "error": None}
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    """A one-worker runner on a thread pool whose tasks sleep for their input in seconds."""
+    monkeypatch.setattr(agent_runner_module, "_run_action", _sleep)
+    monkeypatch.setattr(agent_runner_module, "TIMEOUT_GRACE", 0.05)
+    pool = ThreadPoolExecutor(max_workers=4)
+    runner = AgentRunner(workers=1, max_concurrency=4, timeout=0.5)
+    monkeypatch.setattr(runner, "_executor", lambda: pool)
+    yield runner
+    pool.shutdown(wait=True)
+
+
+def _batch(runner: AgentRunner, tasks):
+    async def main():
+        return [result async for result in runner.run_many(AGENT, tasks)]
+
+    return sorted(asyncio.run(main()), key=lambda result: result["index"])
+
+
+def test_waiting_for_a_worker_does_not_count_against_the_timeout(runner):
+    results = _batch(runner, ["0.15"] * 5)
+    assert [result["status"] for result in results] == ["succeeded"] * 5
+    # The last task waited for four others, longer than its own timeout
+    assert max(result["queued_ms"] for result in results) >= 550
+    assert all(result["duration_ms"] < 500 for result in results)
+
+
+def test_a_task_still_times_out_on_its_own_run(runner):
+    (result,) = _batch(runner, ["0.8"])
+    assert result["status"] == "failed" and result["error"] == "Timed out after 0.5s"
+
+
+def test_the_queue_wait_is_bounded_separately(runner):
+    runner.queue_timeout = 0.1
+    first, second = _batch(runner, ["0.25", "0"])
+    assert first["status"] == "succeeded"
+    assert second["status"] == "failed" and second["error"] == "No free agent worker within 0.1s"
+    assert second["queued_ms"] >= 100
+
+
+def test_the_runner_works_across_event_loops(runner):
+    for _ in range(2):
+        assert [result["status"] for result in _batch(runner, ["0.01", "0.01"])] == ["succeeded"] * 2
+
+
+def test_a_timed_out_task_keeps_its_worker_until_it_stops(runner):
+    timed_out, queued = _batch(runner, ["0.8", "0"])
+    assert timed_out["error"] == "Timed out after 0.5s"
+    # The thread running the first task cannot be stopped, so the second waited for it to finish
+    assert queued["status"] == "succeeded" and queued["queued_ms"] >= 750
+
+
+def test_idle_agents_do_not_keep_a_limit(runner):
+    async def main():
+        agents = [{**AGENT, "id": f"agent-{n}"} for n in range(3)]
+        await asyncio.gather(*(runner.run(agent, "0.01") for agent in agents))
+        return dict(runner._limits)
+
+    runner.queue_timeout = 0.05
+    assert asyncio.run(main()) == {}
+    # Also once a task gave up waiting for a worker
+    assert [result["status"] for result in _batch(runner, ["0.2", "0"])] == ["succeeded", "failed"]
+    assert runner._limits == {}
+
+
+def _stubborn(action: str, text: str, agent_name: str, cpu_seconds: int, timeout: float):
+    """Ignore the wall-clock timer, as a task stuck in native code would."""
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGALRM})
+    time.sleep(float(text))
+    return {"status": "succeeded", "result": text, "error": None}
+
+
+@pytest.mark.skipif(not hasattr(signal, "pthread_sigmask"), reason="needs POSIX signal masks")
+def test_a_worker_that_ignores_its_timer_is_killed(monkeypatch):
+    monkeypatch.setattr(agent_runner_module, "_run_action", _stubborn)
+    monkeypatch.setattr(agent_runner_module, "TIMEOUT_GRACE", 0.05)
+    runner = AgentRunner(workers=1, max_concurrency=4, timeout=0.5, memory_limit_mb=0)
+
+    async def main():
+        # Start the pool first, so process startup does not count against the timeout
+        await runner.run(AGENT, "0")
+        started = time.perf_counter()
+        stuck = await runner.run(AGENT, "30")
+        return stuck, await runner.run(AGENT, "0"), time.perf_counter() - started
+
+    try:
+        stuck, after, elapsed = asyncio.run(main())
+    finally:
+        runner.close()
+    assert stuck["error"] == "Timed out after 0.5s"
+    assert after["status"] == "succeeded" and elapsed < 20
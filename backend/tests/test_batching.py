@@ -0,0 +1,110 @@
+"""Micro-batched remote Gemini calls against the Gemini stub."""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from benchmarks import gemini_stub
+from services.gemini import GeminiError, GeminiService
+from services.http_client import http_client
+
+STUB_URL = "http://gemini.stub"
+
+
+@pytest.fixture(autouse=True)
+def stub(monkeypatch):
+    monkeypatch.setattr(gemini_stub, "GEMINI_STUB_LATENCY", 0.0)
+    monkeypatch.setattr(http_client, "transport", httpx.ASGITransport(app=gemini_stub.app))
+    yield gemini_stub
+    gemini_stub._quota = None
+
+
+def _service(max_size: int = 4, max_wait: float = 10.0, max_queue: int = 100, timeout: float = 5.0) -> GeminiService:
+    service = GeminiService(mode="remote", base_url=STUB_URL, cache=None, batch_size=max_size)
+    batcher = service.batchers["analyze"]
+    batcher.max_wait, batcher.max_queue, batcher.timeout = max_wait, max_queue, timeout
+    return service
+
+
+def _run(scenario):
+    async def main():
+        await http_client.start()
+        try:
+            return await scenario()
+        finally:
+            await http_client.close()
+
+    return asyncio.run(main())
+
+
+def test_full_batches_are_sent_without_waiting():
+    service = _service(max_size=4, max_wait=10.0)
+
+    async def scenario():
+        before = gemini_stub.state["requests"]
+        start = time.perf_counter()
+        results = await asyncio.gather(*(service.analyze(f"prompt {i}") for i in range(8)))
+        return results, gemini_stub.state["requests"] - before, time.perf_counter() - start
+
+    results, requests, elapsed = _run(scenario)
+    assert [result["analysis"] for result in results] == [
+        f"Stub analysis of {len(f'prompt {i}')} characters: fix the api bug and optimize performance." for i in range(8)
+    ]
+    assert requests == 2
+    assert elapsed < 5
+
+
+def test_partial_batch_is_sent_after_max_wait():
+    service = _service(max_size=16, max_wait=0.05)
+
+    async def scenario():
+        before = gemini_stub.state["requests"]
+        start = time.perf_counter()
+        await asyncio.gather(*(service.analyze(f"prompt {i}") for i in range(3)))
+        return gemini_stub.state["requests"] - before, time.perf_counter() - start
+
+    requests, elapsed = _run(scenario)
+    assert requests == 1
+    assert elapsed >= 0.05
+
+
+def test_each_caller_keeps_its_own_deadline(monkeypatch):
+    monkeypatch.setattr(gemini_stub, "GEMINI_STUB_LATENCY", 0.3)
+    service = _service(max_size=2)
+
+    async def scenario():
+        return await asyncio.gather(
+            service._dispatch("analyze", "impatient", 0.05),
+            service._dispatch("analyze", "patient", 5.0),
+            return_exceptions=True,
+        )
+
+    impatient, patient = _run(scenario)
+    assert isinstance(impatient, GeminiError) and impatient.status_code == 504
+    assert patient["analysis"].startswith("Stub analysis of 7 characters")
+
+
+def test_stalled_upstream_counts_in_flight_items_against_the_queue():
+    service = _service(max_size=4, max_queue=8)
+    batcher = service.batchers["analyze"]
+
+    async def scenario():
+        # Hold the stub's only slot, so every batch sent stays in flight
+        gemini_stub.set_quota(1)
+        await gemini_stub._quota.acquire()
+        calls = [asyncio.create_task(service.analyze(f"prompt {i}")) for i in range(8)]
+        while batcher.in_flight < 8:
+            await asyncio.sleep(0.01)
+        queued, in_flight = batcher.queued, batcher.in_flight
+        with pytest.raises(GeminiError) as rejected:
+            await service.analyze("one too many")
+        gemini_stub._quota.release()
+        results = await asyncio.gather(*calls)
+        return queued, in_flight, rejected.value, results, batcher.in_flight
+
+    queued, in_flight, rejected, results, drained = _run(scenario)
+    assert (queued, in_flight) == (0, 8)
+    assert rejected.status_code == 503
+    assert len(results) == 8
+    assert drained == 0
@@ -0,0 +1,198 @@
+"""GitHub client against the GitHub stub: pagination, ETags and rate-limit budgeting."""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from benchmarks import github_stub
+from services import github_client as github_module
+from services.github_client import GitHubClient, GitHubError
+from services.http_client import AsyncHTTPClient
+
+STUB_URL = "http://github.stub"
+
+
+@pytest.fixture(autouse=True)
+def stub(monkeypatch):
+    monkeypatch.setattr(github_stub, "issues", github_stub.make_issues(250))
+    monkeypatch.setattr(github_stub, "STUB_LATENCY", 0.0)
+    monkeypatch.setitem(github_stub.state, "remaining", github_stub.STUB_RATE_LIMIT)
+    monkeypatch.setitem(github_stub.state, "reset", int(time.time()) + 3600)
+    return github_stub
+
+
+def _run(scenario, transport=None, **options):
+    """Run ``scenario(client)`` with a GitHub client on its own connection pool."""
+    http = AsyncHTTPClient(retries=0, transport=transport or httpx.ASGITransport(app=github_stub.app))
+    client = GitHubClient(token="test", base_url=STUB_URL, client=http, **options)
+
+    async def main():
+        await http.start()
+        try:
+            return await scenario(client)
+        finally:
+            await http.close()
+
+    return asyncio.run(main())
+
+
+def test_paginate_fetches_every_page_in_order():
+    async def scenario(client):
+        return await client.paginate("/repos/o/r/issues", max_pages=None)
+
+    issues = _run(scenario)
+    assert [issue["number"] for issue in issues] == list(range(1, 251))
+
+
+def test_paginate_stops_at_max_pages():
+    async def scenario(client):
+        return await client.paginate("/repos/o/r/issues", per_page=30, max_pages=2)
+
+    assert len(_run(scenario)) == 60
+
+
+def test_next_links_are_followed_without_a_last_link():
+    pages = {1: [1, 2], 2: [3, 4], 3: [5]}
+
+    def handler(request):
+        page = int(request.url.params.get("page", 1))
+        headers = {}
+        if page + 1 in pages:
+            headers["Link"] = f'<{STUB_URL}/items?per_page=2&page={page + 1}>; rel="next"'
+        return httpx.Response(200, json=pages[page], headers=headers)
+
+    async def scenario(client):
+        return await client.paginate("/items", per_page=2, max_pages=None)
+
+    assert _run(scenario, httpx.MockTransport(handler)) == [1, 2, 3, 4, 5]
+
+
+def test_unchanged_pages_are_served_from_the_etag_cache():
+    async def scenario(client):
+        first = await client.paginate("/repos/o/r/issues", max_pages=None)
+        remaining = github_stub.state["remaining"]
+        second = await client.paginate("/repos/o/r/issues", max_pages=None)
+        return first, second, remaining
+
+    first, second, remaining = _run(scenario)
+    assert second == first
+    # Three 304s, none of them charged against the budget
+    assert github_stub.state["remaining"] == remaining
+
+
+def test_etag_hits_are_counted():
+    async def scenario(client):
+        await client.get("/repos/o/r/branches")
+        await client.get("/repos/o/r/branches")
+        return client.counters
+
+    counters = _run(scenario)
+    assert counters["requests"] == 2
+    assert counters["not_modified"] == 1
+
+
+def test_low_budget_spreads_the_remaining_calls_over_the_window(monkeypatch):
+    waits = []
+
+    async def sleep(seconds):
+        waits.append(seconds)
+
+    monkeypatch.setattr(github_module.asyncio, "sleep", sleep)
+    monkeypatch.setitem(github_stub.state, "remaining", 10)
+    monkeypatch.setitem(github_stub.state, "reset", int(time.time()) + 20)
+
+    async def scenario(client):
+        await client.get("/repos/o/r/branches")
+        await client.get("/repos/o/r/branches")
+        return client.counters["rate_limited_waits"]
+
+    assert _run(scenario, reserve=50) == 1
+    # 19-20s left for the 9 calls remaining after the first: one call every ~2.2s
+    assert len(waits) == 1 and 19 / 9 - 0.1 < waits[0] <= 20 / 9
+
+
+def test_exhausted_budget_with_a_distant_reset_is_rejected(monkeypatch):
+    monkeypatch.setitem(github_stub.state, "remaining", 0)
+    monkeypatch.setitem(github_stub.state, "reset", int(time.time()) + 3600)
+
+    async def scenario(client):
+        await client.get("/repos/o/r/branches")
+        await client.get("/repos/o/r/branches")
+
+    with pytest.raises(GitHubError) as error:
+        _run(scenario, max_wait=60)
+    assert error.value.status_code == 429
+
+
+@pytest.mark.parametrize("status, expected", [(200, 502), (503, 503)])
+def test_non_json_body_raises_github_error(status, expected):
+    def handler(request):
+        return httpx.Response(status, content=b"<html>Bad gateway</html>", headers={"Content-Type": "text/html"})
+
+    async def scenario(client):
+        await client.get("/repos/o/r")
+
+    with pytest.raises(GitHubError) as error:
+        _run(scenario, httpx.MockTransport(handler))
+    assert error.value.status_code == expected
+
+
+def test_concurrent_callers_on_a_low_budget_take_successive_slots(monkeypatch):
+    waits = []
+
+    async def sleep(seconds):
+        waits.append(seconds)
+
+    monkeypatch.setattr(github_module.asyncio, "sleep", sleep)
+    monkeypatch.setitem(github_stub.state, "remaining", 10)
+    monkeypatch.setitem(github_stub.state, "reset", int(time.time()) + 20)
+
+    async def scenario(client):
+        await client.get("/repos/o/r/branches")
+        await asyncio.gather(*(client.get("/repos/o/r/branches") for _ in range(3)))
+
+    _run(scenario, reserve=50)
+    # Same snapshot of 9 calls left, but one slot each rather than all after the first delay
+    interval = waits[0]
+    assert len(waits) == 3 and 19 / 9 - 0.1 < interval <= 20 / 9
+    assert waits[1] == pytest.approx(2 * interval, abs=0.05) and waits[2] == pytest.approx(3 * interval, abs=0.05)
+
+
+def test_closing_a_page_stream_early_waits_for_the_cancelled_fetches():
+    in_flight = []
+
+    async def handler(request):
+        page = int(request.url.params.get("page", 1))
+        headers = {"Link": f'<{STUB_URL}/items?per_page=1&page=20>; rel="last"'}
+        in_flight.append(page)
+        try:
+            await asyncio.sleep(0.01 * page)
+        finally:
+            in_flight.remove(page)
+        return httpx.Response(200, json=[page], headers=headers)
+
+    async def scenario(client):
+        pages = client.iter_pages("/items", per_page=1, max_pages=None)
+        received = [await pages.__anext__(), await pages.__anext__()]
+        await pages.aclose()
+        return received, list(in_flight)
+
+    received, still_running = _run(scenario, httpx.MockTransport(handler), page_concurrency=4)
+    assert received == [[1], [2]] and still_running == []
+
+
+def test_routes_bound_max_pages():
+    from fastapi import FastAPI
+
+    from routers import github
+
+    app = FastAPI()
+    app.include_router(github.router, prefix="/api/github")
+
+    async def get(max_pages):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get("/api/github/repos/o/r/issues", params={"max_pages": max_pages})
+
+    assert asyncio.run(get(github_module.GITHUB_MAX_PAGES_LIMIT + 1)).status_code == 422
+    assert asyncio.run(get(0)).status_code == 422
@@ -0,0 +1,72 @@
+"""Ingest: exact re-ingest, near-duplicates and failed analyses."""
+import asyncio
+import random
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from routers import knowledge
+from routers.knowledge import knowledge_manager
+from services.gemini import GeminiError, gemini_service
+
+
+def _content(seed: int) -> str:
+    rng = random.Random(seed)
+    return " ".join(f"term{rng.randrange(10 ** 6)}" for _ in range(80))
+
+
+@pytest.fixture
+def failing_gemini(monkeypatch):
+    async def analyze(text, timeout=None):
+        raise GeminiError("Gemini request failed", status_code=500)
+
+    monkeypatch.setattr(gemini_service, "analyze", analyze)
+
+
+def test_exact_reingest_refreshes_the_stored_insight():
+    content = _content(1)
+    first = asyncio.run(knowledge_manager.ingest_learning(content, "notes", {"round": 1}))
+    again = asyncio.run(knowledge_manager.ingest_learning(content, "notes", {"round": 2}))
+
+    assert first["message"] == "Knowledge ingested"
+    assert again["message"] == "Knowledge updated"
+    assert again["insight"]["id"] == first["insight"]["id"]
+    assert knowledge_manager.knowledge.get(first["insight"]["id"])["metadata"] == {"round": 2}
+
+
+def test_near_duplicate_from_another_source_is_skipped():
+    content = _content(2)
+    first = asyncio.run(knowledge_manager.ingest_learning(content, "notes"))
+    copy = asyncio.run(knowledge_manager.ingest_learning(content + " trailing", "chat"))
+
+    assert copy["message"] == "Duplicate content"
+    assert copy["duplicates"]["matches"][0]["id"] == first["insight"]["id"]
+
+
+def test_failed_analysis_is_not_stored_or_deduplicated(failing_gemini, monkeypatch):
+    content = _content(3)
+    with pytest.raises(GeminiError):
+        asyncio.run(knowledge_manager.ingest_learning(content, "notes"))
+
+    insight_id = knowledge_manager._insight_id(content, "notes")
+    assert insight_id not in knowledge_manager.knowledge
+    assert not knowledge_manager.dedup.query(knowledge_manager.dedup.signature(content))
+
+    monkeypatch.undo()
+    retried = asyncio.run(knowledge_manager.ingest_learning(content, "notes"))
+    assert retried["message"] == "Knowledge ingested"
+
+
+def test_failed_analysis_is_a_bad_gateway(failing_gemini):
+    app = FastAPI()
+    app.include_router(knowledge.router, prefix="/api/knowledge")
+
+    async def post():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post("/api/knowledge/ingest", json={"content": _content(4), "source": "notes"})
+
+    response = asyncio.run(post())
+
+    assert response.status_code == 502
+    assert response.json()["detail"] == "Failed to analyze content"
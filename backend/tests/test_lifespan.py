@@ -0,0 +1,147 @@
+"""App startup and shutdown."""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import httpx
+
+import main
+from services import store as store_module
+from services.storage import MemoryStorage
+from services.store import IndexedStore
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class GatedStorage(MemoryStorage):
+    """Loads only after ``gate`` is set, as a large collection would take a while to."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+
+    def load(self, collection):
+        self.gate.wait(10)
+        yield from super().load(collection)
+
+
+def _probe_store(records: int):
+    storage = GatedStorage()
+    for n in range(records):
+        storage.put("probe", n, {"id": n, "value": "stored"})
+    converted_on = set()
+
+    class ProbeRecord(dict):
+        def __init__(self, record):
+            super().__init__(record)
+            converted_on.add(threading.current_thread())
+
+    loaded_on = set()
+    probe = IndexedStore(
+        storage=storage,
+        collection="probe",
+        record_type=ProbeRecord,
+        on_load=lambda record: loaded_on.add(threading.current_thread()),
+    )
+    return probe, storage, converted_on, loaded_on
+
+
+async def _health():
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/api/health")
+    return response.status_code, response.json()
+
+
+def test_the_app_serves_while_stores_load():
+    probe, storage, converted_on, loaded_on = _probe_store(600)
+
+    async def startup():
+        async with main.lifespan(main.app):
+            during = await _health()
+            # A lookup by id does not wait for the load
+            looked_up = probe.get(599)
+            storage.gate.set()
+            await main.app.state.loader
+            return during, looked_up, await _health(), threading.current_thread()
+
+    try:
+        during, looked_up, after, loop_thread = asyncio.run(startup())
+    finally:
+        store_module._persisted_stores.remove(probe)
+
+    assert during[0] == 200 and during[1]["status"] == "loading"
+    assert during[1]["loading"]["probe"] <= 1
+    assert looked_up == {"id": 599, "value": "stored"}
+    assert after[0] == 200 and after[1]["status"] == "alive" and "loading" not in after[1]
+    assert len(probe) == 600
+    # Records are decoded off the loop but installed on it, which owns the indexes
+    assert converted_on - {loop_thread}
+    assert loaded_on == {loop_thread}
+
+
+def test_writes_during_a_load_are_not_overwritten_by_it():
+    probe, storage, _, _ = _probe_store(10)
+
+    async def load():
+        loader = asyncio.create_task(probe.load_async(batch=3))
+        await asyncio.sleep(0)
+        probe.update(4, value="changed")
+        probe.remove(7)
+        probe.add({"id": 10, "value": "new"})
+        storage.gate.set()
+        await loader
+
+    try:
+        asyncio.run(load())
+    finally:
+        store_module._persisted_stores.remove(probe)
+
+    assert probe.get(4)["value"] == "changed"
+    assert probe.get(7) is None
+    assert sorted(record["id"] for record in probe) == [0, 1, 2, 3, 4, 5, 6, 8, 9, 10]
+
+
+PROBE = """
+import asyncio, json, sys
+import httpx
+import main
+
+async def probe():
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/api/health")
+    return response.status_code, response.json()
+
+status, body = asyncio.run(probe())
+print(json.dumps({"status": status, "body": body, "modules": sorted(sys.modules)}))
+"""
+
+
+def _boot(routers: str) -> dict:
+    env = {**os.environ, "KORTANA_ROUTERS": routers}
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_services_load_only_with_a_router_that_uses_them():
+    booted = _boot("agents")
+    assert booted["status"] == 200
+    assert booted["body"]["checks"] == {"storage": True, "stores": True}
+    assert booted["body"]["integrations"] == {}
+    for module in ("services.gemini", "services.github_client", "services.scheduler", "services.http_client"):
+        assert module not in booted["modules"]
+    assert "services.agent_runner" in booted["modules"]
+
+
+def test_health_reports_the_services_of_the_mounted_routers():
+    booted = _boot("autonomy")
+    assert booted["status"] == 200
+    assert booted["body"]["checks"] == {"storage": True, "http_client": True, "scheduler": True, "stores": True}
+    assert booted["body"]["integrations"] == {"gemini": "local", "github": True}
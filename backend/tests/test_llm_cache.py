@@ -0,0 +1,78 @@
+"""LLMCache: both tiers, clearing and isolation of cached values."""
+import asyncio
+import os
+
+from services.llm_cache import MISSING, LLMCache
+
+
+def _files(directory) -> list:
+    return [name for _, _, names in os.walk(directory) for name in names]
+
+
+def test_values_survive_a_restart_through_the_disk_tier(tmp_path):
+    key = LLMCache.make_key("Summarize   this", model="m")
+    assert key == LLMCache.make_key("Summarize this", model="m")
+
+    asyncio.run(LLMCache(cache_dir=str(tmp_path)).set(key, {"analysis": "ok"}))
+    restarted = LLMCache(cache_dir=str(tmp_path))
+    assert asyncio.run(restarted.get(key)) == {"analysis": "ok"}
+    assert restarted.counters["disk_hits"] == 1
+
+
+def test_clear_drops_the_disk_tier_too(tmp_path):
+    (tmp_path / "unrelated.txt").write_text("kept")
+    cache = LLMCache(cache_dir=str(tmp_path))
+
+    async def scenario():
+        for n in range(5):
+            await cache.set(LLMCache.make_key(f"prompt {n}"), {"n": n})
+        await cache.clear()
+        return await cache.get(LLMCache.make_key("prompt 0"))
+
+    assert asyncio.run(scenario()) is MISSING
+    assert _files(tmp_path) == ["unrelated.txt"]
+    assert asyncio.run(LLMCache(cache_dir=str(tmp_path)).get(LLMCache.make_key("prompt 1"))) is MISSING
+
+
+def test_callers_get_their_own_copy():
+    cache = LLMCache(cache_dir=None)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"analysis": "ok", "tags": ["a"]}
+
+    async def scenario():
+        first, second = await asyncio.gather(cache.get_or_compute("k", compute), cache.get_or_compute("k", compute))
+        first["tags"].append("mutated")
+        second["analysis"] = "mutated"
+        return first, second, await cache.get_or_compute("k", compute)
+
+    first, second, third = asyncio.run(scenario())
+    assert len(calls) == 1 and cache.counters["coalesced"] == 1
+    assert first is not second
+    assert third == {"analysis": "ok", "tags": ["a"]}
+
+
+def test_a_waiter_takes_over_when_the_computing_caller_is_cancelled():
+    cache = LLMCache(cache_dir=None)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"analysis": f"call {len(calls)}"}
+
+    async def scenario():
+        leader = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.create_task(cache.get_or_compute("k", compute)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.gather(*waiters), leader.cancelled()
+
+    results, leader_cancelled = asyncio.run(scenario())
+    assert leader_cancelled
+    assert results == [{"analysis": "call 2"}] * 3
+    assert len(calls) == 2 and cache.counters["coalesced"] == 2
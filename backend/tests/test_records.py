@@ -0,0 +1,101 @@
+"""Compact records: round trips, JSON encoding and memory per record."""
+import json
+from datetime import datetime
+
+import pytest
+
+from benchmarks import memory
+from routers.autonomy import TaskRecord
+from routers.knowledge import InsightRecord
+from services import records
+from services.records import CompactRecord, Field, Text
+
+CONTENT = "Profiling showed the tag index rebuilt on every request. " * 10
+
+INSIGHT = {
+    "id": "insight-1",
+    "source": "github",
+    "content": CONTENT,
+    "insights": memory.make_analysis(CONTENT),
+    "metadata": {},
+    "timestamp": "2026-10-17T05:07:01.123456",
+    "tags": ["performance", "backend"],
+    "signature": "AAECAw==",
+    "reviewed_by": "someone",
+}
+
+
+def test_records_read_back_what_was_stored():
+    record = InsightRecord(INSIGHT)
+    assert record.to_dict() == {**INSIGHT, "tags": ("performance", "backend")}
+    assert json.loads(json.dumps(record, default=records.json_default)) == INSIGHT
+
+
+class QuotingRecord(CompactRecord):
+    FIELDS = {"id": Field(), "content": Text(), "reply": Text(dictionary="content", preset="Reply to: ")}
+    __slots__ = tuple(FIELDS)
+
+
+def test_text_compressed_against_a_field_follows_its_changes():
+    reply = "Quoting it: " + CONTENT
+    record = QuotingRecord(id="q", content=CONTENT, reply=reply)
+    record["content"] = "Something else entirely"
+    assert record["reply"] == reply
+    del record["content"]
+    assert record["reply"] == reply
+
+
+def test_records_are_stored_compressed_and_load_without_recompressing(monkeypatch):
+    stored = json.loads(json.dumps(InsightRecord(INSIGHT), default=records.stored_default))
+    assert set(stored["content"]) == set(stored["insights"]) == {records.ZLIB_KEY}
+    monkeypatch.setattr(records.zlib, "compress", None)
+    monkeypatch.setattr(records.zlib, "compressobj", None)
+    assert InsightRecord(stored).to_dict() == {**INSIGHT, "tags": ("performance", "backend")}
+
+
+def test_text_seeded_by_other_fields_is_stored_as_text():
+    reply = "Quoting it: " + CONTENT
+    stored = json.loads(json.dumps(QuotingRecord(id="q", content=CONTENT, reply=reply), default=records.stored_default))
+    assert stored["reply"] == reply
+    # A seeded field reads text that was stored compressed on its own
+    assert QuotingRecord(id="q", content=CONTENT, reply=stored["content"])["reply"] == CONTENT
+
+
+@pytest.mark.parametrize("timestamp", ["2026-10-17T05:07:01+00:00", "2026-10-17 05:07:01", "yesterday"])
+def test_timestamps_that_would_not_round_trip_stay_strings(timestamp):
+    assert InsightRecord(INSIGHT, timestamp=timestamp)["timestamp"] == timestamp
+
+
+def test_tags_are_shared_and_read_only():
+    first, second = InsightRecord(INSIGHT), InsightRecord(INSIGHT, id="insight-2")
+    assert first["tags"] is second["tags"]
+    with pytest.raises(AttributeError):
+        first["tags"].append("frontend")
+    first["tags"] = [*first["tags"], "frontend"]
+    assert first["tags"] == ("performance", "backend", "frontend")
+    assert second["tags"] == ("performance", "backend")
+
+
+def test_unsupported_values_are_not_silently_stringified():
+    with pytest.raises(TypeError):
+        json.dumps({"when": datetime(2026, 10, 17)}, default=records.json_default)
+    with pytest.raises(TypeError):
+        json.dumps(InsightRecord(INSIGHT, metadata={"seen": {1, 2}}), default=records.json_default)
+
+
+def test_building_records_leaves_nothing_in_the_decode_cache():
+    records._decompress.cache_clear()
+    InsightRecord(INSIGHT)
+    assert records._decompress.cache_info().currsize == 0
+
+
+def test_compact_records_are_over_twice_as_small_as_dicts():
+    results = memory.run(500)
+    # About 2.5x and 2.1x at 20000 records, with analysis text that does not echo the prompt
+    assert results["memory.insight.500"]["reduction"] >= 2.2
+    assert results["memory.task.500"]["reduction"] >= 1.9
+
+
+def test_task_records_keep_unknown_keys():
+    task = TaskRecord({"id": "issue-1", "status": "pending", "custom": [1, 2]})
+    assert task["custom"] == [1, 2] and list(task) == ["id", "status", "custom"]
@@ -0,0 +1,105 @@
+"""TaskScheduler retention and retrying failed autonomy tasks."""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from routers.autonomy import task_queue_manager
+from services import scheduler as scheduler_module
+from services.scheduler import Job, TaskScheduler
+
+
+async def _succeed(job: Job) -> str:
+    return job.id
+
+
+def _run_jobs(scheduler: TaskScheduler, jobs, pause: float = 0.0):
+    async def main():
+        await scheduler.start()
+        try:
+            for job in jobs:
+                scheduler.submit(job)
+                while not job.done:
+                    await asyncio.sleep(0.001)
+                await asyncio.sleep(pause)
+        finally:
+            await scheduler.stop()
+
+    asyncio.run(main())
+
+
+def test_only_the_most_recent_finished_jobs_are_kept():
+    scheduler = TaskScheduler(workers=1, max_finished=3)
+    _run_jobs(scheduler, [Job(f"job-{n}", _succeed) for n in range(5)])
+    assert list(scheduler.jobs) == ["job-2", "job-3", "job-4"]
+
+
+def test_finished_jobs_expire_after_the_retention():
+    scheduler = TaskScheduler(workers=1, retention=0.05)
+    _run_jobs(scheduler, [Job("old", _succeed), Job("new", _succeed)], pause=0.1)
+    assert "old" not in scheduler.jobs
+    assert scheduler.get("new").status == "succeeded"
+
+
+def test_a_dependent_still_runs_after_its_dependency_was_evicted():
+    scheduler = TaskScheduler(workers=2, max_finished=0)
+
+    async def main():
+        gate = asyncio.Event()
+
+        async def wait(job: Job) -> None:
+            await gate.wait()
+
+        await scheduler.start()
+        try:
+            first = scheduler.submit(Job("first", _succeed))
+            slow = scheduler.submit(Job("slow", wait))
+            dependent = scheduler.submit(Job("dependent", _succeed, depends_on=["first", "slow"]))
+            while not first.done:
+                await asyncio.sleep(0.001)
+            evicted = "first" not in scheduler.jobs
+            gate.set()
+            while not dependent.done:
+                await asyncio.sleep(0.001)
+            return evicted, slow.status, dependent.status
+        finally:
+            await scheduler.stop()
+
+    assert asyncio.run(main()) == (True, "succeeded", "succeeded")
+
+
+def test_job_events_are_capped(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "SCHEDULER_MAX_JOB_EVENTS", 20)
+
+    async def chatty(job: Job) -> None:
+        for step in range(100):
+            job.report(step / 100)
+
+    job = Job("chatty", chatty)
+    _run_jobs(TaskScheduler(workers=1), [job])
+    assert len(job.events) == 20
+    assert job.events[-1]["event"] == "succeeded"
+
+
+@pytest.mark.parametrize("status, allowed", [("failed", True), ("pending", True), ("completed", False)])
+def test_failed_tasks_can_be_executed_again(status, allowed):
+    task_id = f"retry-{status}"
+    task_queue_manager.tasks.add(
+        {"id": task_id, "title": "t", "status": status, "error": "Timed out", "branch_name": "b"}
+    )
+
+    async def execute():
+        job = await task_queue_manager.execute_task(task_id)
+        claimed = dict(task_queue_manager.tasks.get(task_id))
+        # The scheduler is not running here; leave nothing queued behind
+        scheduler_module.scheduler.cancel(task_id)
+        return job, claimed
+
+    if allowed:
+        job, claimed = asyncio.run(execute())
+        assert job.id == task_id
+        assert (claimed["status"], claimed["error"]) == ("queued", None)
+    else:
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(execute())
+        assert error.value.status_code == 400
@@ -0,0 +1,90 @@
+"""InvertedIndex: pruned top-k search against exhaustive BM25 scoring."""
+import heapq
+import random
+
+import pytest
+
+from services import search_index as search_index_module
+from services.search_index import InvertedIndex
+
+COMMON = "the a cache latency fix bug deploy index query".split()
+RARE = [f"term{i}" for i in range(300)]
+
+
+def _index(docs: int, seed: int = 42) -> InvertedIndex:
+    rng = random.Random(seed)
+    index = InvertedIndex()
+    for i in range(docs):
+        words = rng.choices(COMMON, k=rng.randrange(1, 12)) + rng.choices(RARE, k=rng.randrange(0, 20))
+        # Few distinct recencies, so score ties are broken by recency as well as by score
+        index.add(f"doc-{i}", " ".join(words), {"id": f"doc-{i}", "n": i}, recency=float(i % 7))
+    return index
+
+
+def _exhaustive(index: InvertedIndex, query: str, limit: int, doc_filter=None, candidates=None):
+    scores = index.score(query, doc_filter, candidates)
+    best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], index.recency[item[0]], item[0]))
+    return [(doc_id, pytest.approx(score)) for doc_id, score in best]
+
+
+def _search(index: InvertedIndex, query: str, limit: int, **filters):
+    return [(document["id"], score) for document, score in index.search(query, limit, **filters)]
+
+
+def test_pruned_search_matches_exhaustive_scoring():
+    index = _index(3000)
+    rng = random.Random(7)
+    for _ in range(200):
+        query = " ".join(rng.choices(COMMON, k=rng.randrange(1, 4)) + rng.choices(RARE, k=rng.randrange(0, 3)))
+        limit = rng.choice([1, 5, 10, 50])
+        assert _search(index, query, limit) == _exhaustive(index, query, limit), query
+
+
+def test_impact_tiers_match_exhaustive_scoring(monkeypatch):
+    monkeypatch.setattr(search_index_module, "TIER_MIN_POSTINGS", 200)
+    index = _index(3000)
+    rng = random.Random(11)
+
+    def check(queries):
+        for _ in range(queries):
+            query = " ".join(rng.choices(COMMON, k=rng.randrange(1, 4)) + rng.choices(RARE, k=rng.randrange(0, 3)))
+            limit = rng.choice([1, 5, 10, 50])
+            assert _search(index, query, limit) == _exhaustive(index, query, limit), query
+
+    check(100)
+    assert set(index.tiers) <= set(COMMON) and index.tiers
+    # Tiers built by the queries above follow later changes
+    for i in range(0, 3000, 4):
+        index.remove(f"doc-{i}")
+    for i in range(1, 3000, 6):
+        index.add(f"doc-{i}", "cache " * (i % 5 + 1) + "the term3", {"id": f"doc-{i}", "n": i}, recency=1.0)
+    check(100)
+
+
+def test_filters_are_applied_before_pruning():
+    index = _index(3000)
+    candidates = {f"doc-{i}" for i in range(0, 3000, 13)}
+
+    def even(document):
+        return document["n"] % 2 == 0
+
+    for query in ("the cache", "term7 the a", "term1 term2 latency fix"):
+        assert _search(index, query, 10, candidates=candidates) == _exhaustive(index, query, 10, candidates=candidates)
+        assert _search(index, query, 10, doc_filter=even) == _exhaustive(index, query, 10, doc_filter=even)
+
+
+def test_bounds_stay_valid_after_removals_and_replacements():
+    index = _index(1000)
+    for i in range(0, 1000, 3):
+        index.remove(f"doc-{i}")
+    for i in range(1, 1000, 5):
+        index.add(f"doc-{i}", "cache cache cache term9", {"id": f"doc-{i}", "n": i}, recency=0.0)
+    for query in ("cache", "term9 cache the", "the a bug"):
+        assert _search(index, query, 10) == _exhaustive(index, query, 10)
+
+
+def test_empty_index_and_unknown_terms_return_nothing():
+    index = InvertedIndex()
+    assert index.search("cache", 10) == []
+    index.add("one", "cache latency", {"id": "one"})
+    assert index.search("unknownterm", 10) == []
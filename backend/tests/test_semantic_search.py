@@ -0,0 +1,130 @@
+"""Semantic ranking, hybrid fusion and background embedding with a fake embedder."""
+import asyncio
+from typing import Dict, List
+
+import numpy as np
+
+from routers.knowledge import RRF_K, InsightRecord, KnowledgeManager, _insight_text, _recent_bucket
+from services.dedup import MinHashLSH
+from services.embeddings import Embedder, HashingEmbedder
+from services.search_index import InvertedIndex
+from services.store import IndexedStore, field_index, multi_field_index
+from services.vector_index import SemanticIndex
+
+
+class FakeEmbedder(Embedder):
+    """Vectors looked up by a text's first word, so similarities are chosen by the test."""
+
+    dim = 2
+
+    def __init__(self, table: Dict[str, tuple]):
+        self.table = table
+        self.calls: List[int] = []
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        self.calls.append(len(texts))
+        vectors = np.array([self.table[text.split()[0]] for text in texts], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+# Query "latency" embeds along x. Keyword ranking: alpha, gamma. Semantic: beta, gamma, delta, alpha.
+DOCS = {
+    "alpha": ("alpha latency latency latency", (0.0, 1.0)),
+    "beta": ("beta unrelated words here", (1.0, 0.0)),
+    "gamma": ("gamma latency", (0.8, 0.6)),
+    "delta": ("delta other words entirely", (0.5, 0.866)),
+}
+
+
+def _manager() -> KnowledgeManager:
+    manager = KnowledgeManager()
+    manager.knowledge = IndexedStore(
+        indexes={
+            "tags": multi_field_index("tags"),
+            "source": field_index("source", "unknown"),
+            "recent_bucket": _recent_bucket,
+        },
+        record_type=InsightRecord,
+    )
+    manager.index = InvertedIndex()
+    manager.dedup = MinHashLSH()
+    table = {"latency": (1.0, 0.0), **{name: vector for name, (_, vector) in DOCS.items()}}
+    manager.semantic = SemanticIndex(
+        FakeEmbedder(table), batch_size=2, text_for=lambda doc_id: _insight_text(manager.knowledge.get(doc_id))
+    )
+    for number, (name, (content, _)) in enumerate(DOCS.items()):
+        insight = {
+            "id": name,
+            "source": "test",
+            "content": content,
+            "insights": "n/a",
+            "metadata": {},
+            "timestamp": f"2026-01-0{number + 1}T00:00:00",
+            "tags": [],
+        }
+        manager._index_insight(manager.knowledge.add(insight))
+    asyncio.run(manager.semantic.flush())
+    return manager
+
+
+def _search(manager: KnowledgeManager, mode: str, limit: int = 10) -> List[str]:
+    async def search():
+        try:
+            return await manager.search_knowledge("latency", limit=limit, mode=mode)
+        finally:
+            await manager.semantic.close()
+
+    return [item["id"] for item in asyncio.run(search())]
+
+
+def test_semantic_ranks_by_cosine_similarity():
+    assert _search(_manager(), "semantic") == ["beta", "gamma", "delta", "alpha"]
+
+
+def test_keyword_ranks_by_bm25():
+    assert _search(_manager(), "keyword") == ["alpha", "gamma"]
+
+
+def test_hybrid_fuses_ranks_with_rrf():
+    manager = _manager()
+    keyword = _search(manager, "keyword")
+    semantic = _search(manager, "semantic")
+    fused = {doc_id: 0.0 for doc_id in DOCS}
+    for ranking in (keyword, semantic):
+        for rank, doc_id in enumerate(ranking):
+            fused[doc_id] += 1 / (RRF_K + rank + 1)
+    expected = sorted(fused, key=fused.get, reverse=True)
+
+    assert _search(manager, "hybrid") == expected
+    # Second in both lists beats first in only one
+    assert expected[0] == "gamma"
+
+
+def test_search_embeds_a_bounded_slice_and_the_rest_in_the_background():
+    embedder = FakeEmbedder({"doc": (1.0, 0.0), "query": (1.0, 0.0)})
+    index = SemanticIndex(embedder, batch_size=4, search_flush=4)
+
+    async def scenario():
+        # Queued off the loop, as a collection loaded in a worker thread would be
+        await asyncio.to_thread(lambda: [index.add(n, f"doc {n}") for n in range(40)])
+        assert index.pending == 40
+        matches = await index.search("query", limit=100)
+        seen_by_search = len(matches)
+        # The query started the background drain of the rest
+        await index._drainer
+        return seen_by_search
+
+    seen_by_search = asyncio.run(scenario())
+    assert seen_by_search == 4
+    assert embedder.calls[:2] == [4, 1]
+    assert len(index.vectors) == 40
+    assert max(embedder.calls) == 4
+
+
+def test_hashing_embedder_gives_the_same_vectors_in_a_thread():
+    embedder = HashingEmbedder(dim=64)
+    short = ["optimize the cache"]
+    long = ["optimize the cache " * 200, "latency of the index " * 200]
+
+    assert np.array_equal(asyncio.run(embedder.embed(short)), embedder._embed(short))
+    assert np.array_equal(asyncio.run(embedder.embed(long)), embedder._embed(long))
@@ -0,0 +1,100 @@
+"""SQLiteStorage: change polling between workers sharing one database."""
+from services import storage as storage_module
+from services.storage import SQLiteStorage
+
+
+class _InterleavedConnection:
+    """A connection that runs ``before_counters`` just before the revision counter is read."""
+
+    def __init__(self, connection, before_counters):
+        self._connection = connection
+        self.before_counters = before_counters
+
+    def execute(self, sql, *args):
+        if "FROM counters" in sql and self.before_counters is not None:
+            before, self.before_counters = self.before_counters, None
+            before()
+        return self._connection.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+def test_a_write_between_the_rows_and_the_cursor_is_not_skipped(tmp_path, monkeypatch):
+    path = str(tmp_path / "shared.db")
+    reader, writer = SQLiteStorage(path), SQLiteStorage(path)
+
+    def write_as_another_worker(record_id):
+        with monkeypatch.context() as patch:
+            patch.setattr(storage_module, "WORKER_ID", "other-worker")
+            writer.put("tasks", record_id, {"id": record_id})
+            writer.flush()
+
+    write_as_another_worker("first")
+    revision = reader.revision()
+    write_as_another_worker("second")
+
+    real = reader.connection
+    monkeypatch.setattr(
+        SQLiteStorage,
+        "connection",
+        property(lambda self: interleaved if self is reader else self._connection),
+    )
+    # Another worker commits after the changed rows are read but before the cursor is
+    interleaved = _InterleavedConnection(real, lambda: write_as_another_worker("third"))
+    changed, revision = reader.changed_since("tasks", revision)
+    assert [record["id"] for record in changed] == ["second"]
+
+    changed, _ = reader.changed_since("tasks", revision)
+    assert [record["id"] for record in changed] == ["third"]
+
+
+def test_a_full_batch_wakes_the_flusher_instead_of_committing_in_the_writer(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "batched.db"), batch_size=3)
+    woken = []
+    storage.on_batch_full = lambda: woken.append(len(storage._pending))
+
+    for n in range(4):
+        storage.put("tasks", f"task-{n}", {"id": f"task-{n}"})
+    storage.delete("tasks", "task-0")
+    # Nothing was committed by the writers, but the buffered writes are readable
+    assert woken == [3, 4, 4] and storage.connection.execute("SELECT COUNT(*) FROM records").fetchone()[0] == 0
+    assert storage.get("tasks", "task-3") == {"id": "task-3"} and storage.get("tasks", "task-0") is None
+
+    storage.flush()
+    assert [record["id"] for record in storage.load("tasks")] == ["task-1", "task-2", "task-3"]
+
+
+def test_a_batch_being_committed_stays_readable(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "flushing.db"))
+    storage.put("tasks", "task-1", {"id": "task-1", "status": "old"})
+    storage.flush()
+    storage.put("tasks", "task-1", {"id": "task-1", "status": "new"})
+
+    seen = []
+    original = storage._next_revision
+
+    def next_revision():
+        # Mid-commit: the new write is in neither the buffer nor the database yet
+        seen.append(storage.get("tasks", "task-1"))
+        return original()
+
+    storage._next_revision = next_revision
+    storage.flush()
+    assert seen == [{"id": "task-1", "status": "new"}]
+
+
+def test_compaction_only_rewrites_a_mostly_free_database(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "compact.db"))
+    for n in range(2000):
+        storage.put("insights", n, {"id": n, "insights": "x" * 500})
+    storage.flush()
+    assert not storage.compact()
+
+    for n in range(1500):
+        storage.delete("insights", n)
+    storage.flush()
+    pages = storage.connection.execute("PRAGMA page_count").fetchone()[0]
+    assert storage.compact()
+    assert storage.connection.execute("PRAGMA page_count").fetchone()[0] < pages / 2
+    assert storage.count("insights") == 500 and storage.get("insights", 1999)["id"] == 1999
@@ -0,0 +1,109 @@
+"""Incremental aggregates of ``IndexedStore`` against a full recompute."""
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+from routers import knowledge
+from routers.knowledge import RECENT_BUCKET_SECONDS, _recent_bucket, knowledge_manager
+from services.store import IndexedStore, field_index, multi_field_index
+
+NOW = 1_760_000_000.0
+STATUSES = ("pending", "queued", "in_progress", "completed", "failed", "cancelled")
+TAGS = ("backend", "frontend", "testing", "performance")
+
+
+def _timestamp(rng: random.Random) -> str:
+    """Timestamps around the recent-window cutoff, at hour-bucket edges and in the future."""
+    cutoff = NOW - 8 * 86400
+    base = rng.choice([
+        cutoff,
+        cutoff - cutoff % RECENT_BUCKET_SECONDS,
+        cutoff - cutoff % RECENT_BUCKET_SECONDS + RECENT_BUCKET_SECONDS,
+        NOW,
+        NOW - NOW % RECENT_BUCKET_SECONDS,
+        NOW + 2 * RECENT_BUCKET_SECONDS,
+        NOW + 30 * 86400,
+        NOW - 30 * 86400,
+    ])
+    return datetime.fromtimestamp(base + rng.choice([-1, -0.001, 0, 0.001, 1, rng.uniform(-7200, 7200)])).isoformat()
+
+
+def _record(rng: random.Random, record_id: int) -> dict:
+    return {
+        "id": record_id,
+        "status": rng.choice(STATUSES),
+        "tags": rng.sample(TAGS, rng.randint(0, 3)),
+        "timestamp": _timestamp(rng) if rng.random() > 0.05 else "not a timestamp",
+    }
+
+
+def _store() -> IndexedStore:
+    return IndexedStore(
+        indexes={
+            "status": field_index("status"),
+            "tags": multi_field_index("tags"),
+            "recent_bucket": _recent_bucket,
+        }
+    )
+
+
+def _apply_random_ops(rng: random.Random, store: IndexedStore, operations: int) -> None:
+    next_id = 0
+    for _ in range(operations):
+        ids = list(store.records)
+        op = rng.choice(["add", "add", "merge", "update", "in_place", "remove"]) if ids else "add"
+        if op == "add":
+            store.add(_record(rng, next_id))
+            next_id += 1
+        elif op == "merge":
+            # add() of an existing id overwrites the given fields
+            fresh = _record(rng, rng.choice(ids))
+            store.add({key: value for key, value in fresh.items() if key == "id" or rng.random() < 0.5})
+        elif op == "update":
+            changes = _record(rng, 0)
+            del changes["id"]
+            store.update(rng.choice(ids), **{key: changes[key] for key in rng.sample(list(changes), rng.randint(1, 3))})
+        elif op == "in_place":
+            record_id = rng.choice(ids)
+            store.get(record_id)["status"] = rng.choice(STATUSES)
+            store.reindex(record_id)
+        else:
+            store.remove(rng.choice(ids + [-1]))
+
+
+@pytest.fixture
+def frozen_time(monkeypatch):
+    monkeypatch.setattr(knowledge.time, "time", lambda: NOW)
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_aggregates_match_recompute(seed, frozen_time, monkeypatch):
+    rng = random.Random(seed)
+    store = _store()
+    _apply_random_ops(rng, store, rng.randint(1, 400))
+    records = store.list()
+
+    statuses = Counter(record["status"] for record in records)
+    assert store.distribution("status") == dict(statuses)
+    for status in STATUSES:
+        assert store.count("status", status) == statuses[status]
+
+    tags = Counter(tag for record in records for tag in dict.fromkeys(record["tags"]))
+    assert store.distribution("tags") == dict(tags)
+
+    buckets = Counter(bucket for record in records for bucket in _recent_bucket(record))
+    assert store.distribution("recent_bucket") == dict(buckets)
+
+    monkeypatch.setattr(knowledge_manager, "knowledge", store)
+    for days in (0, 1, 7, 30):
+        expected = sum(1 for record in records if knowledge_manager._is_recent(record["timestamp"], days))
+        assert knowledge_manager.count_recent(days) == expected
+
+
+def test_is_recent_matches_day_arithmetic(frozen_time):
+    now = datetime.fromtimestamp(NOW)
+    for age in (timedelta(days=7, hours=23), timedelta(days=8), timedelta(days=8, seconds=1), -timedelta(days=3)):
+        timestamp = (now - age).isoformat()
+        assert knowledge_manager._is_recent(timestamp) == ((now - (now - age)).days <= 7)
@@ -0,0 +1,83 @@
+"""TagEngine: word boundaries, wildcards and hot reload."""
+import asyncio
+import json
+import os
+
+import pytest
+
+from routers.knowledge import INSIGHT_PROMPT
+from services.gemini import GeminiService
+from services.tagging import TagEngine
+
+RULES = {
+    "content": {"frontend": ["ui"], "testing": ["test*"], "backend": ["api*"]},
+    "analysis": {"performance": ["performance", "optimize*"]},
+}
+
+CASES = [
+    ("build the ui", "", ["frontend"]),
+    ("rebuild everything", "", []),
+    ("UI, then tests", "", ["frontend", "testing"]),
+    ("latest contest", "", []),
+    ("testing_utils", "", ["testing"]),
+    ("the APIs", "", ["backend"]),
+    ("rapid", "", []),
+    ("", "optimized the hot loop", ["performance"]),
+    ("", "process optimizations", []),
+    ("", "performances", []),
+    ("", "Performance!", ["performance"]),
+    ("unicode naïve ui", "", ["frontend"]),
+    ("uimage", "", []),
+]
+
+
+@pytest.mark.parametrize("content, analysis, expected", CASES)
+def test_keywords_match_whole_words_and_prefixes(content, analysis, expected):
+    engine = TagEngine(RULES, path=None)
+    assert engine.tag(content, analysis) == expected
+
+
+def test_batch_matches_single_documents():
+    engine = TagEngine(RULES, path=None)
+    documents = [(content, analysis) for content, analysis, _ in CASES]
+    assert engine.tag_many(documents) == [engine.tag(content, analysis) for content, analysis in documents]
+
+
+def test_placeholder_analysis_of_the_insight_prompt_is_not_performance():
+    prompt = INSIGHT_PROMPT.format(source="notes", content="Renamed a variable")
+    # The local placeholder echoes the prompt, "Development process optimizations" included
+    result = asyncio.run(GeminiService(mode="local", cache=None).analyze(prompt))
+    assert "performance" not in TagEngine(path=None).tag("Renamed a variable", result["analysis"])
+
+
+def _write(path, rules, mtime):
+    path.write_text(json.dumps(rules))
+    os.utime(path, (mtime, mtime))
+
+
+def test_rules_file_is_reloaded_when_it_changes(tmp_path):
+    path = tmp_path / "rules.json"
+    _write(path, RULES, 1_000_000)
+    engine = TagEngine(path=str(path), check_interval=0)
+    assert engine.tag("the ui") == ["frontend"]
+    version = engine.version
+
+    _write(path, {"content": {"interface": ["ui"]}}, 1_000_010)
+    assert engine.tag("the ui") == ["interface"]
+    assert engine.version == version + 1
+
+    # A broken edit keeps the last good rules
+    path.write_text("{not json")
+    os.utime(path, (1_000_020, 1_000_020))
+    assert engine.tag("the ui") == ["interface"]
+    _write(path, {"content": {"bad": ["two words"]}}, 1_000_030)
+    assert engine.tag("the ui") == ["interface"]
+
+
+def test_invalid_rules_are_rejected():
+    engine = TagEngine(RULES, path=None)
+    with pytest.raises(ValueError):
+        engine.set_rules({"title": {"x": ["y"]}})
+    with pytest.raises(ValueError):
+        engine.set_rules({"content": {"x": ["*y"]}})
+    assert engine.rules == RULES
@@ -0,0 +1,125 @@
+"""Task claims across workers sharing one SQLite database."""
+import asyncio
+import multiprocessing
+import sqlite3
+import time
+
+import pytest
+
+from services.storage import SQLiteStorage
+from services.store import IndexedStore, field_index
+
+TASKS = 40
+
+
+def _tasks(path: str) -> IndexedStore:
+    return IndexedStore(
+        indexes={"status": field_index("status")},
+        storage=SQLiteStorage(path),
+        collection="tasks",
+        atomic_updates=True,
+    )
+
+
+def _claim_all(path: str, worker: str, start, results) -> None:
+    """One worker process: race for every task, report the ids it won."""
+    tasks = _tasks(path)
+    tasks.load()
+
+    async def claim(task_id: str):
+        return await tasks.update_if_async(
+            task_id, lambda task: task["status"] == "pending", status="queued", lease_owner=worker
+        )
+
+    async def main():
+        claims = await asyncio.gather(*(claim(f"task-{n}") for n in range(TASKS)))
+        return [task["id"] for task in claims if task is not None]
+
+    start.wait()
+    results.put((worker, asyncio.run(main())))
+
+
+def test_exactly_one_worker_wins_each_claim(tmp_path):
+    path = str(tmp_path / "kortana.db")
+    tasks = _tasks(path)
+    for n in range(TASKS):
+        tasks.add({"id": f"task-{n}", "status": "pending"})
+    tasks.storage.flush()
+
+    context = multiprocessing.get_context("spawn")
+    start, results = context.Event(), context.Queue()
+    workers = [context.Process(target=_claim_all, args=(path, name, start, results)) for name in ("a", "b")]
+    for worker in workers:
+        worker.start()
+    start.set()
+    won = dict(results.get(timeout=60) for _ in workers)
+    for worker in workers:
+        worker.join(timeout=60)
+
+    assert not set(won["a"]) & set(won["b"])
+    assert sorted(won["a"] + won["b"]) == sorted(f"task-{n}" for n in range(TASKS))
+    # The stored owner of every task is the worker whose claim succeeded
+    for worker, ids in won.items():
+        for task_id in ids:
+            assert tasks.fresh(task_id)["lease_owner"] == worker
+
+
+def test_claim_waiting_on_a_lock_does_not_block_the_loop(tmp_path):
+    path = str(tmp_path / "kortana.db")
+    tasks = _tasks(path)
+    tasks.add({"id": "task-0", "status": "pending"})
+    tasks.storage.flush()
+
+    # Another worker holding the write lock
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+
+    async def main():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        claim = asyncio.create_task(
+            tasks.update_if_async("task-0", lambda task: task["status"] == "pending", status="queued")
+        )
+        await asyncio.sleep(0.3)
+        assert not claim.done()
+        other.execute("ROLLBACK")
+        claimed = await asyncio.wait_for(claim, 10)
+        ticker.cancel()
+        return ticks, claimed
+
+    started = time.perf_counter()
+    ticks, claimed = asyncio.run(main())
+    other.close()
+
+    assert claimed["status"] == "queued"
+    # The loop kept running while the claim waited for the lock
+    assert ticks >= 0.3 / 0.01 / 3
+    assert time.perf_counter() - started < 10
+
+
+def test_a_claim_is_handed_back_when_the_job_cannot_be_scheduled(monkeypatch):
+    from fastapi import HTTPException
+
+    from routers.autonomy import task_queue_manager
+    from services.scheduler import scheduler
+
+    task_queue_manager.tasks.add({"id": "unschedulable", "title": "Cannot run", "status": "failed", "error": "boom"})
+
+    def submit(job):
+        raise ValueError(f"Job {job.id} is already running")
+
+    monkeypatch.setattr(scheduler, "submit", submit)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(task_queue_manager.execute_task("unschedulable"))
+    assert error.value.status_code == 409
+
+    task = task_queue_manager.tasks.get("unschedulable")
+    assert task["status"] == "failed" and task["error"] == "boom"
+    assert task.get("lease_owner") is None and task.get("queued_at") is None
@@ -0,0 +1,87 @@
+"""VectorIndex: training and compaction in the background while the index keeps changing."""
+import asyncio
+import threading
+
+import numpy as np
+
+from services import vector_index as vector_index_module
+from services.vector_index import VectorIndex
+
+DIM = 8
+
+
+def _vectors(rng: np.random.Generator, count: int) -> np.ndarray:
+    vectors = rng.normal(size=(count, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _exact(index: VectorIndex, expected: dict, query: np.ndarray, limit: int):
+    scores = {doc_id: float(vector @ query) for doc_id, vector in expected.items()}
+    return sorted(scores, key=scores.get, reverse=True)[:limit]
+
+
+def test_training_runs_off_the_loop_and_keeps_changes_made_meanwhile(monkeypatch):
+    rng = np.random.default_rng(3)
+    index = VectorIndex(DIM, train_threshold=400, nprobe=1000)
+    expected = {}
+
+    def add(ids):
+        vectors = _vectors(rng, len(ids))
+        index.add_many(ids, vectors)
+        expected.update(zip(ids, vectors))
+
+    add([f"doc-{n}" for n in range(500)])
+    assert index.needs_training
+
+    gate, trained_on = threading.Event(), []
+    kmeans = vector_index_module._kmeans
+
+    def gated_kmeans(vectors):
+        trained_on.append(threading.current_thread())
+        gate.wait(10)
+        return kmeans(vectors)
+
+    monkeypatch.setattr(vector_index_module, "_kmeans", gated_kmeans)
+
+    async def scenario():
+        training = asyncio.create_task(index.maintain())
+        while not trained_on:
+            await asyncio.sleep(0.001)
+        # The index serves and changes while the thread trains
+        assert len(index.search(_vectors(rng, 1)[0], 5)) == 5
+        add([f"doc-{n}" for n in range(480, 560)])
+        for n in range(0, 100, 3):
+            index.remove(f"doc-{n}")
+            del expected[f"doc-{n}"]
+        gate.set()
+        await training
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(scenario())
+    assert trained_on and trained_on[0] is not loop_thread
+    assert index.centroids is not None and not index.needs_training
+    assert set(index.rows) == set(expected)
+    for query in _vectors(rng, 20):
+        # Probing every list, IVF search is exact
+        assert [doc_id for doc_id, _ in index.search(query, 10)] == _exact(index, expected, query, 10)
+
+
+def test_reembedding_the_same_documents_does_not_grow_the_matrix():
+    rng = np.random.default_rng(5)
+    index = VectorIndex(DIM, train_threshold=1000, nprobe=1000)
+    ids = [f"doc-{n}" for n in range(2000)]
+    index.add_many(ids, _vectors(rng, len(ids)))
+    index.train()
+
+    async def reembed():
+        for _ in range(6):
+            vectors = _vectors(rng, len(ids))
+            index.add_many(ids, vectors)
+            await index.maintain()
+        return vectors
+
+    vectors = asyncio.run(reembed())
+    assert len(index) == 2000 and index._size <= 4000
+    expected = dict(zip(ids, vectors))
+    for query in _vectors(rng, 10):
+        assert [doc_id for doc_id, _ in index.search(query, 5)] == _exact(index, expected, query, 5)
@@ -0,0 +1,146 @@
+"""GitHub webhook deliveries and the incremental issue sync cursor."""
+import asyncio
+import hashlib
+import hmac
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from benchmarks import github_stub
+from routers import autonomy
+from routers.autonomy import task_queue_manager, verify_webhook_signature
+from services.github_client import github_client
+from services.http_client import http_client
+
+SECRET = "webhook-secret"
+
+
+@pytest.fixture(autouse=True)
+def repository(monkeypatch, request):
+    # A repository of its own per test, so sync cursors never carry over
+    monkeypatch.setattr(autonomy, "REPO_OWNER", "kortana-tests")
+    monkeypatch.setattr(autonomy, "REPO_NAME", request.node.name)
+    monkeypatch.setattr(autonomy, "GITHUB_WEBHOOK_SECRET", SECRET)
+    return task_queue_manager.repo
+
+
+def _sign(body: bytes, secret: str = SECRET) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def _deliver(event: str, payload, signature=None, body: bytes = None) -> httpx.Response:
+    app = FastAPI()
+    app.include_router(autonomy.router, prefix="/api/autonomy")
+    body = json.dumps(payload).encode() if body is None else body
+    headers = {"X-GitHub-Event": event, "X-Hub-Signature-256": _sign(body) if signature is None else signature}
+
+    async def post():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post("/api/autonomy/webhook", content=body, headers=headers)
+
+    return asyncio.run(post())
+
+
+def _issue(number, **fields) -> dict:
+    return {"number": number, "title": f"Issue {number}", "body": "Details", "state": "open", **fields}
+
+
+def test_signature_matches_only_the_exact_body_and_secret():
+    body = b'{"zen": "Keep it logically awesome."}'
+    assert verify_webhook_signature(body, _sign(body), SECRET)
+    assert not verify_webhook_signature(body + b" ", _sign(body), SECRET)
+    assert not verify_webhook_signature(body, _sign(body, "other"), SECRET)
+    assert not verify_webhook_signature(body, _sign(body)[len("sha256="):], SECRET)
+    assert not verify_webhook_signature(body, None, SECRET)
+
+
+@pytest.mark.parametrize("signature", ["", "sha256=" + "0" * 64, "sha1=abc"])
+def test_unsigned_or_badly_signed_deliveries_are_rejected(signature):
+    assert _deliver("ping", {"zen": "hi"}, signature=signature).status_code == 401
+
+
+def test_unconfigured_secret_refuses_deliveries(monkeypatch):
+    monkeypatch.setattr(autonomy, "GITHUB_WEBHOOK_SECRET", None)
+    assert _deliver("ping", {"zen": "hi"}).status_code == 503
+
+
+def test_issue_events_create_then_update_the_task(repository):
+    opened = _deliver("issues", {"action": "opened", "repository": {"full_name": repository}, "issue": _issue(9101)})
+    assert opened.status_code == 200 and opened.json()["created"] is True
+
+    edited = _deliver(
+        "issues",
+        {"action": "edited", "repository": {"full_name": repository}, "issue": _issue(9101, title="Renamed")},
+    )
+    assert edited.json()["created"] is False
+    assert task_queue_manager.tasks.get("issue-9101")["title"] == "Renamed"
+
+
+@pytest.mark.parametrize(
+    "event, payload",
+    [
+        ("issues", {"action": "opened"}),
+        ("issues", {"action": "opened", "issue": None}),
+        ("issues", {"action": "opened", "issue": {"title": "No number", "body": ""}}),
+        ("issues", {"action": "opened", "issue": _issue("9102")}),
+        ("issues", {"action": "opened", "issue": _issue(9103, title=None)}),
+        ("issues", {"action": "opened", "issue": _issue(9104, state="merged")}),
+        ("create", {"ref_type": "branch"}),
+    ],
+)
+def test_malformed_payloads_are_a_bad_request(repository, event, payload):
+    response = _deliver(event, {**payload, "repository": {"full_name": repository}})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("body", [b"[1, 2]", b'"text"', b"not json"])
+def test_payloads_that_are_not_objects_are_a_bad_request(body):
+    assert _deliver("issues", None, body=body).status_code == 400
+
+
+@pytest.mark.parametrize("repository_field", [None, "kortana-tests/elsewhere", {"full_name": 7}])
+def test_events_for_other_repositories_are_ignored(repository_field):
+    response = _deliver("issues", {"repository": repository_field, "issue": "not checked"})
+    assert response.status_code == 200 and response.json()["message"].startswith("Ignored event")
+
+
+def test_later_syncs_only_ask_for_issues_updated_since_the_cursor(monkeypatch, repository):
+    issues = github_stub.make_issues(3)
+    for issue in issues:
+        issue.update(number=issue["number"] + 9200, updated_at="2026-01-01T00:00:00Z")
+    monkeypatch.setattr(github_stub, "issues", issues)
+    monkeypatch.setattr(http_client, "transport", httpx.ASGITransport(app=github_stub.app))
+    requested = []
+    paginate = github_client.paginate
+
+    async def spy(path, params=None, *args, **kwargs):
+        requested.append(dict(params or {}))
+        return await paginate(path, params, *args, **kwargs)
+
+    monkeypatch.setattr(github_client, "paginate", spy)
+
+    async def sync():
+        await http_client.start()
+        try:
+            return await task_queue_manager.queue_from_github_issues()
+        finally:
+            await http_client.close()
+
+    first = asyncio.run(sync())
+    assert [task["id"] for task in first] == ["issue-9201", "issue-9202", "issue-9203"]
+    assert requested[0]["state"] == "open" and "since" not in requested[0]
+    assert task_queue_manager.sync_state.get(repository)["issues_since"] == "2026-01-01T00:00:00Z"
+
+    # One issue renamed, one closed, one untouched since the cursor
+    issues[0].update(title="Renamed", updated_at="2026-02-01T00:00:00Z")
+    issues[1].update(state="closed", updated_at="2026-03-01T00:00:00Z")
+    issues[2]["updated_at"] = "2025-12-01T00:00:00Z"
+    second = asyncio.run(sync())
+
+    assert second == []
+    assert requested[1]["state"] == "all" and requested[1]["since"] == "2026-01-01T00:00:00Z"
+    assert task_queue_manager.tasks.get("issue-9201")["title"] == "Renamed"
+    assert task_queue_manager.tasks.get("issue-9202")["status"] == "cancelled"
+    assert task_queue_manager.sync_state.get(repository)["issues_since"] == "2026-03-01T00:00:00Z"